@@ -11,12 +11,27 @@ Submodules:
     op: Op class useful for group and algebra actions
     variable: Variable class for variable name registration
     relation: Relation class for relations among known Variable objects
+    matcher: RelationMatcher class for finding relations to apply in a word
+    linalg: exact linear algebra on sparse vectors
+    verify: checking identities between Op objects on many test elements
+    basis: lazy enumeration of normal monomials
+    rewriting: completion of relations to a confluent rewriting system
+    packed: PackedElement class, array-backed storage for large Elements
+    graded: GradedElement class, storage bucketed by degree
+    series: PowerSeries class, lazy graded power series
+    rings: coefficient rings, including integers modulo n
+    store: persistent on-disk cache of normal forms, Op images and bases
+    algebra: Algebra class owning variables, relations and their caches
+    bench: benchmark suite reporting time and peak memory per case
+    profiling: opt-in counters for the rewriting done by Element objects
 """
 
 from .op import Op
+from .algebra import Algebra, current_algebra
 from .element import Element, make_poly_family, add_central_variable
-from .tools import relation_finder
+from .tools import relation_finder, rank_relation_finder
 
 assert Op  # silence Flake8
+assert Algebra and current_algebra  # silence Flake8
 assert Element and make_poly_family and add_central_variable  # silence Flake8
-assert relation_finder  # silene Flake8
+assert relation_finder and rank_relation_finder  # silene Flake8
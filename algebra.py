@@ -0,0 +1,249 @@
+"""spdaot.algebra
+
+Overview:
+    An Algebra holds everything which defines one quotient of a free algebra:
+    the registered variables, the registered relations, the automaton
+    indexing their left-hand sides, the cache of normal forms, the caches
+    depending on the relations (such as images under memoized Op objects),
+    and the coefficient ring.  Several Algebra objects can live side by side,
+    for instance one for each n in a family of algebras.
+
+    Exactly one Algebra is current at any time.  config.variables,
+    config.relations and config.coefficient_ring, as well as lhs_index,
+    normal_forms and dependent_caches in the module relation, are those of
+    the current Algebra, so all code written against config works on
+    whichever Algebra is current.  The default Algebra owns the registries
+    config held when the package was imported, and it is current unless
+    another Algebra is entered with a with statement:
+
+        A = Algebra('A')
+        with A:
+            x, y = make_poly_family('x', 'y', commute=-1, inverses=False)
+        x * y       # computed in A, whatever Algebra is current
+
+    An Element remembers the Algebra which was current when it was created,
+    and its arithmetic runs in that Algebra.  Variable names and their
+    interned ids are shared by all Algebra objects; Variable objects (and
+    their degrees) and relations are not.
+
+    An Algebra pickles as its spec(), a compact description of its
+    variables, relations and coefficient ring, and a process unpickling a
+    spec rebuilds the Algebra once (see Algebra.from_spec()).  Elements can
+    therefore be sent to worker processes, and a pool of workers can compute
+    in several Algebra objects, each worker entering the Algebra of each
+    task.  The default Algebra pickles by reference: a forked worker uses its
+    own copy.
+
+Classes:
+    Algebra: variables, relations and caches defining one algebra
+
+Functions:
+    current_algebra(): the current Algebra
+"""
+
+from collections import deque
+from weakref import WeakSet, WeakValueDictionary
+from .variable import Variable, VariableWord, _ids
+from .matcher import RelationMatcher
+from .frosting import LRUCache
+from . import relation
+from . import config
+
+
+class Algebra(object):
+    """
+    The variables, relations, caches and coefficient ring of one algebra.
+    Enter an Algebra with a with statement to make it current.
+
+    Attributes:
+        name (str): a name for printing, or None
+        variables, relations, coefficient_ring: what config.variables,
+            config.relations and config.coefficient_ring are while self is
+            current (see the module config)
+        lhs_index, normal_forms, dependent_caches: what the attributes of
+            the same names of the module relation are while self is current
+    """
+
+    def __init__(self, name=None, coefficient_ring=None):
+        """
+        Initialize an algebra without variables or relations.
+
+        Arguments:
+            name (str): a name for printing
+            coefficient_ring (Ring): the coefficient ring (see the module
+                rings); default: rings.python_numbers
+        """
+        self.name = name
+        self.variables = {}
+        self.relations = {}
+        self.coefficient_ring = coefficient_ring
+        self.lhs_index = RelationMatcher()
+        self.normal_forms = LRUCache(config.normal_form_cache_size)
+        self.dependent_caches = WeakSet()
+
+    @classmethod
+    def _adopt(cls, name):
+        """Return an Algebra owning the registries of config and relation."""
+        ret = cls.__new__(cls)
+        ret.name = name
+        _save(ret)
+        ret.lhs_index = relation.lhs_index
+        ret.normal_forms = relation.normal_forms
+        ret.dependent_caches = relation.dependent_caches
+        return ret
+
+    def __enter__(self):
+        """Make self current until the end of the with statement."""
+        _stack.append(_current)
+        _activate(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Make the previously current Algebra current again."""
+        _activate(_stack.pop())
+
+    def activate(self):
+        """Make self current, outside of any with statement."""
+        _activate(self)
+
+    def clear_caches(self):
+        """Clear the normal forms and dependent caches of self."""
+        with self:
+            relation.clear_caches()
+
+    def spec(self):
+        """
+        Return a picklable description of self, from which from_spec()
+        rebuilds an equal Algebra.
+
+        Return value:
+            a tuple (name, variables, relations, ring): variables is a tuple
+            of pairs (name, deg) in the order the names were interned,
+            relations a tuple of pairs (lhs, rhs) with lhs a tuple of
+            variable names and rhs a tuple of pairs (coeff, names), and ring
+            the coefficient ring
+        """
+        if self is _current:
+            _save(self)
+        variables = tuple((name, self.variables[name].deg)
+                          for name in sorted(self.variables, key=_ids.get))
+        relations = tuple(sorted(
+            (tuple(lhs), tuple((coeff, tuple(varword))
+                               for coeff, varword in rel.rhs))
+            for lhs, rel in self.relations.iteritems()))
+        ret = (self.name, variables, relations, self.coefficient_ring)
+        _remember(ret, self)
+        return ret
+
+    @classmethod
+    def from_spec(cls, spec):
+        """
+        Return an Algebra described by spec (see spec()).  Within a process,
+        the Algebra built for a spec is reused as long as it is unchanged.
+        """
+        try:
+            ret = _by_spec.get(spec)
+        except TypeError:
+            ret = None
+        if ret is not None and ret.spec() == spec:
+            return ret
+        name, variables, relations, ring = spec
+        ret = cls(name, ring)
+        with ret:
+            for varname, deg in variables:
+                if varname.endswith('@'):
+                    Variable(varname[:-1], -deg, make_inverse=True)
+                else:
+                    Variable(varname, deg)
+            for lhs, rhs in relations:
+                relation.Relation(VariableWord(*lhs),
+                                  *[(coeff, VariableWord(*names))
+                                    for coeff, names in rhs])
+        _remember(spec, ret)
+        _rebuilt.append(ret)
+        return ret
+
+    def __reduce__(self):
+        """Pickle by spec, or by reference for the default Algebra."""
+        if self is default_algebra:
+            return 'default_algebra'
+        return _from_spec, (self.spec(),)
+
+    def __copy__(self):
+        """An Algebra is never copied."""
+        return self
+
+    def __deepcopy__(self, memo):
+        """An Algebra is never copied."""
+        return self
+
+    def __repr__(self):
+        """Stringify self."""
+        if self is _current:
+            _save(self)
+        return '<Algebra {}: {} variables, {} relations>'.format(
+            self.name, len(self.variables), len(self.relations))
+
+
+def _from_spec(spec):
+    """Return Algebra.from_spec(spec), for unpickling."""
+    return Algebra.from_spec(spec)
+
+
+def _save(algebra):
+    """
+    Copy the settings of config into algebra, which must be current, in case
+    they were changed (or replaced) through config.
+    """
+    algebra.variables = config.variables
+    algebra.relations = config.relations
+    algebra.coefficient_ring = config.coefficient_ring
+
+
+def _activate(algebra):
+    """Make algebra current."""
+    global _current
+    if algebra is _current:
+        return
+    _save(_current)
+    config.variables = algebra.variables
+    config.relations = algebra.relations
+    config.coefficient_ring = algebra.coefficient_ring
+    relation.lhs_index = algebra.lhs_index
+    relation.normal_forms = algebra.normal_forms
+    relation.dependent_caches = algebra.dependent_caches
+    _current = algebra
+
+
+_by_spec = WeakValueDictionary()
+"""WeakValueDictionary: keys are specs, values are Algebra objects built
+from them (or which produced them)"""
+
+
+_rebuilt = deque(maxlen=16)
+"""deque: the Algebra objects most recently built by from_spec(), kept
+alive so that a worker process does not rebuild them for every task"""
+
+
+def _remember(spec, algebra):
+    """File algebra under spec, unless spec is unhashable."""
+    try:
+        _by_spec[spec] = algebra
+    except TypeError:
+        pass
+
+
+default_algebra = Algebra._adopt('default')
+"""Algebra: the algebra whose registries config held at import time"""
+
+_current = default_algebra
+"""Algebra: the current Algebra"""
+
+_stack = []
+"""list: the Algebra objects which were current when the Algebra objects of
+the enclosing with statements were entered, innermost last"""
+
+
+def current_algebra():
+    """Return the current Algebra."""
+    return _current
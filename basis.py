@@ -0,0 +1,92 @@
+"""spdaot.basis
+
+Overview:
+    Lazy enumeration of normal monomials, that is, of the VariableWord
+    objects to which no known relation applies.  When every relation rewrites
+    its left-hand side into smaller words, the normal monomials form a basis
+    of the algebra, so they are the natural test elements for verify() and
+    the natural eltlist for relation_finder().
+
+    Words are generated depth first, one letter at a time, while the
+    automaton over relation left-hand sides (see the module matcher) is
+    advanced along the word.  A prefix is abandoned as soon as some left-hand
+    side ends in it, so non-normal words are never built, and memory use is
+    proportional to the length of the words, not to their number.
+
+Functions:
+    normal_words(): yield the normal monomials up to a given length
+"""
+
+from . import config
+from .variable import Variable, VariableWord, _ids, _names
+from .relation import synced_index
+
+
+def normal_words(max_length, variables=None, min_length=0, deg=None):
+    """
+    Yield the normal monomials of length min_length to max_length.
+
+    Words are yielded in degree-lexicographic order: shorter words first,
+    and words of equal length in the lexicographic order induced by the order
+    of variables.
+
+    Arguments:
+        max_length, min_length (int): bounds on the length of the words
+        variables (iterable): names of the variables (or Variable objects)
+            the words are built from, in order; default: all registered
+            variables, in the order they were registered
+        deg: if not None, yield only words whose factors have degrees (see
+            Variable.deg) summing to deg.  If no variable has a negative
+            degree, prefixes of too large a degree are pruned.
+
+    Return value:
+        a generator of VariableWord objects
+    """
+    if variables is None:
+        ids = [i for i, name in enumerate(_names) if name in config.variables]
+    else:
+        ids = [_ids[var.name if isinstance(var, Variable) else var]
+               for var in variables]
+    weights = [config.variables[_names[i]].deg for i in ids] \
+        if deg is not None else None
+    prune = deg is not None and all(weight >= 0 for weight in weights)
+    index = synced_index()
+
+    for length in xrange(min_length, max_length + 1):
+        if length == 0:
+            if deg is None or deg == 0:
+                yield VariableWord()
+            continue
+        # word[k] is the position in ids of the k-th factor; states[k] and
+        # degrees[k] are the automaton state and degree after k factors, and
+        # positions[k] is the next candidate position for factor k
+        word, states, degrees, positions = [], [0], [0], [0]
+        while positions:
+            if len(word) == length:
+                if deg is None or degrees[-1] == deg:
+                    yield VariableWord._from_ids(tuple(ids[pos]
+                                                       for pos in word))
+                word.pop()
+                states.pop()
+                degrees.pop()
+                positions.pop()
+                continue
+            pos = positions[-1]
+            if pos == len(ids):
+                positions.pop()
+                states.pop()
+                degrees.pop()
+                if word:
+                    word.pop()
+                continue
+            positions[-1] = pos + 1
+            state, matched = index.step(states[-1], ids[pos])
+            if matched:
+                continue
+            degree = degrees[-1] + weights[pos] if deg is not None else 0
+            if prune and degree > deg:
+                continue
+            word.append(pos)
+            states.append(state)
+            degrees.append(degree)
+            positions.append(0)
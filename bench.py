@@ -0,0 +1,327 @@
+"""spdaot.bench
+
+Overview:
+    A benchmark suite for the arithmetic of Element objects, the operators
+    of the module odd, div_geometric() and relation_finder(), each at
+    several sizes.
+
+    Every case runs in a fresh Python process, so that its peak memory (the
+    maximum resident set size, from the module resource) is its own and no
+    cache is warm.  A case consists of a setup, which is not timed, and a
+    body, which is timed repeat times; the body clears the normal form and
+    Op image caches first, so every repetition does the same work.
+
+    Results are JSON: a dict whose key 'cases' maps each case name to a dict
+    with keys 'time' (the fastest repetition, in seconds), 'setup_kb' (peak
+    memory after the setup) and 'peak_kb' (peak memory after the body).
+    Stored results serve as a baseline, against which compare() reports
+    regressions.
+
+    From the command line:
+        python -m spdaot.bench [-k SUBSTRING] [--repeat N] [--output FILE]
+                               [--baseline FILE] [--tolerance FRACTION]
+    prints the results (or writes them to FILE) and, with --baseline, lists
+    the regressions and exits with status 1 if there are any.
+
+Functions:
+    cases(): the names of all benchmark cases
+    run_case(): run one case in this process
+    run(): run cases, each in its own process
+    compare(): list regressions of results with respect to a baseline
+"""
+
+import gc
+import json
+import os
+import subprocess
+import sys
+from collections import OrderedDict
+from timeit import default_timer
+from . import odd, tools, relation
+from .variable import VariableWord
+from .element import Element, make_poly_family
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+_PACKAGE = __package__ or __name__.rpartition('.')[0]
+"""str: the name under which this package is imported"""
+
+_cases = OrderedDict()
+"""OrderedDict: keys are case names, values are pairs (setup, size) where
+setup(size) does the untimed work and returns the body to be timed"""
+
+
+def _case(name, *sizes):
+    """Register the decorated setup function as a case for each size."""
+    def register(setup):
+        for size in sizes:
+            _cases['{}/{}'.format(name, size)] = (setup, size)
+        return setup
+    return register
+
+
+def _names(n):
+    """Return the names of the variables x1, ..., xn."""
+    return ['x' + str(i) for i in xrange(1, n + 1)]
+
+
+def _family(n):
+    """Return n anticommuting variables x1, ..., xn, as Elements."""
+    return make_poly_family(*_names(n), commute=-1, inverses=False)
+
+
+def _sample(xs):
+    """Return a fixed Element of degree 3 in the Elements xs."""
+    n = len(xs)
+    return sum((xs[i] * xs[(i + 1) % n] * xs[(2 * i) % n] * (i + 1)
+                for i in xrange(n)), Element(0)) + xs[-1] * xs[0]
+
+
+def _apply_all(ops, elt):
+    """Return a body applying each Op in ops to elt."""
+    def body():
+        relation.clear_caches()
+        for op in ops:
+            op(elt)
+    return body
+
+
+@_case('element_construction', 4, 8)
+def _element_construction(n):
+    _family(n)
+    names = _names(n)
+    words = [VariableWord(x, y, z) for z in names for y in names
+             for x in names]
+
+    def body():
+        relation.clear_caches()
+        Element({vw: k + 1 for k, vw in enumerate(words)})
+    return body
+
+
+@_case('element_multiplication', 3, 5, 7)
+def _element_multiplication(n):
+    total = sum(_family(n), Element(0))
+
+    def body():
+        relation.clear_caches()
+        total ** 4
+    return body
+
+
+@_case('simplify', 4, 8)
+def _simplify(n):
+    _family(n)
+    # words in decreasing variables are as far from normal form as possible
+    names = _names(n)[::-1]
+    terms = {VariableWord(names[i], names[j], names[(i + 1) % n],
+                          names[(j + 2) % n]): i - j + 1
+             for i in xrange(n) for j in xrange(n)}
+    elt = Element()
+
+    def body():
+        relation.clear_caches()
+        elt.terms = dict(terms)
+        elt._simplify()
+    return body
+
+
+@_case('minus_Dn_generators', 3, 5)
+def _minus_Dn_generators(n):
+    return _apply_all(odd.minus_Dn_generators(n), _sample(_family(n)))
+
+
+@_case('Bn_plus_generators', 3, 5)
+def _Bn_plus_generators(n):
+    return _apply_all(odd.Bn_plus_generators(n), _sample(_family(n)))
+
+
+@_case('braided_differentials', 3, 5)
+def _braided_differentials(n):
+    return _apply_all(odd.minus_Dn_braided_differentials(n),
+                      _sample(_family(n)))
+
+
+@_case('isobaric_differentials', 3, 5)
+def _isobaric_differentials(n):
+    return _apply_all(odd.minus_Dn_braided_differentials(n, isobaric=True),
+                      _sample(_family(n)))
+
+
+@_case('hecke_generators', 3, 4)
+def _hecke_generators(n):
+    return _apply_all(odd.minus_Dn_hecke_generators(n), _sample(_family(n)))
+
+
+@_case('div_geometric', 3, 5)
+def _div_geometric(n):
+    xs = _family(n)
+    total = sum(xs, Element(0))
+    func1 = total + total ** 5
+    # squares of anticommuting variables are central
+    func2 = xs[0] * xs[0]
+
+    def body():
+        relation.clear_caches()
+        tools.div_geometric(func1, func2, len)
+    return body
+
+
+@_case('relation_finder', 3, 4)
+def _relation_finder(n):
+    xs = _family(n)
+    g = odd.minus_Dn_generators(n)
+    terms = [g[0] * g[1] * g[0], g[1] * g[0] * g[1], g[0], g[1]]
+    eltlist = [xs[0] * xs[1] * xs[2], xs[0] * xs[0] * xs[1],
+               xs[1] * xs[2] * xs[-1], _sample(xs)]
+
+    def body():
+        relation.clear_caches()
+        tools.relation_finder(terms, eltlist=eltlist, scalarset=[-1, 0, 1])
+    return body
+
+
+def cases():
+    """Return the list of the names of all benchmark cases, in order."""
+    return list(_cases)
+
+
+def _peak_kb():
+    """Return the peak resident set size of this process in KB, or None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on OS X and in KB elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_case(name, repeat=3):
+    """
+    Run the case name in this process.  Peak memory is only meaningful in a
+    fresh process; use run() to get one.
+
+    Return value:
+        a dict with keys 'time', 'setup_kb' and 'peak_kb'
+    """
+    setup, size = _cases[name]
+    body = setup(size)
+    setup_kb = _peak_kb()
+    times = []
+    for _ in xrange(repeat):
+        gc.collect()
+        start = default_timer()
+        body()
+        times.append(default_timer() - start)
+    return {'time': min(times), 'setup_kb': setup_kb, 'peak_kb': _peak_kb()}
+
+
+def run(names=None, repeat=3, verbose=False):
+    """
+    Run cases, each in its own Python process.
+
+    Arguments:
+        names (list): the names of the cases to run; default: all cases
+        repeat (int): the number of timed repetitions of each case
+        verbose (bool): if True, print each result as it comes
+
+    Return value:
+        a dict with key 'cases' (see the module docstring) and key 'python',
+        the version of Python
+    """
+    if names is None:
+        names = cases()
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(
+        [root] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    results = OrderedDict()
+    for name in names:
+        output = subprocess.check_output(
+            [sys.executable, '-m', _PACKAGE + '.bench', '--child', name,
+             '--repeat', str(repeat)], env=env)
+        results[name] = json.loads(output.splitlines()[-1])
+        if verbose:
+            sys.stderr.write('{:<32} {:10.4f} s {:>10} KB\n'.format(
+                name, results[name]['time'], results[name]['peak_kb']))
+    return {'python': sys.version.split()[0], 'cases': results}
+
+
+def compare(results, baseline, tolerance=0.25, min_time=0.005):
+    """
+    List the regressions of results with respect to baseline, two outputs
+    of run().
+
+    A case regresses if its time or peak memory grew by more than the
+    fraction tolerance.  Times below min_time seconds are too noisy to
+    compare.  Cases missing from either argument are ignored.
+
+    Return value:
+        a list of tuples (name, metric, old, new), metric being 'time' or
+        'peak_kb'
+    """
+    ret = []
+    old_cases = baseline['cases']
+    for name, new in results['cases'].iteritems():
+        old = old_cases.get(name)
+        if old is None:
+            continue
+        if max(old['time'], new['time']) >= min_time and \
+                new['time'] > old['time'] * (1 + tolerance):
+            ret.append((name, 'time', old['time'], new['time']))
+        if old['peak_kb'] and new['peak_kb'] and \
+                new['peak_kb'] > old['peak_kb'] * (1 + tolerance):
+            ret.append((name, 'peak_kb', old['peak_kb'], new['peak_kb']))
+    return ret
+
+
+def _main(argv):
+    """Run the benchmark suite from the command line."""
+    from argparse import ArgumentParser, SUPPRESS
+    parser = ArgumentParser(prog='python -m {}.bench'.format(_PACKAGE),
+                            description='Run the spdaot benchmark suite.')
+    parser.add_argument('-k', dest='substring', default='',
+                        help='only run cases whose name contains SUBSTRING')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timed repetitions of each case')
+    parser.add_argument('--output', help='write the results to this file')
+    parser.add_argument('--baseline',
+                        help='compare the results to those in this file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='relative growth counted as a regression')
+    parser.add_argument('--list', action='store_true',
+                        help='list the cases and exit')
+    parser.add_argument('--child', help=SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        print json.dumps(run_case(args.child, repeat=args.repeat))
+        return 0
+    names = [name for name in cases() if args.substring in name]
+    if args.list:
+        print '\n'.join(names)
+        return 0
+
+    results = run(names, repeat=args.repeat, verbose=True)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print text
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, tolerance=args.tolerance)
+        for name, metric, old, new in regressions:
+            sys.stderr.write('REGRESSION {} {}: {} -> {}\n'.format(
+                name, metric, old, new))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(_main(sys.argv[1:]))
@@ -16,6 +16,29 @@ relations = {}
 Relation (the whole relation)
 """
 
+normal_form_cache_size = 2 ** 16
+"""int or None: the maximum number of VariableWord normal forms to cache
+
+The cache is cleared whenever a relation is registered.  None means no bound
+and 0 disables the cache.
+"""
+
+op_image_cache_size = 2 ** 12
+"""int or None: the maximum number of monomial images cached by each
+memoized Op (see Op.memoized()) created in the module odd"""
+
+function_cache_size = 2 ** 12
+"""int or None: the default maximum number of return values kept by a
+function decorated with frosting.cached() or frosting.memo"""
+
+coefficient_ring = None
+"""Ring or None: the ring of coefficients of Element objects and relations,
+see the module rings; None stands for rings.python_numbers
+
+Change it before registering relations, since the coefficients of relations
+are converted to the ring when they are registered.
+"""
+
 print_options = {'addsep': ' + ', 'mulsep': ' ', 'use_exponents': True}
 """dict
 
@@ -8,13 +8,39 @@ Classes:
 """
 
 from collections import defaultdict
+from functools import wraps
 from numbers import Number
 from itertools import product
 from .variable import Variable, VariableWord
-from .relation import Relation
+from .relation import Relation, apply_relations, normal_form
+from .rings import current_ring, python_numbers
+from .algebra import current_algebra
+from .profiling import active_profile
+from . import relation
 from . import config
 
 
+def _in_own_algebra(method):
+    """
+    Decorate a method of Element so that it runs with the Algebra of self
+    current (see the module algebra).
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.algebra is current_algebra():
+            return method(self, *args, **kwargs)
+        with self.algebra:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _check_algebra(x, y):
+    """Raise ValueError if the Elements x and y live in different algebras."""
+    if x.algebra is not y.algebra:
+        raise ValueError("{!r} and {!r} belong to different algebras".format(
+            x.algebra, y.algebra))
+
+
 def make_poly_family(*args, **kwargs):
     """
     Creates a family of q-commuting variables, one for each non-keyword
@@ -29,7 +55,10 @@ def make_poly_family(*args, **kwargs):
         inverses (bool): if True, also creates inverses for each variable.
             'f' inverse will have the name 'fi'.  inverses are given
             commutation relations so as to match: if x2 x1 = c x1 x2, then
-            x2i x1i = c x1i x2i
+            x2i x1i = c x1i x2i, and x2 x1i = c^-1 x1i x2, with c^-1 the
+            exact inverse of c in the coefficient ring (see the module rings)
+        algebra (Algebra): the algebra in which to register the variables
+            and relations (see the module algebra); default: the current one
 
     When commute is a function, commute(v1, v2) is the scalar c such that
     v2 * v1 = c * v1 * v2, where v1 precedes v2 in args.  If commute is a
@@ -40,6 +69,11 @@ def make_poly_family(*args, **kwargs):
     Return value:
         a tuple of Elements representing 1*v for v in args, in order
     """
+    algebra = kwargs.get('algebra')
+    if algebra is not None and algebra is not current_algebra():
+        with algebra:
+            return make_poly_family(*args, **kwargs)
+
     variables = tuple(Variable(x) for x in args)
     inverse_variables = tuple(
         Variable(x, make_inverse=True) for x in args) \
@@ -58,27 +92,26 @@ def make_poly_family(*args, **kwargs):
         for i in xrange(len(args)):
             x = variables[i]
             xi = inverse_variables[i]
-            config.relations[x*xi] = Relation(x*xi, (1, VariableWord()))
-            config.relations[xi*x] = Relation(xi*x, (1, VariableWord()))
+            Relation(x*xi, (1, VariableWord()))
+            Relation(xi*x, (1, VariableWord()))
 
     # commutation relations
     for i in xrange(len(args)):
         for j in xrange(i+1, len(args)):
             x, y = variables[i], variables[j]
-            config.relations[y*x] = Relation(y*x, (com(x, y), x*y))
+            Relation(y*x, (com(x, y), x*y))
             if kwargs['inverses']:
                 xi, yi = inverse_variables[i], inverse_variables[j]
-                config.relations[yi*xi] = Relation(yi*xi, (com(x, y), xi*yi))
-                cinv = 1./com(x, y)
-                cinv = int(cinv) if cinv.is_integer() else cinv
-                config.relations[y*xi] = Relation(y*xi, (cinv, xi*y))
-                config.relations[yi*x] = Relation(yi*x, (cinv, x*yi))
+                Relation(yi*xi, (com(x, y), xi*yi))
+                cinv = current_ring().inverse(com(x, y))
+                Relation(y*xi, (cinv, xi*y))
+                Relation(yi*x, (cinv, x*yi))
 
     return tuple(Element(v) for v in variables) + tuple(
         Element(v) for v in inverse_variables)
 
 
-def add_central_variable(newvar):
+def add_central_variable(newvar, algebra=None):
     """Register a new central variable.
 
     The new variable is given name newvar, and relations are registered making
@@ -89,10 +122,15 @@ def add_central_variable(newvar):
         If newvar is a string, create a Variable object with that string as
         initializer.  If the argument is a Variable object, no new Variable
         object is created.
+        algebra (Algebra): the algebra in which to register newvar; default:
+            the current one
 
     Return value:
         an Element representing 1*newvar
     """
+    if algebra is not None and algebra is not current_algebra():
+        with algebra:
+            return add_central_variable(newvar)
     if isinstance(newvar, str):
         newvar = Variable(newvar)
     elif isinstance(newvar, Variable):
@@ -109,7 +147,8 @@ def add_central_variable(newvar):
 class Element:
     """TODO"""
 
-    def __init__(self, terms={}, coeff_initializer=int):
+    def __init__(self, terms={}, coeff_initializer=int, ring=None,
+                 algebra=None):
         """
         Initialize self to be an element with terms given by terms.
 
@@ -118,11 +157,20 @@ class Element:
                 type; terms[vw] is the coefficient of vw in the element
             coeff_initializer: a function of no arguments which returns
                 the default value for a new term; default is int
+            ring (Ring): coefficients are converted to this ring (see the
+                module rings); default: config.coefficient_ring
+            algebra (Algebra): the algebra self belongs to (see the module
+                algebra); default: the current one
 
         If terms is an object of type VariableWord or Variable, the arument is
         interpreted as having coefficient 1 (integer).  A number is interpreted
         as the coefficient of an empty product.
         """
+        if algebra is not None and algebra is not current_algebra():
+            with algebra:
+                self.__init__(terms, coeff_initializer, ring)
+            return
+        self.algebra = current_algebra()
         self.terms = defaultdict(coeff_initializer)
         self._coeff_initializer = coeff_initializer
 
@@ -130,19 +178,24 @@ class Element:
             terms = {x: 1 for x in terms}
 
         if isinstance(terms, dict) or isinstance(terms, defaultdict):
+            if ring is None:
+                ring = current_ring()
+            # the default ring accepts any Number as it is
+            coerce = ring.coerce if ring is not python_numbers else None
             for x in terms:
+                coeff = terms[x] if coerce is None else coerce(terms[x])
                 if isinstance(x, VariableWord):
-                    self.terms[x] = terms[x]
+                    self.terms[x] = coeff
                 elif isinstance(x, Variable) or isinstance(x, str):
-                    self.terms[VariableWord(x)] = terms[x]
+                    self.terms[VariableWord(x)] = coeff
                 else:
                     raise TypeError
         elif isinstance(terms, VariableWord):
-            self.__init__({terms: 1})
+            self.__init__({terms: 1}, ring=ring)
         elif isinstance(terms, Variable) or isinstance(terms, str):
-            self.__init__({VariableWord(terms): 1})
+            self.__init__({VariableWord(terms): 1}, ring=ring)
         elif isinstance(terms, Number):
-            self.__init__({VariableWord(): terms})
+            self.__init__({VariableWord(): terms}, ring=ring)
         else:
             raise TypeError
 
@@ -150,9 +203,11 @@ class Element:
         # to __mul__, so we should simplify here
         self._simplify()
 
+    @_in_own_algebra
     def __add__(self, other):
         """Return the sum of self and other."""
         if isinstance(other, Element):
+            _check_algebra(self, other)
             return Element({vw: self[vw] + other[vw]
                            for vw in set(self.terms).union(other.terms)})
         elif isinstance(other, VariableWord) or isinstance(other, Variable):
@@ -162,6 +217,7 @@ class Element:
         else:
             return NotImplemented
 
+    @_in_own_algebra
     def __radd__(self, other):
         """Return the sum of other and self."""
         # the case where other is an Element will never happen, because
@@ -173,21 +229,27 @@ class Element:
         else:
             return NotImplemented
 
+    @_in_own_algebra
     def __sub__(self, other):
         """Return self - other."""
         return self + -1 * other
 
+    @_in_own_algebra
     def __rsub__(self, other):
         """Return other - self."""
         return other + -1 * self
 
+    @_in_own_algebra
     def __mul__(self, other):
         """Return the product of self and other."""
         if isinstance(other, Element):
+            _check_algebra(self, other)
             ret = Element()
-            for vw1, vw2 in product(self.terms, other.terms):
-                ret.terms[vw1 * vw2] += self[vw1] * other[vw2]
-            ret._simplify()
+            for (vw1, c1), (vw2, c2) in product(self.terms.iteritems(),
+                                                other.terms.iteritems()):
+                for varword, nf_coeff in normal_form(vw1 * vw2):
+                    ret.terms[varword] += nf_coeff * c1 * c2
+            ret._drop_zeros()
             return ret
         elif isinstance(other, VariableWord) or isinstance(other, Variable):
             return self * Element(other)
@@ -196,6 +258,7 @@ class Element:
         else:
             return NotImplemented
 
+    @_in_own_algebra
     def __rmul__(self, other):
         """Return the product of other and self."""
         # the case whereother is an Element will never happen, since
@@ -207,6 +270,7 @@ class Element:
         else:
             return NotImplemented
 
+    @_in_own_algebra
     def __pow__(self, n):
         """Returns the n-fold product of self, n a positive integer."""
         if isinstance(n, int):
@@ -219,9 +283,15 @@ class Element:
         else:
             return NotImplemented
 
+    @_in_own_algebra
     def __eq__(self, other):
-        """Return True or False according to equality."""
+        """
+        Return True or False according to equality.  Elements of different
+        algebras are never equal.
+        """
         if isinstance(other, Element):
+            if other.algebra is not self.algebra:
+                return False
             rhs = other
         elif isinstance(other, VariableWord) or isinstance(other, Variable):
             rhs = Element(other)
@@ -274,6 +344,7 @@ class Element:
         for vw in self.terms:
             yield vw
 
+    @_in_own_algebra
     def __neg__(self):
         """Return -1 * self."""
         return self * -1
@@ -298,6 +369,7 @@ class Element:
             else:
                 raise TypeError
 
+    @_in_own_algebra
     def transform(self, old, new, scale_func=lambda x: 1, swap=False):
         """Change all occurrences of variable old to scalar*new."""
         newterms = defaultdict(self._coeff_initializer)
@@ -322,6 +394,16 @@ class Element:
         else:
             return nonzero_terms[0]
 
+    def _cache_key(self):
+        """
+        Return a hashable key determined by the algebra and the nonzero
+        terms of self, for caches (see frosting.cached()).
+        """
+        return (Element, self.algebra,
+                frozenset((vw, coeff) for vw, coeff in self.terms.iteritems()
+                          if coeff != 0))
+
+    @_in_own_algebra
     def copy(self):
         """Returns a copy of self."""
         from copy import deepcopy
@@ -330,35 +412,25 @@ class Element:
 
     def _simplify(self):
         """Apply relations from config.relations to self while possible."""
-        made_simplification = True
-        while made_simplification:
-            made_simplification = False
-
-            # try and apply a relation
-            for term_vw, rel_vw in product(self.terms, config.relations):
-                before, during, after = term_vw.split_on_sub(*rel_vw._w)
-                if during:
-                    # we found rel_vw inside term_vw, so let's record
-                    # the changes we want to make
-                    # we don't make them here so as to avoid changing the
-                    # dict self.terms during iteration
-                    changes = defaultdict(self._coeff_initializer)
-                    before_vw = VariableWord(*before)
-                    after_vw = VariableWord(*after)
-                    changes[before_vw*rel_vw*after_vw] -= self.terms[term_vw]
-                    for coeff, varword in config.relations[rel_vw].rhs:
-                        changes[before_vw*varword*after_vw] += \
-                            coeff * self.terms[term_vw]
-                    made_simplification = True
-                    break
-                else:
-                    continue
-
-            # if we have changes make, then make them
-            if made_simplification:
-                self._add_terms(*list(changes.iteritems()))
-
-            # remove any terms with zeroes
+        profile = active_profile()
+        if profile is not None:
+            profile._simplifying(len(self.terms))
+        if relation.normal_forms.maxsize == 0:
+            # without a cache, reducing all terms together lets them share
+            # intermediate words
             self.terms = defaultdict(self._coeff_initializer,
-                                     {key: val for key, val in
-                                      self.terms.iteritems() if val != 0})
+                                     apply_relations(dict(self.terms)))
+            return
+        terms = defaultdict(self._coeff_initializer)
+        for vw, coeff in self.terms.iteritems():
+            if coeff != 0:
+                for varword, nf_coeff in normal_form(vw):
+                    terms[varword] += nf_coeff * coeff
+        self.terms = terms
+        self._drop_zeros()
+
+    def _drop_zeros(self):
+        """Remove any terms with zero coefficients."""
+        self.terms = defaultdict(self._coeff_initializer,
+                                 {key: val for key, val in
+                                  self.terms.iteritems() if val != 0})
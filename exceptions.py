@@ -8,6 +8,10 @@ Exceptions:
         a name already use for another variable
     UnknownVariableName: raised when trying to use a variable name which
         hasn't been registered
+    NonTerminatingRelations: raised when relations are not oriented by a
+        monomial order, so that applying them might never terminate
+    CompletionFailure: raised when completing a set of relations to a
+        confluent rewriting system fails or exceeds its bounds
 """
 
 
@@ -21,3 +25,11 @@ class UnknownVariableName(Exception):
 
 class InvalidVariableName(Exception):
     pass
+
+
+class NonTerminatingRelations(Exception):
+    pass
+
+
+class CompletionFailure(Exception):
+    pass
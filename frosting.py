@@ -12,15 +12,26 @@ Functions:
         associative n-ary operation
     left_associative(): Decorator to make a binary operation into a left
         associative n-ary operation
+    cached(): Decorator factory wrapping a function in a bounded cache with
+        hit/miss statistics, optionally invalidated along with the
+        relations
     memo(): Decorator to make a recursive function autoatically cache its
-        previous return values
+        previous return values; cached() with default settings
+    canonical(): Return a hashable stand-in for a value in a cache key
     trace(): Decorator to have a recursive function automatically print
         its recursion trace
     compose(): Returns the composition of its arguments, each of which is
         a function.
+
+Classes:
+    LRUCache: bounded dictionary-like cache with hit/miss statistics
+    CachedFunction: a function wrapped in caches, made by cached()
 """
 
-from functools import update_wrapper
+from collections import OrderedDict
+from functools import update_wrapper, partial
+from weakref import WeakKeyDictionary
+from . import config
 
 
 def decorator(dec):
@@ -46,7 +57,12 @@ def right_associative(func):
         right_associative(f)(x, y, z) is equivalent to f(x, f(y, z))
     """
     def ra_func(x, *args):
-        return x if not args else func(x, ra_func(*args))
+        if not args:
+            return x
+        ret = args[-1]
+        for arg in reversed((x,) + args[:-1]):
+            ret = func(arg, ret)
+        return ret
     return ra_func
 
 
@@ -59,30 +75,157 @@ def left_associative(func):
         left_associative(f)(x, y, z) is equivalent to f(f(x, y), z)
     """
     def la_func(x, *args):
-        return x if not args else func(la_func(x, *args[:-1]), args[-1])
+        ret = x
+        for arg in args:
+            ret = func(ret, arg)
+        return ret
     return la_func
 
 
-@decorator
-def memo(func):
-    """Decorator: convert a recursive function to one that memoizes.
+def canonical(x):
+    """
+    Return a hashable stand-in for x, for use in cache keys.
 
-    Returns a function that, if all arguments are hashable, will remember its
-    previous return values in a cache so as to avoid re-calculating these
-    values.  If non-hashable arguments are found, no caching is done.
+    An object with a _cache_key() method (such as an Element) is replaced by
+    its result, lists and tuples by tuples, dicts by frozensets of items and
+    sets by frozensets, recursively; anything else (such as a VariableWord,
+    which hashes by its interned variable ids) is returned as it is.
     """
-    cache = {}
+    cache_key = getattr(x, '_cache_key', None)
+    if cache_key is not None:
+        return cache_key()
+    if isinstance(x, (list, tuple)):
+        return tuple(canonical(y) for y in x)
+    if isinstance(x, dict):
+        return frozenset((key, canonical(val)) for key, val in x.iteritems())
+    if isinstance(x, (set, frozenset)):
+        return frozenset(canonical(y) for y in x)
+    return x
 
-    def _func(*args):
+
+def _default_key(args, kwargs):
+    """Return a cache key for a call with arguments args and kwargs."""
+    return (tuple(canonical(arg) for arg in args),
+            frozenset((name, canonical(val))
+                      for name, val in kwargs.iteritems()))
+
+
+_MISSING = object()
+"""object: marks a missing cache entry"""
+
+
+class CachedFunction(object):
+    """
+    A function wrapped in a bounded LRUCache of its return values.  Make
+    these with cached().  Calls whose key is unhashable are not cached.
+
+    If the function is relational, its values depend on the relations of
+    the current Algebra (see the module algebra): there is then one LRUCache
+    for each Algebra, cleared whenever a relation is registered in it.
+    """
+
+    def __init__(self, func, maxsize, key, relational):
+        self.func = func
+        self.maxsize = maxsize
+        self.key = _default_key if key is None else key
+        self.relational = relational
+        self.uncacheable = 0
+        self._cache = None if relational else LRUCache(maxsize)
+        self._caches = WeakKeyDictionary() if relational else None
+        update_wrapper(self, func)
+
+    def cache(self):
+        """Return the LRUCache in use for the current Algebra."""
+        if self._caches is None:
+            return self._cache
+        from .algebra import current_algebra
+        algebra = current_algebra()
+        ret = self._caches.get(algebra)
+        if ret is None:
+            ret = self._caches[algebra] = LRUCache(self.maxsize)
+            algebra.dependent_caches.add(ret)
+        return ret
+
+    def __call__(self, *args, **kwargs):
+        """Return func(*args, **kwargs), from the cache if possible."""
         try:
-            return cache[args]
-        except KeyError:
-            cache[args] = result = func(*args)
-            return result
+            key = self.key(args, kwargs)
+            hash(key)
         except TypeError:
-            # some element of args can't be a dict key
-            return func(args)
-    return _func
+            # some argument can't be part of a dict key
+            self.uncacheable += 1
+            return self.func(*args, **kwargs)
+        cache = self.cache()
+        ret = cache.get(key, _MISSING)
+        if ret is _MISSING:
+            ret = cache[key] = self.func(*args, **kwargs)
+        return ret
+
+    def __get__(self, obj, objtype=None):
+        """Bind self as a method."""
+        return self if obj is None else partial(self, obj)
+
+    def invalidate(self):
+        """Clear every cache of self."""
+        caches = [self._cache] if self._caches is None \
+            else self._caches.values()
+        for cache in caches:
+            cache.clear()
+
+    def stats(self):
+        """
+        Return a dict of statistics about the caches of self, summed over
+        all Algebra objects (see LRUCache.stats()); the key 'uncacheable'
+        counts the calls which could not be cached.
+        """
+        caches = [self._cache] if self._caches is None \
+            else self._caches.values()
+        ret = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0,
+               'size': 0}
+        for cache in caches:
+            for name, val in cache.stats().iteritems():
+                if name in ret:
+                    ret[name] += val
+        ret['maxsize'] = self.maxsize
+        ret['uncacheable'] = self.uncacheable
+        return ret
+
+
+def cached(maxsize=_MISSING, key=None, relational=False):
+    """
+    Decorator factory: cache the return values of a function.
+
+    Arguments:
+        maxsize (int or None): the maximum number of values kept (for each
+            Algebra, if relational is True); None means no bound; default:
+            config.function_cache_size
+        key (callable): key(args, kwargs) returns the cache key of a call;
+            default: canonical() applied to every argument
+        relational (bool): if True, the values depend on the registered
+            relations, so they are kept for each Algebra separately and
+            cleared whenever a relation is registered
+
+    Return value:
+        a decorator returning CachedFunction objects
+
+    Example:
+        @cached(maxsize=1000, relational=True)
+        def f(elt): ...
+    """
+    if maxsize is _MISSING:
+        maxsize = config.function_cache_size
+    return lambda func: CachedFunction(func, maxsize, key, relational)
+
+
+def memo(func):
+    """Decorator: convert a recursive function to one that memoizes.
+
+    Returns a function that, if all arguments can be made hashable (see
+    canonical()), will remember its previous return values in a bounded
+    cache so as to avoid re-calculating these values.  Otherwise, no caching
+    is done.  This is cached() with its default settings.
+    """
+    return cached()(func)
 
 
 @decorator
@@ -105,13 +248,92 @@ def trace(func):
     return _func
 
 
-@left_associative
-def compose(func1, func2):
-    """Compose the argument functions."""
-    return lambda x: func1(func2(x))
+def compose(*funcs):
+    """
+    Compose the argument functions: compose(f, g, h)(x) is f(g(h(x))).  The
+    composition is evaluated in a loop, so any number of functions may be
+    composed.
+    """
+    def composition(x):
+        for func in reversed(funcs):
+            x = func(x)
+        return x
+    return composition
 
 
 @left_associative
 def prod(x, y):
     """Return the product of x and y."""
     return x * y
+
+
+class LRUCache(object):
+    """
+    Dictionary-like cache which holds at most maxsize entries, evicting the
+    least recently used entry when full.  Counts hits, misses and evictions.
+    """
+
+    def __init__(self, maxsize=None, name=None):
+        """
+        Initialize an empty cache.
+
+        Arguments:
+            maxsize (int or None): maximum number of entries; None means
+                unbounded, 0 disables caching
+            name (str): if set, entries of this cache are also kept in the
+                attached persistent Store (see the module store) under this
+                name
+        """
+        self.maxsize = maxsize
+        self.name = name
+        self._data = OrderedDict()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key, default=None):
+        """Return the value for key and mark it recently used, or default."""
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data[key] = value
+        self.hits += 1
+        return value
+
+    def __getitem__(self, key):
+        """Return the value for key, raising KeyError if it is absent."""
+        value = self.get(key, self)
+        if value is self:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        """Store value for key, evicting old entries if necessary."""
+        if self.maxsize == 0:
+            return
+        self._data.pop(key, None)
+        self._data[key] = value
+        while self.maxsize is not None and len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, key):
+        """Return True if key is cached, without affecting statistics."""
+        return key in self._data
+
+    def __len__(self):
+        """Return the number of cached entries."""
+        return len(self._data)
+
+    def clear(self):
+        """Remove all entries."""
+        if self._data:
+            self.invalidations += 1
+        self._data.clear()
+
+    def stats(self):
+        """Return a dict of statistics about this cache."""
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'size': len(self._data), 'maxsize': self.maxsize}
@@ -0,0 +1,345 @@
+"""spdaot.graded
+
+Overview:
+    Defines the GradedElement class, an alternative storage for Elements of
+    a graded algebra.  Terms are bucketed by degree, so a homogeneous
+    component is extracted without looking at the other terms, and a product
+    can be truncated above a given degree without ever generating the terms
+    which would be thrown away.
+
+    The degree of a VariableWord is given by a grading function: by default
+    variable_degree(), the sum of the degrees (see Variable.deg) of its
+    factors.  A grading must be additive, that is,
+    degree(vw1 * vw2) = degree(vw1) + degree(vw2).  When the known relations
+    are homogeneous for it, so that the normal form of a word of degree d
+    has only terms of degree d, truncated products skip the pairs of
+    components whose degrees add up to more than the bound; otherwise every
+    pair is multiplied, and terms are kept according to their own degree.
+
+Classes:
+    GradedElement: linear combination of monomials bucketed by degree
+
+Functions:
+    variable_degree(): the degree of a VariableWord given by Variable.deg
+    homogeneous(): whether relations are homogeneous for a grading
+"""
+
+from collections import defaultdict
+from numbers import Number
+from .variable import VariableWord, _names
+from .element import Element, _in_own_algebra
+from .relation import normal_form
+from .algebra import current_algebra
+from . import config
+
+
+def variable_degree(vw):
+    """Return the sum of the degrees (Variable.deg) of the factors of vw."""
+    variables = config.variables
+    return sum(variables[_names[i]].deg for i in vw._w)
+
+
+def homogeneous(degree, relations=None):
+    """
+    Return True if every word with a nonzero coefficient in the right-hand
+    side of a relation has the degree of its left-hand side.
+
+    Arguments:
+        degree (callable): the grading, a function of a VariableWord
+        relations (iterable): Relation objects; default: config.relations
+    """
+    if relations is None:
+        relations = config.relations.values()
+    return all(degree(varword) == degree(relation.lhs)
+               for relation in relations
+               for coeff, varword in relation.rhs if coeff != 0)
+
+
+def _add_components(components1, components2, scalar=1):
+    """
+    Return the components of x + scalar * y, given those of x and y as dicts
+    from degrees to dicts of terms, dropping zero coefficients.
+    """
+    ret = dict(components1)
+    for deg, terms2 in components2.iteritems():
+        terms = dict(ret.get(deg, ()))
+        for vw, coeff in terms2.iteritems():
+            coeff = terms.get(vw, 0) + scalar * coeff
+            if coeff != 0:
+                terms[vw] = coeff
+            else:
+                terms.pop(vw, None)
+        if terms:
+            ret[deg] = terms
+        else:
+            ret.pop(deg, None)
+    return ret
+
+
+class GradedElement(object):
+    """
+    A linear combination of monomials, stored as a dict from degrees to
+    homogeneous components, each a dict from VariableWord objects in normal
+    form to nonzero coefficients.
+
+    GradedElement objects support +, -, scaling by Numbers, multiplication
+    (by GradedElement and Element objects) and equality.  mul() and power()
+    take a bound on the degree of the terms to compute, component()
+    extracts a homogeneous component, and unpack() returns the equivalent
+    Element.
+
+    Attributes:
+        components (dict): keys are degrees, values are dicts of terms
+        degree (callable): the grading, a function of a VariableWord
+        algebra (Algebra): the algebra of self (see the module algebra)
+    """
+
+    __slots__ = ('components', 'degree', 'algebra')
+
+    def __init__(self, x=0, degree=None):
+        """
+        Initialize self as a graded copy of x.
+
+        Arguments:
+            x: an Element, a GradedElement, or anything accepted by the
+                Element constructor
+            degree (callable): the grading; default: variable_degree()
+        """
+        if degree is None:
+            degree = x.degree if isinstance(x, GradedElement) \
+                else variable_degree
+        if isinstance(x, GradedElement):
+            if x.degree is degree:
+                self.components, self.degree, self.algebra = \
+                    x.components, x.degree, x.algebra
+                return
+            x = x.unpack()
+        if not isinstance(x, Element):
+            x = Element(x)
+        self.components = {}
+        self.degree = degree
+        self.algebra = x.algebra
+        if x.algebra is not current_algebra():
+            with x.algebra:
+                self._bucket(x.terms)
+        else:
+            self._bucket(x.terms)
+
+    def _bucket(self, terms):
+        """Add the terms, a dict in normal form, to their components."""
+        for vw, coeff in terms.iteritems():
+            if coeff != 0:
+                self.components.setdefault(self.degree(vw), {})[vw] = coeff
+
+    @classmethod
+    def _from_components(cls, components, degree, algebra):
+        """Return a GradedElement with the given (trusted) components."""
+        ret = object.__new__(cls)
+        ret.components = components
+        ret.degree = degree
+        ret.algebra = algebra
+        return ret
+
+    def _like(self, components):
+        """Return a GradedElement with the grading and algebra of self."""
+        return GradedElement._from_components(components, self.degree,
+                                              self.algebra)
+
+    def component(self, deg):
+        """Return the homogeneous component of self of degree deg."""
+        ret = Element(algebra=self.algebra)
+        ret.terms = defaultdict(int, self.components.get(deg, ()))
+        return ret
+
+    def degrees(self):
+        """Return the sorted list of degrees of the nonzero components."""
+        return sorted(self.components)
+
+    def truncate(self, max_degree):
+        """Return the sum of the components of degree at most max_degree."""
+        return self._like({deg: terms for deg, terms
+                           in self.components.iteritems()
+                           if deg <= max_degree})
+
+    def unpack(self):
+        """Return self as an Element."""
+        ret = Element(algebra=self.algebra)
+        for terms in self.components.itervalues():
+            ret.terms.update(terms)
+        return ret
+
+    def iteritems(self):
+        """Iterate over pairs (vw, coeff), by increasing degree."""
+        for deg in self.degrees():
+            for item in self.components[deg].iteritems():
+                yield item
+
+    def __iter__(self):
+        """Iterate over VariableWord objects that are terms of self."""
+        for vw, _ in self.iteritems():
+            yield vw
+
+    def __len__(self):
+        """Return the number of terms of self."""
+        return sum(len(terms) for terms in self.components.itervalues())
+
+    def __nonzero__(self):
+        """Return False if self is zero."""
+        return bool(self.components)
+
+    def __getitem__(self, vw):
+        """Return the coefficient of a VariableWord in self."""
+        return self.components.get(self.degree(vw), {}).get(vw, 0)
+
+    def _coerce(self, other):
+        """
+        Return other as a GradedElement with the grading of self, or None if
+        it is unsupported.
+        """
+        if isinstance(other, GradedElement) and other.degree is self.degree:
+            if other.algebra is not self.algebra:
+                raise ValueError("{!r} and {!r} belong to different "
+                                 "algebras".format(self.algebra,
+                                                   other.algebra))
+            return other
+        if isinstance(other, (GradedElement, Element, VariableWord, Number)):
+            if isinstance(other, (VariableWord, Number)):
+                other = Element(other, algebra=self.algebra)
+            return GradedElement(other, self.degree)
+        return None
+
+    def __add__(self, other):
+        """Return the sum of self and other."""
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        return self._like(_add_components(self.components, other.components))
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        """Return -1 * self."""
+        return self._scale(-1)
+
+    def __sub__(self, other):
+        """Return self - other."""
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        return self._like(_add_components(self.components, other.components,
+                                          -1))
+
+    def __rsub__(self, other):
+        """Return other - self."""
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        return other - self
+
+    def _scale(self, scalar):
+        """Return scalar * self for a Number scalar."""
+        ret = {}
+        for deg, terms in self.components.iteritems():
+            scaled = {}
+            for vw, coeff in terms.iteritems():
+                coeff = scalar * coeff
+                if coeff != 0:
+                    scaled[vw] = coeff
+            if scaled:
+                ret[deg] = scaled
+        return self._like(ret)
+
+    @_in_own_algebra
+    def mul(self, other, max_degree=None):
+        """
+        Return self * other, keeping only the terms of degree at most
+        max_degree (None for no bound).  If the relations are homogeneous
+        for the grading, pairs of components whose degrees add up to more
+        than max_degree are never multiplied.
+        """
+        other = self._coerce(other)
+        skip = max_degree is not None and homogeneous(self.degree)
+        terms = defaultdict(int)
+        for deg1, terms1 in self.components.iteritems():
+            for deg2, terms2 in other.components.iteritems():
+                if skip and deg1 + deg2 > max_degree:
+                    continue
+                for vw1, c1 in terms1.iteritems():
+                    for vw2, c2 in terms2.iteritems():
+                        for varword, nf_coeff in normal_form(vw1 * vw2):
+                            terms[varword] += nf_coeff * c1 * c2
+        ret = {}
+        for vw, coeff in terms.iteritems():
+            if coeff != 0:
+                deg = self.degree(vw)
+                if max_degree is None or deg <= max_degree:
+                    ret.setdefault(deg, {})[vw] = coeff
+        return self._like(ret)
+
+    @_in_own_algebra
+    def power(self, n, max_degree=None):
+        """
+        Return self ** n, a nonnegative integer power, keeping only the
+        terms of degree at most max_degree (None for no bound).
+        """
+        # without homogeneous relations, terms above max_degree may have
+        # products of lower degree, so intermediate results are kept whole
+        bound = max_degree if homogeneous(self.degree) else None
+        ret = self._coerce(1)
+        square = self
+        while n > 0:
+            if n & 1:
+                ret = ret.mul(square, bound)
+            n >>= 1
+            if n:
+                square = square.mul(square, bound)
+        return ret if max_degree is None else ret.truncate(max_degree)
+
+    def __mul__(self, other):
+        """Return self * other, for a Number or an Element-like other."""
+        if isinstance(other, Number):
+            return self._scale(other)
+        if self._coerce(other) is None:
+            return NotImplemented
+        return self.mul(other)
+
+    def __rmul__(self, other):
+        """Return other * self."""
+        if isinstance(other, Number):
+            return self._scale(other)
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        return other.mul(self)
+
+    def __pow__(self, n):
+        """Return self ** n, a nonnegative integer power."""
+        if not isinstance(n, int) or n < 0:
+            return NotImplemented
+        return self.power(n)
+
+    def __eq__(self, other):
+        """
+        Return True or False according to equality.  Elements of different
+        algebras are never equal.
+        """
+        if isinstance(other, (GradedElement, Element)) and \
+                other.algebra is not self.algebra:
+            return False
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        return self.components == other.components
+
+    def __ne__(self, other):
+        """Return the negation of self == other."""
+        ret = self.__eq__(other)
+        return ret if ret is NotImplemented else not ret
+
+    def __str__(self):
+        """Stringify self."""
+        return str(self.unpack())
+
+    def __repr__(self):
+        """Stringify self."""
+        return repr(self.unpack())
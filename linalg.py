@@ -0,0 +1,297 @@
+"""spdaot.linalg
+
+Overview:
+    Exact linear algebra on sparse vectors.  A sparse vector is a dict whose
+    values are its nonzero entries; keys may be any hashable objects (for
+    example VariableWord objects, or pairs (index, VariableWord)).
+
+    Elimination is fraction-free: rational entries are scaled to integers
+    once, and every later step is done in integer arithmetic, removing common
+    factors as it goes so that entries stay small.  Elimination can also be
+    done modulo an integer n (see the module rings), in which case entries
+    never exceed n.
+
+Classes:
+    SparseMatrix: sparse matrix of a linear map on the span of a basis
+
+Functions:
+    integer_vector(): scale a vector with rational entries to integers
+    nullspace(): a basis of the linear relations among sparse vectors
+"""
+
+from fractions import Fraction, gcd
+from numbers import Number
+from .rings import residue, _inverse_mod
+
+
+def _lcm(a, b):
+    """Return the least common multiple of two positive integers."""
+    return a // gcd(a, b) * b
+
+
+def _content(*vectors):
+    """Return the gcd of all entries of the given sparse integer vectors."""
+    ret = 0
+    for vector in vectors:
+        for val in vector.itervalues():
+            ret = gcd(ret, val)
+            if ret == 1:
+                return 1
+    return abs(ret)
+
+
+_FLOAT_DENOMINATOR = 10 ** 9
+"""int: floats are read as the closest fraction with at most this
+denominator"""
+
+
+def _rational(val):
+    """
+    Return val as an exact rational number.  A float is read as the closest
+    fraction with denominator at most _FLOAT_DENOMINATOR, so that 0.1 stands
+    for 1/10 rather than for its binary expansion.
+    """
+    if isinstance(val, float):
+        return Fraction(val).limit_denominator(_FLOAT_DENOMINATOR)
+    return Fraction(val)
+
+
+def integer_vector(vector):
+    """
+    Scale a sparse vector with rational entries to one with integer entries.
+
+    Arguments:
+        vector (dict): values of any exact or float numeric type; floats
+            are rounded to fractions (see _rational())
+
+    Return value:
+        a tuple (int_vector, d), where d is a positive integer and int_vector
+        is a dict with int or long values equal to d * vector
+    """
+    vector = {key: _rational(val) for key, val in vector.iteritems()
+              if val != 0}
+    denominator = 1
+    for val in vector.itervalues():
+        denominator = _lcm(denominator, val.denominator)
+    return {key: int(val * denominator) for key, val in vector.iteritems()}, \
+        denominator
+
+
+def nullspace(vectors, modulus=None):
+    """
+    Find a basis of the space of linear relations among sparse vectors.
+
+    Vectors are processed in order and kept in echelon form.  Whenever a
+    vector is a linear combination of earlier ones, that combination is
+    recorded, so relation number k expresses one vector in terms of earlier
+    vectors only.
+
+    Arguments:
+        vectors (list): sparse vectors (dicts), entries of exact or float
+            numeric types, or integers modulo modulus
+        modulus (int): if set, a prime p; relations are then found among the
+            vectors reduced modulo p
+
+    Return value:
+        a list of dicts c, each mapping indices i into vectors to nonzero
+        integers c[i], such that sum(c[i] * vectors[i]) == 0.  The integers
+        in each c have no common factor, and the largest index in each c has
+        a positive coefficient.  The dicts form a basis of all relations.
+        Modulo p, the integers lie in range(p) and the coefficient of the
+        largest index is 1.
+    """
+    if modulus is not None:
+        return _nullspace_mod(vectors, modulus)
+    # each basis entry is (pivot key, reduced vector, combination), where the
+    # reduced vector equals the sum of combination[i] * vectors[i]
+    basis = []
+    ret = []
+    for index, vector in enumerate(vectors):
+        vector, denominator = integer_vector(vector)
+        combination = {index: denominator}
+        for pivot, basis_vector, basis_combination in basis:
+            if pivot not in vector:
+                continue
+            # vector <- p * vector - v * basis_vector, which is zero at pivot
+            p, v = basis_vector[pivot], vector[pivot]
+            vector = _axpy(p, vector, -v, basis_vector)
+            combination = _axpy(p, combination, -v, basis_combination)
+            content = _content(vector, combination)
+            if content > 1:
+                vector = {key: val // content
+                          for key, val in vector.iteritems()}
+                combination = {key: val // content
+                               for key, val in combination.iteritems()}
+        if vector:
+            basis.append((next(iter(vector)), vector, combination))
+        else:
+            content = _content(combination)
+            if combination[index] < 0:
+                content = -content
+            ret.append({key: val // content
+                        for key, val in combination.iteritems()})
+    return ret
+
+
+def _nullspace_mod(vectors, p):
+    """Do the work of nullspace() modulo the prime p."""
+    # as in nullspace(), but each reduced vector is scaled to have a 1 at its
+    # pivot
+    basis = []
+    ret = []
+    for index, vector in enumerate(vectors):
+        vector = {key: residue(val, p) for key, val in vector.iteritems()}
+        vector = {key: val for key, val in vector.iteritems() if val}
+        combination = {index: 1}
+        for pivot, basis_vector, basis_combination in basis:
+            v = vector.get(pivot)
+            if v:
+                vector = _axpy(1, vector, -v, basis_vector, p)
+                combination = _axpy(1, combination, -v, basis_combination, p)
+        if vector:
+            pivot = next(iter(vector))
+            inverse = _inverse_mod(vector[pivot], p)
+            basis.append((pivot,
+                          {key: val * inverse % p
+                           for key, val in vector.iteritems()},
+                          {key: val * inverse % p
+                           for key, val in combination.iteritems()}))
+        else:
+            ret.append(combination)
+    return ret
+
+
+def _axpy(a, x, b, y, modulus=None):
+    """
+    Return the sparse vector a * x + b * y, dropping zero entries, and
+    reducing entries modulo modulus if it is set.
+    """
+    ret = {key: a * val for key, val in x.iteritems()}
+    for key, val in y.iteritems():
+        new_val = ret.get(key, 0) + b * val
+        if modulus is not None:
+            new_val %= modulus
+        if new_val:
+            ret[key] = new_val
+        else:
+            ret.pop(key, None)
+    return ret
+
+
+class SparseMatrix:
+    """
+    Sparse matrix of a linear map, with columns indexed by a basis of the
+    domain.  The column of a basis key is a sparse vector (dict) giving the
+    image of that key.  Keys are typically VariableWord objects.
+
+    Matrices of composable maps multiply to the matrix of the composition;
+    sums, differences, negatives and scalar multiples are also supported.
+    """
+
+    def __init__(self, columns, domain=None):
+        """
+        Initialize the matrix.
+
+        Arguments:
+            columns (dict): keys are domain basis keys, values are sparse
+                vectors; a missing key is a zero column
+            domain (iterable): the domain basis, in order.  Default: the keys
+                of columns
+        """
+        self.domain = list(domain) if domain is not None else list(columns)
+        self.columns = {key: {row: val for row, val in
+                              columns.get(key, {}).iteritems() if val != 0}
+                        for key in self.domain}
+
+    def codomain(self):
+        """Return the set of keys with a nonzero entry in some column."""
+        return set(row for column in self.columns.itervalues()
+                   for row in column)
+
+    def __call__(self, vector):
+        """
+        Apply self to a sparse vector whose keys lie in self.domain, and
+        return the image as a sparse vector.
+        """
+        ret = {}
+        for key, coeff in vector.iteritems():
+            if coeff == 0:
+                continue
+            try:
+                column = self.columns[key]
+            except KeyError:
+                raise ValueError("{!r} is not in the domain".format(key))
+            for row, val in column.iteritems():
+                ret[row] = ret.get(row, 0) + coeff * val
+        return {key: val for key, val in ret.iteritems() if val != 0}
+
+    def __mul__(self, other):
+        """
+        Return the matrix of self composed with other, or self scaled by a
+        Number.  For composition, the codomain of other must lie in the
+        domain of self.
+        """
+        if isinstance(other, SparseMatrix):
+            return SparseMatrix({key: self(other.columns[key])
+                                 for key in other.domain},
+                                domain=other.domain)
+        elif isinstance(other, Number):
+            return SparseMatrix({key: {row: val * other for row, val in
+                                       column.iteritems()}
+                                 for key, column in self.columns.iteritems()},
+                                domain=self.domain)
+        else:
+            return NotImplemented
+
+    def __rmul__(self, other):
+        """Return other * self for a Number other."""
+        if isinstance(other, Number):
+            return SparseMatrix({key: {row: other * val for row, val in
+                                       column.iteritems()}
+                                 for key, column in self.columns.iteritems()},
+                                domain=self.domain)
+        else:
+            return NotImplemented
+
+    def __add__(self, other):
+        """Return the sum of two matrices with the same domain."""
+        if not isinstance(other, SparseMatrix):
+            return NotImplemented
+        if set(self.domain) != set(other.domain):
+            raise ValueError("matrices have different domains")
+        return SparseMatrix({key: _axpy(1, self.columns[key],
+                                        1, other.columns[key])
+                             for key in self.domain}, domain=self.domain)
+
+    def __sub__(self, other):
+        """Return self - other."""
+        return self + -1 * other
+
+    def __neg__(self):
+        """Return -1 * self."""
+        return -1 * self
+
+    def __eq__(self, other):
+        """Return True if other has the same domain and the same columns."""
+        if not isinstance(other, SparseMatrix):
+            return NotImplemented
+        return set(self.domain) == set(other.domain) and \
+            self.columns == other.columns
+
+    def __ne__(self, other):
+        """Return the negation of self == other."""
+        ret = self.__eq__(other)
+        return ret if ret is NotImplemented else not ret
+
+    def is_zero(self):
+        """Return True if every column is zero."""
+        return not any(self.columns.itervalues())
+
+    def kernel(self):
+        """
+        Return a basis of the kernel of self, as a list of sparse vectors
+        with integer entries whose keys lie in self.domain.
+        """
+        return [{self.domain[i]: val for i, val in relation.iteritems()}
+                for relation in nullspace([self.columns[key]
+                                           for key in self.domain])]
@@ -0,0 +1,136 @@
+"""spdaot.matcher
+
+Overview:
+    Defines the RelationMatcher class, an Aho-Corasick automaton over the
+    left-hand sides of known relations.  A single left-to-right pass over a
+    word finds the first place where some relation can be applied, no matter
+    how many relations are registered.
+
+Classes:
+    RelationMatcher: multi-pattern matcher for relation left-hand sides
+"""
+
+from collections import deque
+
+
+class RelationMatcher:
+    """
+    Aho-Corasick automaton whose patterns are left-hand sides of relations.
+
+    Patterns are sequences of hashable symbols (the factors of a
+    VariableWord).  Adding a pattern extends the trie immediately; failure
+    links are recomputed lazily, the next time a word is searched.
+    """
+
+    def __init__(self, relations=()):
+        """
+        Initialize an automaton recognizing the left-hand sides of relations.
+
+        Arguments:
+            relations (iterable): Relation objects to add
+        """
+        self.clear()
+        for relation in relations:
+            self.add(relation)
+
+    def clear(self):
+        """Forget all patterns."""
+        self._goto = [{}]
+        self._fail = [0]
+        self._depth = [0]
+        self._rule = [None]
+        self._match = [None]
+        self._size = 0
+        self._dirty = False
+
+    def __len__(self):
+        """Return the number of patterns."""
+        return self._size
+
+    def add(self, relation):
+        """
+        Add relation.lhs as a pattern.  If a relation with the same left-hand
+        side was added before, it is replaced by relation.
+        """
+        state = 0
+        for symbol in relation.lhs._w:
+            try:
+                state = self._goto[state][symbol]
+            except KeyError:
+                self._goto.append({})
+                self._fail.append(0)
+                self._depth.append(self._depth[state] + 1)
+                self._rule.append(None)
+                self._match.append(None)
+                self._goto[state][symbol] = len(self._goto) - 1
+                state = len(self._goto) - 1
+        if state == 0:
+            # an empty left-hand side never applies
+            return
+        if self._rule[state] is None:
+            self._size += 1
+        self._rule[state] = relation
+        self._dirty = True
+
+    def _build(self):
+        """Compute failure links and match states breadth first."""
+        goto, fail, rule, match = self._goto, self._fail, self._rule, \
+            self._match
+        queue = deque()
+        for state in goto[0].itervalues():
+            fail[state] = 0
+            queue.append(state)
+        while queue:
+            state = queue.popleft()
+            # the longest pattern which is a suffix of the current state
+            match[state] = state if rule[state] is not None \
+                else match[fail[state]]
+            for symbol, child in goto[state].iteritems():
+                queue.append(child)
+                back = fail[state]
+                while back and symbol not in goto[back]:
+                    back = fail[back]
+                fail[child] = goto[back].get(symbol, 0)
+        self._dirty = False
+
+    def find(self, word):
+        """
+        Find the first redex in word.
+
+        Arguments:
+            word (sequence): the factors of a VariableWord
+
+        Return value:
+            A tuple (start, end, relation) such that word[start:end] equals
+            relation.lhs, with end as small as possible and, among those,
+            start as small as possible.  If no relation applies, None.
+        """
+        if self._dirty:
+            self._build()
+        goto, fail, match = self._goto, self._fail, self._match
+        state = 0
+        for end, symbol in enumerate(word, 1):
+            while state and symbol not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(symbol, 0)
+            hit = match[state]
+            if hit is not None:
+                return end - self._depth[hit], end, self._rule[hit]
+        return None
+
+    def step(self, state, symbol):
+        """
+        Advance the automaton from state (0 is the initial state) by one
+        symbol.
+
+        Return value:
+            a tuple (new_state, matched), where matched is True if the left-
+            hand side of some relation ends with symbol
+        """
+        if self._dirty:
+            self._build()
+        goto, fail = self._goto, self._fail
+        while state and symbol not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(symbol, 0)
+        return state, self._match[state] is not None
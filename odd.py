@@ -1,10 +1,45 @@
 """TODO"""
 
+import inspect
+import sys
 from collections import defaultdict
+from functools import partial
+from hashlib import sha1
 from numbers import Number
 from .op import Op
 from .variable import Variable, VariableWord
 from .element import Element
+from .rings import laurent_polynomials
+from .frosting import cached
+from . import config
+
+
+def _source_digest():
+    """
+    Return a short hash of the source of this module, or None if it cannot
+    be read.
+    """
+    try:
+        source = inspect.getsource(sys.modules[__name__])
+    except (IOError, TypeError):
+        return None
+    return sha1(source).hexdigest()[:12]
+
+
+_SOURCE_DIGEST = _source_digest()
+"""str: identifies the code computing the images of the Op objects of this
+module, so that a Store never serves images computed by other code"""
+
+
+def _persistent_name(family, varletter, name):
+    """
+    Return a name identifying the Op called name in family, and the source
+    of this module, for keeping its images in a Store (see Op.memoized()).
+    Return None, so that images are not kept, if the source is unavailable.
+    """
+    if _SOURCE_DIGEST is None:
+        return None
+    return '{}({!r}).{}@{}'.format(family, varletter, name, _SOURCE_DIGEST)
 
 
 def minus_s(x, i, j=None, sign=1, varletter='x'):
@@ -58,9 +93,15 @@ def minus_Dn_generators(n, varletter='x'):
             return lambda f: minus_s(f, i, sign=1, varletter=varletter)
         elif s == -1:
             return lambda f: minus_s(f, i, sign=-1, varletter=varletter)
-    return tuple(Op(generator_factory(i, 1), name='-s_'+str(i)+'^+')
+    return tuple(Op(generator_factory(i, 1), name='-s_'+str(i)+'^+',
+                    linear=True, memo_size=config.op_image_cache_size,
+                    persistent=_persistent_name(
+                        'minus_Dn_generators', varletter, '-s_'+str(i)+'^+'))
                  for i in xrange(1, n)) + tuple(
-                 Op(generator_factory(i, -1), name='-s_'+str(i)+'^-')
+                 Op(generator_factory(i, -1), name='-s_'+str(i)+'^-',
+                    linear=True, memo_size=config.op_image_cache_size,
+                    persistent=_persistent_name(
+                        'minus_Dn_generators', varletter, '-s_'+str(i)+'^-'))
                  for i in xrange(1, n))
 
 
@@ -81,9 +122,17 @@ def Bn_plus_generators(n, varletter='x'):
             return lambda f: sig(f, i, sign=-1, varletter=varletter)
     return tuple(
         Op(generator_factory(i, 1),
-           name='sigma_'+str(i)+'^+') for i in xrange(1, n)) + tuple(
+           name='sigma_'+str(i)+'^+', linear=True,
+           memo_size=config.op_image_cache_size,
+           persistent=_persistent_name('Bn_plus_generators', varletter,
+                                       'sigma_'+str(i)+'^+'))
+        for i in xrange(1, n)) + tuple(
         Op(generator_factory(i, -1),
-            name='sigma_'+str(i)+'^-') for i in xrange(1, n))
+            name='sigma_'+str(i)+'^-', linear=True,
+            memo_size=config.op_image_cache_size,
+            persistent=_persistent_name('Bn_plus_generators', varletter,
+                                        'sigma_'+str(i)+'^-'))
+        for i in xrange(1, n))
 
 
 def _braided_differential_variable(var, x_values):
@@ -113,19 +162,44 @@ def _braided_differential_variable(var, x_values):
         raise TypeError
 
 
-def _braided_differential_vw(vw, x_values, braiding):
-    """Compute a braided differential on a VariableWord, return result."""
-    if not isinstance(vw, VariableWord):
-        raise TypeError
-    ret_terms = []
-    for i in xrange(len(vw)):
-        left = braiding(Element(VariableWord(*vw[:i]))) \
-            if i > 0 else Element(1)
-        middle = x_values[vw[i]]
-        right = Element(VariableWord(*vw[i+1:])) \
-            if i < len(vw) - 1 else Element(1)
-        ret_terms.append(left * middle * right)
-    return sum(ret_terms)
+@cached(relational=True)
+def _braided_variable(braiding, varname):
+    """
+    Return braiding(v) as an Element, for the variable v called varname.
+    Values are shared between calls, so they must not be modified.
+    """
+    ret = braiding(Element(VariableWord(varname)))
+    return ret if isinstance(ret, Element) else Element(ret)
+
+
+def _add_braided_differential_vw(terms, vw, coeff, x_values,
+                                 braided_variable):
+    """
+    Add coeff times the braided differential of a VariableWord vw to the dict
+    terms, without simplifying.
+
+    By the Leibniz rule, d(v_1 ... v_L) is the sum over i of
+    w(v_1 ... v_{i-1}) d(v_i) v_{i+1} ... v_L.  Since the braiding w is
+    multiplicative, the braided prefixes are built one variable at a time,
+    and only up to the last position where d(v_i) is nonzero.
+    """
+    positions = [i for i in xrange(len(vw)) if x_values[vw[i]] != 0]
+    if not positions:
+        return
+    prefix = None  # the braided prefix; None stands for 1
+    for i in xrange(positions[-1] + 1):
+        value = x_values[vw[i]]
+        if value != 0:
+            suffix = vw._w[i+1:]
+            if prefix is None:
+                terms[VariableWord._from_ids(suffix)] += coeff * value
+            else:
+                for varword, prefix_coeff in prefix.terms.iteritems():
+                    terms[VariableWord._from_ids(varword._w + suffix)] += \
+                        prefix_coeff * coeff * value
+        if i < positions[-1]:
+            braided = braided_variable(vw[i])
+            prefix = braided if prefix is None else prefix * braided
 
 
 def braided_differential(elt, x_values, braiding):
@@ -141,7 +215,10 @@ def braided_differential(elt, x_values, braiding):
             the value of d on the corresponding variable.  all values of
             x_values should be of type Number.  If x_values is a defaultdict,
             its default value should be 0.
-        braiding (callable): braiding(x) should be the Element for d(x)
+        braiding (callable): braiding(x) should be the Element for d(x).  It
+            must be multiplicative on monomials, i.e.
+            braiding(x y) = braiding(x) braiding(y), as is the case for
+            group elements acting by algebra automorphisms.
 
     Return value:
         an Element representing d(elt)
@@ -156,9 +233,16 @@ def braided_differential(elt, x_values, braiding):
     elif isinstance(elt, Number):
         return 0
     elif isinstance(elt, Element):
-        return sum(
-            _braided_differential_vw(
-                vw, x_values, braiding) * elt.terms[vw] for vw in elt.terms)
+        # accumulate the Leibniz rule terms of every monomial, then simplify
+        # only once
+        ret = Element()
+        braided_variable = partial(_braided_variable, braiding)
+        for vw, coeff in elt.terms.iteritems():
+            if coeff != 0:
+                _add_braided_differential_vw(ret.terms, vw, coeff, x_values,
+                                             braided_variable)
+        ret._simplify()
+        return ret
     else:
         raise TypeError
 
@@ -189,26 +273,53 @@ def minus_Dn_braided_differentials(n, varletter='x', isobaric=False):
 
     return tuple(
             Op(differential_factory(i, 1),
-                name=dee+'_'+str(i)+'^+') for i in xrange(1, n)) + tuple(
+                name=dee+'_'+str(i)+'^+', linear=True,
+                memo_size=config.op_image_cache_size,
+                persistent=_persistent_name('minus_Dn_braided_differentials',
+                                            varletter, dee+'_'+str(i)+'^+'))
+            for i in xrange(1, n)) + tuple(
             Op(differential_factory(i, -1),
-                name=dee+'_'+str(i)+'^-') for i in xrange(1, n))
+                name=dee+'_'+str(i)+'^-', linear=True,
+                memo_size=config.op_image_cache_size,
+                persistent=_persistent_name('minus_Dn_braided_differentials',
+                                            varletter, dee+'_'+str(i)+'^-'))
+            for i in xrange(1, n))
 
 
-def minus_Dn_hecke_generators(n, varletter='x', qletter='q'):
+def minus_Dn_hecke_generators(n, varletter='x', qletter='q', q=None):
     """
     Return Op objects for generators of the Hecke deformation of the isobaric
     braided differentials for -D_n.
+
+    By default, the Hecke parameter is the generator of
+    laurent_polynomials(qletter) (see the module rings), so q appears only
+    in coefficients.  To treat q as a central variable instead, as in
+    earlier versions, register it with add_central_variable(qletter) and
+    pass q=Element(qletter).
+
+    Arguments:
+        q: the Hecke parameter, a Number or an Element
     """
+    # images can only be kept in a Store if q is the same in every session
+    persistent = q is None
+    if q is None:
+        q = laurent_polynomials(qletter).gen
     isobarics = minus_Dn_braided_differentials(
         n, varletter=varletter, isobaric=True)
     sigmas = Bn_plus_generators(n, varletter=varletter)
 
+    def hecke(isobaric, sigma):
+        name = _persistent_name('minus_Dn_hecke_generators', varletter,
+                                '(1 - {}) {} + {}'.format(qletter, isobaric,
+                                                          sigma)) \
+            if persistent else None
+        return ((1 - q) * isobaric + sigma).memoized(
+            config.op_image_cache_size, persistent=name)
+
     ret = []
     for i in xrange(1, n):
-        ret.append((Element(1) - Element(qletter)) *
-                   isobarics[i-1] + sigmas[n-1+i-1])
+        ret.append(hecke(isobarics[i-1], sigmas[n-1+i-1]))
     for i in xrange(1, n):
-        ret.append((Element(1) - Element(qletter)) *
-                   isobarics[n-1+i-1] + sigmas[i-1])
+        ret.append(hecke(isobarics[n-1+i-1], sigmas[i-1]))
 
     return ret
@@ -3,28 +3,238 @@
 Overview:
     TODO
 
+    An Op may be declared linear.  A linear Op can be materialized as a
+    SparseMatrix on the span of a list of monomials, and compositions, sums
+    and scalar multiples of linear Ops are again linear.
+
+    A linear Op may also be memoized: it then applies itself term by term,
+    keeping the image of each VariableWord in a bounded cache which is
+    cleared whenever a relation is registered.  A memoized Op given a
+    persistent name also keeps images in the attached Store (see the module
+    store), so they survive from one session to the next.
+
+    Internally, an Op is an expression DAG whose nodes are leaves (wrapped
+    functions or constants), compositions, sums, scalings and memoized linear
+    maps.  Nested
+    compositions and sums are flattened, and nodes are hash-consed, so equal
+    subexpressions are shared.  Evaluation is iterative, so long products of
+    Ops do not hit the recursion limit, and within one call each node is
+    applied at most once to each intermediate value.
+
 Classes:
     Op: wrapper class for functions considered as elements of an algebra or
         group equipped with an action
 """
 
+from collections import defaultdict
 from numbers import Number
 from types import FunctionType, LambdaType
-from .frosting import compose
+from weakref import WeakValueDictionary
+from .variable import VariableWord
+from .element import Element
+from .algebra import current_algebra
+from . import relation
+from .store import active_store
+from .linalg import SparseMatrix
+from .frosting import LRUCache
+
+
+_LEAF, _CONST, _COMPOSE, _SUM, _LSCALE, _RSCALE, _MEMO = range(7)
+"""node kinds: a wrapped function, a constant function, a composition of
+children (the last child is applied first), a sum of children, a child
+multiplied by a fixed value on the left or on the right, and a linear child
+applied term by term with an LRUCache of monomial images as payload"""
+
+
+class _Node(object):
+    """A node of an Op expression DAG.  Build nodes with _node() only."""
+
+    __slots__ = ('kind', 'children', 'payload', '__weakref__')
 
+    def __init__(self, kind, children, payload):
+        self.kind = kind
+        self.children = children
+        self.payload = payload
 
-class Op:
+
+_nodes = WeakValueDictionary()
+"""WeakValueDictionary: hash-consing table of all live _Node objects"""
+
+
+def _payload_key(payload):
+    """Return a hashable key identifying payload."""
+    if isinstance(payload, Number):
+        return type(payload), payload
+    return id(payload)
+
+
+def _node(kind, children=(), payload=None):
+    """
+    Return the node with the given kind, children and payload, creating it
+    only if no equal node exists.  Nested compositions and sums are
+    flattened.
+    """
+    if kind in (_COMPOSE, _SUM):
+        flat = []
+        for child in children:
+            if child.kind == kind:
+                flat.extend(child.children)
+            else:
+                flat.append(child)
+        children = tuple(flat)
+    key = (kind, children, _payload_key(payload))
+    try:
+        return _nodes[key]
+    except KeyError:
+        node = _nodes[key] = _Node(kind, children, payload)
+        return node
+
+
+def _evaluate(root, x):
+    """
+    Evaluate the expression DAG root on x without recursion.
+
+    Results are memoized for the duration of the call, keyed by node and by
+    the identity of the value the node is applied to, so shared
+    subexpressions are computed once.
+    """
+    memo = {}
+    # keep every argument alive, so that ids are not reused during the call
+    arguments = []
+    # frames are [node, argument, stage, partial sum]
+    stack = [[root, x, 0, None]]
+    result = None
+    while stack:
+        frame = stack[-1]
+        node, arg, stage = frame[0], frame[1], frame[2]
+        kind = node.kind
+        if stage == 0 and (node, id(arg)) in memo:
+            result = memo[(node, id(arg))]
+            stack.pop()
+            continue
+
+        if kind == _LEAF:
+            result = node.payload(arg)
+        elif kind == _MEMO:
+            result = _apply_memoized(node, arg)
+        elif kind == _CONST:
+            result = node.payload
+        elif kind == _COMPOSE:
+            # result holds the value of the previously applied child
+            current = result if stage > 0 else arg
+            if stage < len(node.children):
+                frame[2] = stage + 1
+                stack.append([node.children[-1 - stage], current, 0, None])
+                continue
+            result = current
+        elif kind == _SUM:
+            if stage > 0:
+                frame[3] = result if stage == 1 else frame[3] + result
+            if stage < len(node.children):
+                frame[2] = stage + 1
+                stack.append([node.children[stage], arg, 0, None])
+                continue
+            result = frame[3]
+        else:
+            if stage == 0:
+                frame[2] = 1
+                stack.append([node.children[0], arg, 0, None])
+                continue
+            if kind == _LSCALE:
+                result = node.payload * result
+            else:
+                result = result * node.payload
+
+        memo[(node, id(arg))] = result
+        arguments.append(arg)
+        stack.pop()
+    return result
+
+
+def _apply_memoized(node, x):
+    """
+    Apply the linear expression DAG node.children[0] to x term by term,
+    using and filling the cache node.payload of monomial images.  This runs
+    in the Algebra of x (see the module algebra).
+    """
+    if not isinstance(x, Element):
+        x = Element(x)
+    if x.algebra is not current_algebra():
+        with x.algebra:
+            return _apply_memoized(node, x)
+    cache = node.payload
+    if cache not in relation.dependent_caches:
+        # the images were computed in another Algebra (see the module
+        # algebra), so they must not be used here
+        return _evaluate(node.children[0], x)
+    terms = defaultdict(int)
+    for vw, coeff in x.terms.iteritems():
+        if coeff == 0:
+            continue
+        image = cache.get(vw)
+        if image is None:
+            store = active_store() if cache.name is not None else None
+            if store is not None:
+                image = store.get_word(cache.name, vw)
+            if image is None:
+                value = _evaluate(node.children[0], Element(vw))
+                if not isinstance(value, Element):
+                    value = Element(value)
+                image = tuple((varword, val) for varword, val
+                              in value.terms.iteritems() if val != 0)
+                if store is not None:
+                    store.put_word(cache.name, vw, image)
+            cache[vw] = image
+        for varword, val in image:
+            terms[varword] += coeff * val
+    ret = Element()
+    ret.terms = terms
+    ret._drop_zeros()
+    return ret
+
+
+def _wrap(func):
+    """Return the node of an Op, or a leaf node wrapping a function."""
+    return func._node if isinstance(func, Op) else _node(_LEAF, payload=func)
+
+
+class Op(object):
     """
     TODO: docstring
     """
 
-    def __init__(self, func, name=None):
-        """Initialize self by setting _f equal to the argument."""
-        self._f = func
+    def __init__(self, func, name=None, linear=False, memo_size=None,
+                 persistent=None):
+        """
+        Initialize self as a leaf wrapping the argument.
+
+        Arguments:
+            func (callable): the action of self
+            name (str): a name for printing
+            linear (bool): True declares that func is linear over scalars
+                (Numbers), so that self(x) is determined by the values of
+                self on the monomials of x
+            memo_size (int): if set, self must be linear, and is memoized as
+                in Op.memoized(memo_size, persistent)
+            persistent (str): see Op.memoized()
+        """
+        self._node = _node(_LEAF, payload=func)
+        self.linear = linear
         try:
             self.name = str(name)
         except:
             self.name = None
+        if memo_size is not None:
+            self._node = self.memoized(memo_size, persistent)._node
+
+    @classmethod
+    def _from_node(cls, node, linear=False):
+        """Return an unnamed Op with the given expression DAG."""
+        ret = object.__new__(cls)
+        ret._node = node
+        ret.linear = linear
+        ret.name = str(None)
+        return ret
 
     def __mul__(self, other):
         """
@@ -35,12 +245,14 @@ class Op:
         possible.
         """
         if isinstance(other, Op):
-            return Op(compose(self._f, other._f))
+            return Op._from_node(_node(_COMPOSE, (self._node, other._node)),
+                                 linear=self.linear and other.linear)
         elif isinstance(other, FunctionType) or isinstance(other, LambdaType):
-            return Op(compose(self._f, other))
+            return Op._from_node(_node(_COMPOSE, (self._node, _wrap(other))))
         else:
             try:
-                return Op(lambda x: self._f(x) * other)
+                return Op._from_node(_node(_RSCALE, (self._node,), other),
+                                     linear=self.linear)
             except:
                 return NotImplemented
 
@@ -55,10 +267,11 @@ class Op:
         # the case isinstance(other, Op) will never happen, since in that
         # case, other.__mul__() will be called instead
         if isinstance(other, FunctionType) or isinstance(other, LambdaType):
-            return Op(compose(other, self._f))
+            return Op._from_node(_node(_COMPOSE, (_wrap(other), self._node)))
         else:
             try:
-                return Op(lambda x: other * self._f(x))
+                return Op._from_node(_node(_LSCALE, (self._node,), other),
+                                     linear=self.linear)
             except:
                 return NotImplemented
 
@@ -71,12 +284,14 @@ class Op:
         function and does the same.
         """
         if isinstance(other, Op):
-            return Op(lambda x: self._f(x) + other._f(x))
+            return Op._from_node(_node(_SUM, (self._node, other._node)),
+                                 linear=self.linear and other.linear)
         elif isinstance(other, FunctionType) or isinstance(other, LambdaType):
-            return Op(lambda x: self._f(x) + other(x))
+            return Op._from_node(_node(_SUM, (self._node, _wrap(other))))
         else:
             try:
-                return Op(lambda x: self._f(x) + other)
+                return Op._from_node(_node(_SUM, (
+                    self._node, _node(_CONST, payload=other))))
             except:
                 assert Number  # silence Flake8 until we implement this TODO
                 return NotImplemented
@@ -90,12 +305,14 @@ class Op:
         function and does the same.
         """
         if isinstance(other, Op):
-            return Op(lambda x: self._f(x) + other._f(x))
+            return Op._from_node(_node(_SUM, (self._node, other._node)),
+                                 linear=self.linear and other.linear)
         elif isinstance(other, FunctionType) or isinstance(other, LambdaType):
-            return Op(lambda x: self._f(x) + other(x))
+            return Op._from_node(_node(_SUM, (self._node, _wrap(other))))
         else:
             try:
-                return Op(lambda x: self._f(x) + other)
+                return Op._from_node(_node(_SUM, (
+                    self._node, _node(_CONST, payload=other))))
             except:
                 return NotImplemented
 
@@ -108,8 +325,83 @@ class Op:
         return other + -1 * self
 
     def __call__(self, other):
-        """Act on other with self._f."""
-        return self._f(other)
+        """Act on other by evaluating the expression DAG of self."""
+        return _evaluate(self._node, other)
+
+    def memoized(self, maxsize=None, persistent=None):
+        """
+        Return a memoized copy of the linear Op self.
+
+        The copy acts on an Element term by term.  The image of each
+        VariableWord is computed once and kept in an LRUCache holding at most
+        maxsize images (None for no bound), and the result is assembled as a
+        linear combination of cached images.  The cache is cleared whenever a
+        relation is registered.
+
+        If persistent is set, it must be a name identifying the action of
+        self in every session, and images are also kept under that name in
+        the attached Store (see the module store).  The name must change
+        whenever the code computing the images does; the names used in the
+        module odd include a hash of its source.
+        """
+        if not self.linear:
+            raise ValueError("only a linear Op can be memoized")
+        cache = LRUCache(maxsize, name=persistent)
+        relation.dependent_caches.add(cache)
+        ret = Op._from_node(_node(_MEMO, (self._node,), cache), linear=True)
+        ret.name = self.name
+        return ret
+
+    def cache_stats(self):
+        """
+        Return the statistics of the image cache of a memoized Op (see
+        LRUCache.stats()), or None if self is not memoized.
+        """
+        if self._node.kind == _MEMO:
+            return self._node.payload.stats()
+        return None
+
+    def matrix(self, basis):
+        """
+        Return the matrix of self on the span of basis.
+
+        Compositions, sums and scalar multiples are computed as products,
+        sums and multiples of the matrices of their parts; everything else is
+        applied to each monomial of basis.
+
+        Arguments:
+            basis (iterable): monomials, each a VariableWord, Variable, string,
+                or Element of the form 1 * vw
+
+        Return value:
+            a SparseMatrix whose column for each VariableWord vw in basis is
+            self(Element(vw)), as a dict from VariableWord to coefficient
+        """
+        if not self.linear:
+            raise ValueError("only a linear Op has a matrix")
+        domain = []
+        for vw in basis:
+            if isinstance(vw, Element):
+                vw = vw.as_vw()
+                if vw is False:
+                    raise ValueError("basis elements must be monomials")
+            elif not isinstance(vw, VariableWord):
+                vw = VariableWord(vw)
+            domain.append(vw)
+        return _matrix(self._node, domain)
+
+    @classmethod
+    def from_matrix(cls, matrix, name=None):
+        """
+        Return the linear Op acting on Elements by a SparseMatrix whose keys
+        are VariableWord objects.  The Op raises ValueError on an Element
+        outside the span of matrix.domain.
+        """
+        def func(x):
+            if not isinstance(x, Element):
+                x = Element(x)
+            return Element(matrix(x.terms))
+        return cls(func, name=name, linear=True)
 
     def __str__(self):
         """Print self.name"""
@@ -119,5 +411,27 @@ class Op:
         """Print self.name"""
         return self.name
 
-identity = Op(lambda x: x, name='id')
+
+def _matrix(node, domain):
+    """
+    Return the SparseMatrix of the linear expression DAG node on the span of
+    domain, a list of VariableWord objects.
+    """
+    if node.kind == _COMPOSE:
+        ret = _matrix(node.children[-1], domain)
+        for child in reversed(node.children[:-1]):
+            ret = _matrix(child, list(ret.codomain())) * ret
+        return ret
+    elif node.kind == _SUM:
+        return sum((_matrix(child, domain) for child in node.children[1:]),
+                   _matrix(node.children[0], domain))
+    elif node.kind in (_LSCALE, _RSCALE) and \
+            isinstance(node.payload, Number):
+        return node.payload * _matrix(node.children[0], domain)
+    else:
+        return SparseMatrix({vw: _evaluate(node, Element(vw)).terms
+                             for vw in domain}, domain=domain)
+
+
+identity = Op(lambda x: x, name='id', linear=True)
 """Op object for the identity operator."""
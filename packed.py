@@ -0,0 +1,341 @@
+"""spdaot.packed
+
+Overview:
+    Defines the PackedElement class, an alternative storage for large
+    Elements.  Instead of a dict from VariableWord to coefficient, a
+    PackedElement keeps two parallel arrays: the interned ids of its
+    monomials, sorted, and their nonzero coefficients.  Addition,
+    subtraction and comparison are merges of sorted arrays, and scaling is a
+    single vectorized multiplication.
+
+    With NumPy, coefficients are stored with dtype int64 while they are
+    small integers, float64 for floating point values, and object (Python
+    numbers) otherwise; an int64 array is widened to object before any
+    operation which could overflow.  Without NumPy, the arrays are Python
+    lists and merges are done in Python.
+
+    Every monomial which has appeared in a PackedElement keeps its id for
+    the rest of the session, like variable names in the module variable.
+    A PackedElement belongs to the Algebra of the Element it was packed from
+    (see the module algebra), and multiplies in it.
+
+Classes:
+    PackedElement: linear combination of monomials stored as sorted arrays
+"""
+
+from collections import defaultdict
+from numbers import Number, Integral
+from .variable import VariableWord
+from .element import Element, _in_own_algebra, _check_algebra
+from .relation import normal_form
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+_monomial_ids = {}
+"""dict: keys are VariableWord objects, values are their interned ids"""
+
+_monomials = []
+"""list: _monomials[i] is the VariableWord with interned id i"""
+
+_INT64_BOUND = 2 ** 62
+"""int: int64 coefficients below this bound in absolute value can be added
+without overflow"""
+
+
+def _monomial_id(vw):
+    """Return the integer id of a VariableWord, assigning one if needed."""
+    try:
+        return _monomial_ids[vw]
+    except KeyError:
+        _monomial_ids[vw] = len(_monomials)
+        _monomials.append(vw)
+        return _monomial_ids[vw]
+
+
+def _coeff_array(values):
+    """Return a NumPy array of coefficients with the narrowest safe dtype."""
+    if all(isinstance(val, Integral) and -_INT64_BOUND < val < _INT64_BOUND
+           for val in values):
+        return numpy.array(values, dtype=numpy.int64)
+    if all(isinstance(val, float) or
+           (isinstance(val, Integral) and -_INT64_BOUND < val < _INT64_BOUND)
+           for val in values):
+        return numpy.array(values, dtype=numpy.float64)
+    ret = numpy.empty(len(values), dtype=object)
+    ret[:] = values
+    return ret
+
+
+def _max_abs(coeffs):
+    """Return the largest absolute value in an int64 array, or 0."""
+    return int(numpy.abs(coeffs).max()) if len(coeffs) else 0
+
+
+def _safe_sum_arrays(c1, c2):
+    """Widen int64 arrays to object if c1 + c2 could overflow."""
+    if c1.dtype == numpy.int64 and c2.dtype == numpy.int64 and \
+            (_max_abs(c1) >= _INT64_BOUND or _max_abs(c2) >= _INT64_BOUND):
+        return c1.astype(object), c2.astype(object)
+    return c1, c2
+
+
+def _merge(ids1, coeffs1, ids2, coeffs2):
+    """
+    Return the arrays (ids, coeffs) of the sum of two packed linear
+    combinations, dropping zero coefficients.
+    """
+    if numpy is not None:
+        coeffs1, coeffs2 = _safe_sum_arrays(coeffs1, coeffs2)
+        ids = numpy.union1d(ids1, ids2)
+        coeffs = numpy.zeros(len(ids), dtype=numpy.result_type(coeffs1,
+                                                                coeffs2))
+        coeffs[numpy.searchsorted(ids, ids1)] = coeffs1
+        coeffs[numpy.searchsorted(ids, ids2)] += coeffs2
+        keep = coeffs != 0
+        return ids[keep], coeffs[keep]
+
+    ids, coeffs = [], []
+    i, j = 0, 0
+    while i < len(ids1) and j < len(ids2):
+        if ids1[i] < ids2[j]:
+            ids.append(ids1[i])
+            coeffs.append(coeffs1[i])
+            i += 1
+        elif ids1[i] > ids2[j]:
+            ids.append(ids2[j])
+            coeffs.append(coeffs2[j])
+            j += 1
+        else:
+            coeff = coeffs1[i] + coeffs2[j]
+            if coeff != 0:
+                ids.append(ids1[i])
+                coeffs.append(coeff)
+            i += 1
+            j += 1
+    ids.extend(ids1[i:])
+    coeffs.extend(coeffs1[i:])
+    ids.extend(ids2[j:])
+    coeffs.extend(coeffs2[j:])
+    return ids, coeffs
+
+
+class PackedElement(object):
+    """
+    A linear combination of monomials, stored as a sorted array of interned
+    monomial ids and a parallel array of nonzero coefficients.  Relations
+    are applied on construction, as for Element.
+
+    PackedElement objects support +, -, scaling by Numbers, multiplication
+    (by PackedElement and Element objects) and equality; unpack() returns
+    the equivalent Element.
+
+    Attributes:
+        ids: the sorted interned ids of the monomials of self
+        coeffs: their nonzero coefficients
+        algebra (Algebra): the algebra of self (see the module algebra)
+    """
+
+    __slots__ = ('ids', 'coeffs', 'algebra')
+
+    def __init__(self, x=0):
+        """
+        Initialize self as a packed copy of x.
+
+        Arguments:
+            x: an Element, or anything accepted by the Element constructor
+        """
+        if isinstance(x, PackedElement):
+            self.ids, self.coeffs, self.algebra = x.ids, x.coeffs, x.algebra
+            return
+        if not isinstance(x, Element):
+            x = Element(x)
+        packed = PackedElement._from_terms(x.terms, x.algebra)
+        self.ids, self.coeffs, self.algebra = \
+            packed.ids, packed.coeffs, packed.algebra
+
+    @classmethod
+    def _from_terms(cls, terms, algebra):
+        """
+        Return a PackedElement of algebra from a dict of terms in normal
+        form.
+        """
+        items = sorted((_monomial_id(vw), coeff)
+                       for vw, coeff in terms.iteritems() if coeff != 0)
+        ids = [i for i, _ in items]
+        coeffs = [coeff for _, coeff in items]
+        if numpy is not None:
+            return cls._from_arrays(numpy.array(ids, dtype=numpy.int64),
+                                    _coeff_array(coeffs), algebra)
+        return cls._from_arrays(ids, coeffs, algebra)
+
+    @classmethod
+    def _from_arrays(cls, ids, coeffs, algebra):
+        """Return a PackedElement with the given (trusted) arrays."""
+        ret = object.__new__(cls)
+        ret.ids = ids
+        ret.coeffs = coeffs
+        ret.algebra = algebra
+        return ret
+
+    def unpack(self):
+        """Return self as an Element."""
+        ret = Element(algebra=self.algebra)
+        ret.terms = defaultdict(int, self.iteritems())
+        return ret
+
+    def iteritems(self):
+        """Iterate over pairs (vw, coeff) with coeff nonzero."""
+        coeffs = self.coeffs.tolist() if numpy is not None else self.coeffs
+        for i, coeff in zip(self.ids, coeffs):
+            yield _monomials[i], coeff
+
+    def __iter__(self):
+        """Iterate over VariableWord objects that are terms of self."""
+        for i in self.ids:
+            yield _monomials[i]
+
+    def __len__(self):
+        """Return the number of terms of self."""
+        return len(self.ids)
+
+    def __nonzero__(self):
+        """Return False if self is zero."""
+        return len(self.ids) > 0
+
+    def __getitem__(self, vw):
+        """Return the coefficient of a VariableWord in self."""
+        i = _monomial_ids.get(vw)
+        if i is None:
+            return 0
+        if numpy is not None:
+            k = int(numpy.searchsorted(self.ids, i))
+            if k < len(self.ids) and self.ids[k] == i:
+                coeff = self.coeffs[k]
+                return coeff.item() if isinstance(coeff, numpy.generic) \
+                    else coeff
+            return 0
+        try:
+            return self.coeffs[self.ids.index(i)]
+        except ValueError:
+            return 0
+
+    def _coerce(self, other):
+        """
+        Return other as a PackedElement of the algebra of self, or None if it
+        is unsupported.  Raise ValueError if other belongs to another
+        algebra.
+        """
+        if isinstance(other, (VariableWord, Number)):
+            other = Element(other, algebra=self.algebra)
+        if isinstance(other, Element):
+            other = PackedElement(other)
+        if not isinstance(other, PackedElement):
+            return None
+        _check_algebra(self, other)
+        return other
+
+    def __add__(self, other):
+        """Return the sum of self and other."""
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        ids, coeffs = _merge(self.ids, self.coeffs, other.ids, other.coeffs)
+        return PackedElement._from_arrays(ids, coeffs, self.algebra)
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        """Return -1 * self."""
+        return self._scale(-1)
+
+    def __sub__(self, other):
+        """Return self - other."""
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        return self + -other
+
+    def __rsub__(self, other):
+        """Return other - self."""
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        return other + -self
+
+    def _scale(self, scalar):
+        """Return scalar * self for a Number scalar."""
+        if scalar == 0:
+            return PackedElement(Element(algebra=self.algebra))
+        if numpy is None:
+            return PackedElement._from_arrays(
+                list(self.ids), [scalar * coeff for coeff in self.coeffs],
+                self.algebra)
+        coeffs = self.coeffs
+        if coeffs.dtype == numpy.int64 and not (
+                isinstance(scalar, Integral) and
+                abs(scalar) * _max_abs(coeffs) < 2 ** 63) and \
+                not isinstance(scalar, float):
+            coeffs = coeffs.astype(object)
+        coeffs = coeffs * scalar
+        keep = coeffs != 0
+        return PackedElement._from_arrays(self.ids[keep], coeffs[keep],
+                                          self.algebra)
+
+    @_in_own_algebra
+    def __mul__(self, other):
+        """Return self * other, for a Number or an Element-like other."""
+        if isinstance(other, Number):
+            return self._scale(other)
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        terms = defaultdict(int)
+        for vw1, c1 in self.iteritems():
+            for vw2, c2 in other.iteritems():
+                for varword, nf_coeff in normal_form(vw1 * vw2):
+                    terms[varword] += nf_coeff * c1 * c2
+        return PackedElement._from_terms(terms, self.algebra)
+
+    def __rmul__(self, other):
+        """Return other * self."""
+        if isinstance(other, Number):
+            return self._scale(other)
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        return other * self
+
+    def __eq__(self, other):
+        """
+        Return True or False according to equality.  Elements of different
+        algebras are never equal.
+        """
+        if isinstance(other, (PackedElement, Element)) and \
+                other.algebra is not self.algebra:
+            return False
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        if len(self.ids) != len(other.ids):
+            return False
+        if numpy is None:
+            return self.ids == other.ids and self.coeffs == other.coeffs
+        return bool(numpy.array_equal(self.ids, other.ids) and
+                    (self.coeffs == other.coeffs).all())
+
+    def __ne__(self, other):
+        """Return the negation of self == other."""
+        ret = self.__eq__(other)
+        return ret if ret is NotImplemented else not ret
+
+    def __str__(self):
+        """Stringify self."""
+        return str(self.unpack())
+
+    def __repr__(self):
+        """Stringify self."""
+        return repr(self.unpack())
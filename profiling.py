@@ -0,0 +1,154 @@
+"""spdaot.profiling
+
+Overview:
+    Opt-in counters for the rewriting done by Element._simplify() and
+    apply_relations(): how often each relation fires, how many words are
+    examined, the time spent finding redexes (matching) and substituting
+    right-hand sides (applying), the largest number of pending terms, and
+    the hits and misses of the normal form cache.
+
+    Counters are only kept while a RewriteProfile is active:
+
+        with RewriteProfile() as profile:
+            (x1 + x2 + x3) ** 4
+        print profile.to_json()
+
+    When no RewriteProfile is active, the instrumented code only tests
+    whether one is, once per call.  If RewriteProfile objects are nested,
+    only the innermost one counts.
+
+Classes:
+    RewriteProfile: counters for the rewriting done while it is active
+
+Functions:
+    active_profile(): the active RewriteProfile, or None
+"""
+
+import json
+from collections import defaultdict
+from timeit import default_timer
+
+_stack = []
+"""list: the started RewriteProfile objects, innermost last"""
+
+_active = None
+"""RewriteProfile: the innermost started RewriteProfile, or None"""
+
+
+def active_profile():
+    """Return the active RewriteProfile, or None."""
+    return _active
+
+
+class RewriteProfile(object):
+    """
+    Counters for the rewriting done while self is active.  Use self as a
+    context manager, or call start() and stop().
+
+    Attributes:
+        fired (defaultdict): keys are Relation objects, values the number of
+            times each was applied
+        simplify_calls (int): calls to Element._simplify()
+        apply_calls (int): calls to apply_relations()
+        words (int): words searched for a redex by apply_relations()
+        rewrites (int): relations applied, in all
+        match_time, apply_time (float): seconds spent finding redexes and
+            substituting right-hand sides
+        peak_terms (int): the largest number of terms of an Element being
+            simplified, or of pending words in apply_relations()
+        normal_form_hits, normal_form_misses (int): lookups in the normal
+            form cache (see relation.normal_forms)
+        elapsed (float): seconds during which self was active
+    """
+
+    def __init__(self):
+        """Initialize all counters to zero."""
+        self.fired = defaultdict(int)
+        self.simplify_calls = self.apply_calls = 0
+        self.words = self.rewrites = self.peak_terms = 0
+        self.match_time = self.apply_time = self.elapsed = 0.
+        self.normal_form_hits = self.normal_form_misses = 0
+        self._cache = self._cache_stats = self._started = None
+
+    def start(self):
+        """Start counting."""
+        global _active
+        from . import relation
+        _stack.append(self)
+        _active = self
+        self._cache = relation.normal_forms
+        self._cache_stats = self._cache.stats()
+        self._started = default_timer()
+
+    def stop(self):
+        """Stop counting."""
+        global _active
+        self.elapsed += default_timer() - self._started
+        stats = self._cache.stats()
+        self.normal_form_hits += stats['hits'] - self._cache_stats['hits']
+        self.normal_form_misses += \
+            stats['misses'] - self._cache_stats['misses']
+        _stack.remove(self)
+        _active = _stack[-1] if _stack else None
+
+    def __enter__(self):
+        """Start counting."""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stop counting."""
+        self.stop()
+
+    def _matched(self, clock):
+        """Count a search for a redex which began at time clock."""
+        now = default_timer()
+        self.words += 1
+        self.match_time += now - clock
+        return now
+
+    def _rewrote(self, relation, pending, clock):
+        """Count an application of relation which began at time clock."""
+        self.apply_time += default_timer() - clock
+        self.rewrites += 1
+        self.fired[relation] += 1
+        if pending > self.peak_terms:
+            self.peak_terms = pending
+
+    def _simplifying(self, terms):
+        """Count a call to Element._simplify() on so many terms."""
+        self.simplify_calls += 1
+        if terms > self.peak_terms:
+            self.peak_terms = terms
+
+    def hot_relations(self, count=10):
+        """
+        Return the list of the count most applied relations, as pairs
+        (relation, times applied), most applied first.
+        """
+        return sorted(self.fired.iteritems(),
+                      key=lambda item: -item[1])[:count]
+
+    def report(self):
+        """
+        Return the counters as a dict of JSON-compatible values; relations
+        are stringified.
+        """
+        return {
+            'relations': {str(relation): count
+                          for relation, count in self.fired.iteritems()},
+            'simplify_calls': self.simplify_calls,
+            'apply_calls': self.apply_calls,
+            'words': self.words,
+            'rewrites': self.rewrites,
+            'match_time': self.match_time,
+            'apply_time': self.apply_time,
+            'peak_terms': self.peak_terms,
+            'normal_form_hits': self.normal_form_hits,
+            'normal_form_misses': self.normal_form_misses,
+            'elapsed': self.elapsed,
+        }
+
+    def to_json(self, **kwargs):
+        """Return report() as a JSON string; kwargs go to json.dumps()."""
+        return json.dumps(self.report(), **kwargs)
@@ -4,10 +4,11 @@ Overview:
     The only types of relations currently supported are of the form
     x = \sum_i c_i y_i
     x and each y_i are of type VariableWord and each c_i is a numeric type.
-    Relations are stored in an ordered fashion, and they are applied accoridng
-    to this order.  The user is expected to load relations in the order (s)he
-    wants, and there is no check performed to make sure the
-    relation-application loop terminates.
+    When several relations apply to a word, the one whose left-hand side
+    ends first in the word is applied (the longest one, if several end at the
+    same place).  There is no check performed to make sure the
+    relation-application loop terminates; the module rewriting can orient
+    and complete the known relations into a terminating, confluent system.
 
     In particular, declaring both relations
     a * b = b * a
@@ -15,19 +16,202 @@ Overview:
     a * b = b * a
     will lead to an infinite loop whenever the sub-expression x * y is found.
 
+    Every registered relation is also added to lhs_index, an automaton which
+    finds the first applicable relation in a word in a single pass.
+
+    Since applying relations is linear, the normal form of each VariableWord
+    is computed once and kept in the bounded cache normal_forms until a new
+    relation is registered.
+
+    While a RewriteProfile is active (see the module profiling),
+    apply_relations() counts the relations it applies and times its work.
+
+    config.relations, lhs_index, normal_forms and dependent_caches belong to
+    the current Algebra (see the module algebra), and are replaced whenever
+    another Algebra becomes current; always refer to them through this
+    module.
+
 Classes:
     Relation: class for representing relations among known variables
+
+Functions:
+    clear_relations(): forget every known relation
+    find_redex(): find the first place a known relation applies in a word
+    apply_relations(): apply relations to a linear combination of words
+    normal_form(): the result of applying relations to a VariableWord
 """
 
+from collections import defaultdict
 from numbers import Number
+from timeit import default_timer
+from weakref import WeakSet
 from .variable import Variable, VariableWord
+from .matcher import RelationMatcher
+from .frosting import LRUCache
+from .rings import current_ring
+from .store import active_store
+from .profiling import active_profile
 from . import config
 
 
+lhs_index = RelationMatcher()
+"""RelationMatcher: indexes the left-hand sides of config.relations"""
+
+normal_forms = LRUCache(config.normal_form_cache_size)
+"""LRUCache: keys are of type VariableWord, values are normal forms
+
+Call normal_forms.stats() for hit, miss and eviction counts.  The bound can be
+changed at any time by setting normal_forms.maxsize.
+"""
+
+dependent_caches = WeakSet()
+"""WeakSet: LRUCache objects holding values which depend on config.relations
+(such as images of monomials under an Op); they are cleared along with
+normal_forms"""
+
+
+def clear_caches():
+    """
+    Clear normal_forms and every cache in dependent_caches, and point the
+    attached Store (see the module store) at the new set of relations.
+    """
+    normal_forms.clear()
+    for cache in list(dependent_caches):
+        cache.clear()
+    store = active_store()
+    if store is not None:
+        store.invalidate()
+
+
+def clear_relations():
+    """Forget every known relation, along with all cached values."""
+    config.relations.clear()
+    lhs_index.clear()
+    clear_caches()
+
+
+def synced_index():
+    """Return lhs_index, after making sure it indexes config.relations."""
+    if len(lhs_index) != len(config.relations):
+        # config.relations was modified without going through
+        # Relation._register(), so re-index it from scratch
+        lhs_index.clear()
+        clear_caches()
+        for relation in config.relations.itervalues():
+            lhs_index.add(relation)
+    return lhs_index
+
+
+def find_redex(word):
+    """
+    Find the first redex in word among config.relations.
+
+    Arguments:
+        word (sequence): the factors of a VariableWord
+
+    Return value:
+        see RelationMatcher.find()
+    """
+    return synced_index().find(word)
+
+
+def apply_relations(terms, index=None):
+    """
+    Apply relations from config.relations (or the rules of index) to terms
+    while possible.
+
+    This is a worklist algorithm: only words created or modified by a
+    rewrite are examined again, words whose coefficients have cancelled are
+    skipped when they come up, and words with a cached normal form are
+    replaced by it at once.
+
+    Arguments:
+        terms (dict): keys are of type VariableWord, values are coefficients;
+            this dict is emptied in the process
+        index (RelationMatcher): if set, apply the rules it indexes (objects
+            with the attributes lhs and rhs of a Relation) instead of
+            config.relations, without using normal_forms
+
+    Return value:
+        a dict with all relations applied and zero coefficients removed
+    """
+    profile = active_profile()
+    if profile is not None:
+        profile.apply_calls += 1
+    if index is None:
+        index = synced_index()
+        cache = normal_forms
+    else:
+        cache = None
+    ret = defaultdict(int)
+    worklist = list(terms)
+    while worklist:
+        word = worklist.pop()
+        coeff = terms.pop(word)
+        if coeff == 0:
+            continue
+
+        if cache is not None and word in cache:
+            for varword, nf_coeff in cache.get(word):
+                ret[varword] += nf_coeff * coeff
+            continue
+
+        if profile is None:
+            redex = index.find(word._w)
+        else:
+            clock = default_timer()
+            redex = index.find(word._w)
+            clock = profile._matched(clock)
+        if redex is None:
+            ret[word] += coeff
+            continue
+
+        # replace the left-hand side found inside word by the right-hand
+        # side, and queue up every word which wasn't already pending
+        start, end, relation = redex
+        before = word._w[:start]
+        after = word._w[end:]
+        for rhs_coeff, varword in relation.rhs:
+            new_word = VariableWord._from_ids(before + varword._w + after)
+            if new_word in terms:
+                terms[new_word] += rhs_coeff * coeff
+            else:
+                terms[new_word] = rhs_coeff * coeff
+                worklist.append(new_word)
+        if profile is not None:
+            profile._rewrote(relation, len(terms), clock)
+
+    return {key: val for key, val in ret.iteritems() if val != 0}
+
+
+def normal_form(vw):
+    """
+    Return the result of applying relations from config.relations to vw.
+
+    Arguments:
+        vw (VariableWord)
+
+    Return value:
+        a tuple of pairs (varword, coeff), varword of type VariableWord and
+        coeff a nonzero Number, representing the sum of coeff * varword
+    """
+    ret = normal_forms.get(vw)
+    if ret is None:
+        store = active_store()
+        if store is not None:
+            ret = store.get_word('normal_form', vw)
+        if ret is None:
+            ret = tuple(apply_relations({vw: 1}).iteritems())
+            if store is not None:
+                store.put_word('normal_form', vw, ret)
+        normal_forms[vw] = ret
+    return ret
+
+
 class Relation:
     """TODO"""
 
-    def __init__(self, lhs, *rhs):
+    def __init__(self, lhs, *rhs, **kwargs):
         """
         Initialize the relation and store it in config.relations.
 
@@ -35,13 +219,24 @@ class Relation:
             lhs (VariableWord): the left-hand side
             rhs (list): the right-hand side.  Each element of the list is a
                 tuple (coeff, varword) with coeff of a numeric type and
-                varword of type VariableWord
+                varword of type VariableWord.  Coefficients are converted
+                to config.coefficient_ring (see the module rings).
+
+        Keyword arguments:
+            algebra (Algebra): the algebra in which to register the relation
+                (see the module algebra); default: the current one
 
         Example:
             Relation(x, (1, y), (-2, z)) adds the relation x = y - 2z, where
             x, y, and z are all of type VariableWord (and therefore represent
             monomials in known variables).
         """
+        algebra = kwargs.get('algebra')
+        if algebra is not None:
+            with algebra:
+                self.__init__(lhs, *rhs)
+            return
+
         if isinstance(lhs, VariableWord):
             self.lhs = lhs
         elif isinstance(lhs, Variable):
@@ -49,10 +244,12 @@ class Relation:
         else:
             raise TypeError
 
+        ring = current_ring()
         self.rhs = []
         for coeff, varword in rhs:
             if not isinstance(coeff, Number):
                 raise TypeError
+            coeff = ring.coerce(coeff)
             if isinstance(varword, VariableWord):
                 self.rhs.append((coeff, varword))
             elif isinstance(varword, Variable):
@@ -63,8 +260,13 @@ class Relation:
         self._register()
 
     def _register(self):
-        """Register this relation in config.relations."""
+        """
+        Register this relation in config.relations and in lhs_index, and
+        forget all cached normal forms and other dependent values.
+        """
         config.relations[self.lhs] = self
+        lhs_index.add(self)
+        clear_caches()
 
     def __str__(self):
         """Stringify self."""
@@ -0,0 +1,394 @@
+"""spdaot.rewriting
+
+Overview:
+    Compiles relations into a confluent, terminating rewriting system.
+
+    Relations in config.relations are applied exactly as they were
+    registered, left-hand side to right-hand side, so nothing guarantees
+    that Element._simplify() terminates, or that the result does not depend
+    on the order in which rewrites happen.  This module orients every
+    relation under a monomial order, so that each rewrite makes a word
+    smaller, and then runs a bounded completion (the noncommutative version
+    of Buchberger's algorithm, or Knuth-Bendix completion for linear
+    combinations of words): overlaps between left-hand sides are resolved
+    until every word has a unique normal form.  The result is interreduced:
+    no left-hand side contains another, and right-hand sides are in normal
+    form, so normalization needs as few rewrites as possible.
+
+    A monomial order is given as a key function on VariableWord objects.  It
+    must be a well-order compatible with concatenation (if u < v then
+    a u b < a v b); deglex() returns the degree-lexicographic order for a
+    given order of the variables, and inferred_deglex() chooses the order of
+    the variables to agree with the relations as registered.
+
+Classes:
+    RewritingSystem: a list of oriented rules, usually built by
+        compile_relations()
+
+Functions:
+    deglex(): key function of the degree-lexicographic order
+    inferred_deglex(): deglex() for an order of variables agreeing with
+        given relations
+    misoriented(): the relations not decreasing under a monomial order
+    compile_relations(): orient and complete a set of relations
+"""
+
+from collections import defaultdict
+from fractions import Fraction
+from heapq import heapify, heappush, heappop
+from itertools import count
+from numbers import Integral
+from . import config
+from .variable import Variable, VariableWord, _ids, _names
+from .element import Element
+from .matcher import RelationMatcher
+from .relation import Relation, clear_relations, apply_relations
+from .exceptions import NonTerminatingRelations, CompletionFailure
+
+
+def deglex(variables=None):
+    """
+    Return the key function of the degree-lexicographic order.
+
+    Words are compared by length first, and words of equal length
+    lexicographically.
+
+    Arguments:
+        variables (iterable): names of variables (or Variable objects), from
+            smallest to largest; default: the order of registration.  Words
+            containing other variables cannot be compared.
+    """
+    if variables is None:
+        return lambda vw: (len(vw._w), vw._w)
+    rank = {_ids[var.name if isinstance(var, Variable) else var]: k
+            for k, var in enumerate(variables)}
+    return lambda vw: (len(vw._w), tuple(rank[i] for i in vw._w))
+
+
+def inferred_deglex(relations=None):
+    """
+    Return deglex(variables), for an order of the variables under which as
+    many relations as possible are oriented as registered.
+
+    Every relation with a right-hand side word of the same length as its
+    left-hand side asks for one variable to be larger than another.  These
+    constraints are taken in order, skipping any which contradicts earlier
+    ones, and otherwise variables are ordered by registration.
+
+    Arguments:
+        relations (iterable): Relation objects; default: config.relations
+    """
+    if relations is None:
+        relations = config.relations.values()
+    ids = [i for i, name in enumerate(_names) if name in config.variables]
+    smaller = {i: set() for i in ids}
+
+    def below(i, j):
+        """Return True if the constraints imply i < j."""
+        stack, seen = [j], set()
+        while stack:
+            k = stack.pop()
+            if k == i:
+                return True
+            if k not in seen:
+                seen.add(k)
+                stack.extend(smaller.get(k, ()))
+        return False
+
+    for relation in relations:
+        lhs = relation.lhs._w
+        for _, varword in relation.rhs:
+            rhs = varword._w
+            if len(rhs) != len(lhs) or rhs == lhs:
+                continue
+            k = next(k for k in xrange(len(lhs)) if lhs[k] != rhs[k])
+            big, small = lhs[k], rhs[k]
+            if big in smaller and small in smaller and \
+                    not below(big, small):
+                smaller[big].add(small)
+
+    # topological sort, smallest first, ties broken by registration order
+    order = []
+    larger = {i: set() for i in ids}
+    for i in ids:
+        for j in smaller[i]:
+            larger[j].add(i)
+    missing = {i: len(smaller[i]) for i in ids}
+    ready = [i for i in ids if missing[i] == 0]
+    heapify(ready)
+    while ready:
+        i = heappop(ready)
+        order.append(_names[i])
+        for j in larger[i]:
+            missing[j] -= 1
+            if missing[j] == 0:
+                heappush(ready, j)
+    return deglex(order)
+
+
+class _Rule:
+    """
+    An oriented rule lhs -> rhs, with the attributes of a Relation, which
+    is not registered anywhere.
+    """
+
+    def __init__(self, lhs, rhs):
+        self.lhs = lhs
+        self.rhs = rhs
+
+    def poly(self):
+        """Return lhs - rhs as a dict from VariableWord to coefficient."""
+        ret = {self.lhs: 1}
+        for coeff, varword in self.rhs:
+            ret[varword] = -coeff
+        return ret
+
+    def __str__(self):
+        """Stringify self."""
+        return str(self.lhs) + ' -> ' + \
+            config.print_options['addsep'].join(str(x) for x in self.rhs)
+
+    def __repr__(self):
+        """Stringify self."""
+        return repr(self.lhs) + ' -> ' + \
+            config.print_options['addsep'].join(repr(x) for x in self.rhs)
+
+
+def _poly(relation):
+    """Return lhs - rhs of a Relation as a dict, dropping zero terms."""
+    ret = defaultdict(int)
+    ret[relation.lhs] += 1
+    for coeff, varword in relation.rhs:
+        ret[varword] -= coeff
+    return {key: val for key, val in ret.iteritems() if val != 0}
+
+
+def _divide(a, b):
+    """Return a / b, exactly if both are integers."""
+    if isinstance(a, Integral) and isinstance(b, Integral):
+        ret = Fraction(a, b)
+        return int(ret) if ret.denominator == 1 else ret
+    return a / b
+
+
+def _orient(poly, key):
+    """
+    Return the rule lm -> rest for poly == 0, where lm is the largest word
+    in poly under key, scaled so that lm has coefficient 1.
+    """
+    lm = max(poly, key=key)
+    lc = poly[lm]
+    rest = sorted((vw for vw in poly if vw != lm), key=key, reverse=True)
+    return _Rule(lm, [(_divide(-poly[vw], lc), vw) for vw in rest])
+
+
+def _critical_pairs(rule1, rule2):
+    """
+    Yield, for every proper overlap a b c of rule1.lhs == a b and
+    rule2.lhs == b c, the difference of the two ways of rewriting a b c.
+    """
+    w1, w2 = rule1.lhs._w, rule2.lhs._w
+    for k in xrange(1, min(len(w1), len(w2))):
+        if w1[-k:] != w2[:k]:
+            continue
+        a, c = w1[:-k], w2[k:]
+        poly = defaultdict(int)
+        for coeff, varword in rule1.rhs:
+            poly[VariableWord._from_ids(varword._w + c)] += coeff
+        for coeff, varword in rule2.rhs:
+            poly[VariableWord._from_ids(a + varword._w)] -= coeff
+        yield poly
+
+
+def _contains(word, subword):
+    """Return True if the tuple subword occurs in the tuple word."""
+    n = len(subword)
+    return any(word[k:k + n] == subword for k in xrange(len(word) - n + 1))
+
+
+class RewritingSystem:
+    """
+    A list of rules lhs -> rhs, each rewriting a word into a linear
+    combination of smaller words under a monomial order.
+
+    Attributes:
+        rules (list): objects with the attributes lhs and rhs of a Relation,
+            sorted by their left-hand sides
+        key (callable): key function of the monomial order
+        confluent (bool): True if every word has a unique normal form, that
+            is, if completion finished
+        pairs (int): the number of critical pairs examined by completion
+    """
+
+    def __init__(self, rules, key, confluent, pairs=0):
+        self.rules = sorted(rules, key=lambda rule: key(rule.lhs))
+        self.key = key
+        self.confluent = confluent
+        self.pairs = pairs
+        self._matcher = RelationMatcher(self.rules)
+
+    def __len__(self):
+        """Return the number of rules."""
+        return len(self.rules)
+
+    def __iter__(self):
+        """Iterate over the rules."""
+        return iter(self.rules)
+
+    def reduce(self, x):
+        """
+        Return the normal form of x (an Element, VariableWord, Variable or
+        string) under the rules of self, as an Element.
+        """
+        if not isinstance(x, Element):
+            x = Element(x)
+        ret = Element()
+        ret.terms = defaultdict(
+            ret._coeff_initializer,
+            apply_relations(dict(x.terms), index=self._matcher))
+        return ret
+
+    def install(self):
+        """
+        Replace config.relations by the rules of self.  This clears all
+        cached normal forms.
+        """
+        clear_relations()
+        for rule in self.rules:
+            Relation(rule.lhs, *rule.rhs)
+
+    def __str__(self):
+        """Stringify self."""
+        return '\n'.join(str(rule) for rule in self.rules)
+
+    def __repr__(self):
+        """Stringify self."""
+        return '\n'.join(repr(rule) for rule in self.rules)
+
+
+def misoriented(relations=None, order=None):
+    """
+    Return the relations whose left-hand side is not larger than every word
+    of the right-hand side under a monomial order.  Only these relations can
+    make the application of relations loop forever.
+
+    Arguments:
+        relations (iterable): Relation objects; default: config.relations
+        order (callable): key function of a monomial order; default:
+            inferred_deglex(relations)
+    """
+    if relations is None:
+        relations = config.relations.values()
+    relations = list(relations)
+    key = order if order is not None else inferred_deglex(relations)
+    return [relation for relation in relations
+            if any(coeff != 0 and key(varword) >= key(relation.lhs)
+                   for coeff, varword in relation.rhs)]
+
+
+def compile_relations(relations=None, order=None, max_rules=1000,
+                      max_length=None, strict=False, partial=False,
+                      install=False):
+    """
+    Orient and complete a set of relations into a confluent rewriting system.
+
+    Arguments:
+        relations (iterable): Relation objects; default: config.relations
+        order (callable): key function of a monomial order; default:
+            inferred_deglex(relations)
+        max_rules (int): the most rules completion may adopt, counting rules
+            later replaced; completion of finitely many relations need not
+            terminate, and this bound makes it stop
+        max_length (int): if set, the longest left-hand side completion may
+            adopt
+        strict (bool): if True, raise NonTerminatingRelations when some
+            relation is misoriented under order, rather than reorienting it
+        partial (bool): if True, return a terminating but possibly
+            non-confluent system when a bound is exceeded, rather than
+            raising CompletionFailure; its rules still imply every relation,
+            but may exceed the bounds
+        install (bool): if True, replace config.relations by the result (see
+            RewritingSystem.install())
+
+    Return value:
+        a RewritingSystem
+    """
+    if relations is None:
+        relations = config.relations.values()
+    relations = list(relations)
+    key = order if order is not None else inferred_deglex(relations)
+    if strict:
+        bad = misoriented(relations, key)
+        if bad:
+            raise NonTerminatingRelations(
+                "relations not oriented by the monomial order: " +
+                ', '.join(str(relation) for relation in bad))
+
+    rules = {}
+    matcher = RelationMatcher()
+    # pending polynomials are processed smallest leading word first
+    pending = []
+    tiebreak = count()
+
+    def push(poly):
+        poly = {vw: coeff for vw, coeff in poly.iteritems() if coeff != 0}
+        if poly:
+            heappush(pending, (key(max(poly, key=key)), next(tiebreak), poly))
+
+    for relation in relations:
+        push(_poly(relation))
+
+    adopted = 0
+    pairs = 0
+    confluent = True
+    while pending:
+        poly = apply_relations(heappop(pending)[2], index=matcher)
+        if not poly:
+            continue
+        rule = _orient(poly, key)
+        if not rule.lhs._w:
+            raise CompletionFailure("the relations imply 1 = 0")
+        if confluent and (adopted >= max_rules or (
+                max_length is not None and len(rule.lhs._w) > max_length)):
+            if not partial:
+                raise CompletionFailure(
+                    "completion exceeded its bounds after adopting {} rules"
+                    .format(adopted))
+            # stop completing, but still adopt every pending polynomial
+            # (relations not yet adopted, and rules pushed back when
+            # replaced), so that the rules generate the same relations
+            confluent = False
+        adopted += 1
+
+        # rules whose left-hand side contains the new one are replaced
+        replaced = [old for old in rules.itervalues()
+                    if _contains(old.lhs._w, rule.lhs._w)]
+        if replaced:
+            for old in replaced:
+                del rules[old.lhs]
+                push(old.poly())
+            matcher = RelationMatcher(rules.itervalues())
+        rules[rule.lhs] = rule
+        matcher.add(rule)
+        if not confluent:
+            continue
+        for other in rules.values():
+            for poly in _critical_pairs(rule, other):
+                pairs += 1
+                push(poly)
+            if other is not rule:
+                for poly in _critical_pairs(other, rule):
+                    pairs += 1
+                    push(poly)
+
+    # interreduce right-hand sides
+    for rule in rules.itervalues():
+        rhs = apply_relations({vw: coeff for coeff, vw in rule.rhs},
+                              index=matcher)
+        rule.rhs = [(rhs[vw], vw)
+                    for vw in sorted(rhs, key=key, reverse=True)]
+
+    ret = RewritingSystem(rules.values(), key, confluent, pairs)
+    if install:
+        ret.install()
+    return ret
@@ -0,0 +1,686 @@
+"""spdaot.rings
+
+Overview:
+    Coefficient rings for Element objects.  A ring is an object with the
+    interface of the class Ring: it converts numbers into its elements,
+    inverts units exactly, and lifts its elements back to rational numbers.
+    Ring elements are Numbers supporting +, -, * and ==, so the arithmetic
+    of Element and Relation objects works unchanged over any ring.
+
+    The coefficient ring in use is config.coefficient_ring; see
+    current_ring().  The default, python_numbers, keeps the historical
+    behaviour of accepting any Python Number, but inverts integers exactly.
+    rationals coerces everything to exact rationals, and integers_mod(p)
+    returns the ring of integers modulo p, whose elements are small Python
+    ints wrapped in a class specific to p, so that coefficients never grow
+    beyond p.  Results found modulo a large prime can be lifted back to
+    rationals by rational reconstruction (see IntegersMod.lift()).
+
+    laurent_polynomials(name) returns the ring of Laurent polynomials in a
+    central parameter such as the Hecke parameter q.  Its elements are also
+    Numbers, and they can be used as coefficients in any ring above: a
+    central parameter then lives in coefficients, and never needs to be
+    commuted through words by relations.
+
+    A new ring is plugged in by subclassing Ring and overriding coerce(),
+    inverse() and, if needed, lift() and __contains__().
+
+Classes:
+    Ring: protocol (and base class) for coefficient rings
+    PythonNumbers: the default ring of all Python Numbers
+    Rationals: the field of rational numbers, as int and Fraction objects
+    IntegersMod: the ring of integers modulo n
+    IntegerMod: base class of elements of an IntegersMod ring
+    LaurentPolynomials: the ring of Laurent polynomials in one variable
+    LaurentPolynomial: base class of elements of a LaurentPolynomials ring
+
+Functions:
+    current_ring(): the coefficient ring in use
+    integers_mod(): the ring of integers modulo n
+    laurent_polynomials(): the ring of Laurent polynomials in a variable
+    residue(): the residue of a rational number modulo n
+"""
+
+from fractions import Fraction, gcd
+from numbers import Number, Integral, Rational
+from . import config
+
+
+def _inverse_mod(a, n):
+    """Return the inverse of a modulo n, or raise ZeroDivisionError."""
+    r0, r1, s0, s1 = n, a % n, 0, 1
+    while r1:
+        quotient = r0 // r1
+        r0, r1 = r1, r0 - quotient * r1
+        s0, s1 = s1, s0 - quotient * s1
+    if r0 != 1:
+        raise ZeroDivisionError("{} is not invertible modulo {}".format(a, n))
+    return s0 % n
+
+
+def _exact(x):
+    """Return the Fraction x as an int if it is an integer."""
+    return int(x) if x.denominator == 1 else x
+
+
+def residue(x, n):
+    """
+    Return the residue modulo n of x, an integer, a rational number whose
+    denominator is invertible modulo n, or an IntegerMod modulo n.
+    """
+    if isinstance(x, IntegerMod):
+        if x.modulus != n:
+            raise ValueError("{!r} is not an integer modulo {}".format(x, n))
+        return x.value
+    if isinstance(x, Integral):
+        return int(x) % n
+    if isinstance(x, Rational):
+        return x.numerator * _inverse_mod(x.denominator, n) % n
+    raise TypeError("cannot reduce {!r} modulo {}".format(x, n))
+
+
+class Ring(object):
+    """
+    Protocol for coefficient rings.
+
+    Attributes:
+        name (str): a name for printing
+        zero, one: the identity elements of the ring
+    """
+
+    name = 'ring'
+
+    def coerce(self, x):
+        """Return the element of self represented by the Number x."""
+        raise NotImplementedError
+
+    def __call__(self, x):
+        """Return self.coerce(x)."""
+        return self.coerce(x)
+
+    def inverse(self, x):
+        """
+        Return the inverse of x in self, exactly.  Raise ZeroDivisionError
+        if x is not a unit.
+        """
+        raise NotImplementedError
+
+    def lift(self, x):
+        """Return a Python number (int or Fraction) represented by x."""
+        return x
+
+    def __contains__(self, x):
+        """Return True if x is an element of self."""
+        return isinstance(x, Number)
+
+    @property
+    def zero(self):
+        """The zero of self."""
+        return self.coerce(0)
+
+    @property
+    def one(self):
+        """The one of self."""
+        return self.coerce(1)
+
+    def __repr__(self):
+        """Stringify self."""
+        return self.name
+
+    __str__ = __repr__
+
+
+class PythonNumbers(Ring):
+    """
+    All Python Numbers, with their own arithmetic.  Integers (and Fractions)
+    are inverted exactly, floats in floating point.
+    """
+
+    name = 'python_numbers'
+
+    def coerce(self, x):
+        """Return x, which must be a Number."""
+        if not isinstance(x, Number):
+            raise TypeError("{!r} is not a Number".format(x))
+        return x
+
+    def inverse(self, x):
+        """Return 1 / x, as an int or Fraction if x is rational."""
+        if isinstance(x, Rational):
+            return _exact(1 / Fraction(x))
+        return 1. / x
+
+    def __reduce__(self):
+        """Pickle as the module-level instance."""
+        return 'python_numbers'
+
+
+class Rationals(Ring):
+    """
+    The field of rational numbers.  Elements are int objects when they are
+    integers and Fraction objects otherwise; floats are converted exactly.
+    """
+
+    name = 'rationals'
+
+    def coerce(self, x):
+        """Return x as an int or Fraction."""
+        if isinstance(x, Integral):
+            return x
+        if isinstance(x, IntegerMod):
+            raise TypeError("{!r} is not a rational number".format(x))
+        return _exact(Fraction(x))
+
+    def inverse(self, x):
+        """Return 1 / x."""
+        return _exact(1 / Fraction(x))
+
+    def __contains__(self, x):
+        """Return True if x is an int or Fraction."""
+        return isinstance(x, Rational)
+
+    def __reduce__(self):
+        """Pickle as the module-level instance."""
+        return 'rationals'
+
+
+class IntegerMod(Number):
+    """
+    An element of the ring of integers modulo some n.  Every IntegersMod
+    ring has its own subclass of IntegerMod, with the class attribute
+    modulus; build elements by calling the ring.
+
+    Arithmetic with ints and Fractions (whose denominators are units modulo
+    n) reduces them modulo n first.  The value is a Python int in range(n),
+    and is the only int equal to self.
+    """
+
+    __slots__ = ('value',)
+
+    modulus = None
+    """int: the modulus, set on subclasses"""
+
+    @classmethod
+    def _make(cls, value):
+        """Return the element with value, already reduced modulo n."""
+        ret = object.__new__(cls)
+        ret.value = value
+        return ret
+
+    @classmethod
+    def _value_of(cls, other):
+        """Return the residue of other, or None if it is unsupported."""
+        if type(other) is cls:
+            return other.value
+        if isinstance(other, Integral):
+            return int(other) % cls.modulus
+        if isinstance(other, Rational) and not isinstance(other, IntegerMod):
+            return other.numerator * \
+                _inverse_mod(other.denominator, cls.modulus) % cls.modulus
+        return None
+
+    def __add__(self, other):
+        """Return self + other."""
+        value = self._value_of(other)
+        if value is None:
+            return NotImplemented
+        return self._make((self.value + value) % self.modulus)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        """Return self - other."""
+        value = self._value_of(other)
+        if value is None:
+            return NotImplemented
+        return self._make((self.value - value) % self.modulus)
+
+    def __rsub__(self, other):
+        """Return other - self."""
+        value = self._value_of(other)
+        if value is None:
+            return NotImplemented
+        return self._make((value - self.value) % self.modulus)
+
+    def __mul__(self, other):
+        """Return self * other."""
+        value = self._value_of(other)
+        if value is None:
+            return NotImplemented
+        return self._make(self.value * value % self.modulus)
+
+    __rmul__ = __mul__
+
+    def __div__(self, other):
+        """Return self / other."""
+        value = self._value_of(other)
+        if value is None:
+            return NotImplemented
+        return self._make(self.value * _inverse_mod(value, self.modulus) %
+                          self.modulus)
+
+    __truediv__ = __div__
+
+    def __rdiv__(self, other):
+        """Return other / self."""
+        value = self._value_of(other)
+        if value is None:
+            return NotImplemented
+        return self._make(value * _inverse_mod(self.value, self.modulus) %
+                          self.modulus)
+
+    __rtruediv__ = __rdiv__
+
+    def __pow__(self, exponent):
+        """Return self ** exponent for an integer exponent."""
+        if not isinstance(exponent, Integral):
+            return NotImplemented
+        base = self.value
+        if exponent < 0:
+            base, exponent = _inverse_mod(base, self.modulus), -exponent
+        return self._make(pow(base, int(exponent), self.modulus))
+
+    def __neg__(self):
+        """Return -self."""
+        return self._make(-self.value % self.modulus)
+
+    def __pos__(self):
+        """Return self."""
+        return self
+
+    def __eq__(self, other):
+        """
+        Return True if other is the same residue, or the int in range(n)
+        representing it.  Other ints and Fractions are never equal to self,
+        even if they reduce to the same residue, so that equal objects have
+        equal hashes.
+        """
+        if type(other) is type(self):
+            return self.value == other.value
+        if isinstance(other, Integral) and not isinstance(other, IntegerMod):
+            return self.value == other
+        if isinstance(other, Rational):
+            return False
+        return NotImplemented
+
+    def __ne__(self, other):
+        """Return the negation of self == other."""
+        ret = self.__eq__(other)
+        return ret if ret is NotImplemented else not ret
+
+    def __hash__(self):
+        """Return the hash of the int value, which is equal to self."""
+        return hash(self.value)
+
+    def __nonzero__(self):
+        """Return False if self is zero."""
+        return self.value != 0
+
+    def __int__(self):
+        """Return the value."""
+        return self.value
+
+    def __reduce__(self):
+        """Pickle by modulus and value."""
+        return _integer_mod, (self.modulus, self.value)
+
+    def __str__(self):
+        """Stringify self."""
+        return str(self.value)
+
+    def __repr__(self):
+        """Stringify self."""
+        return '{} mod {}'.format(self.value, self.modulus)
+
+
+def _integer_mod(modulus, value):
+    """Return value as an element of integers_mod(modulus)."""
+    return integers_mod(modulus).coerce(value)
+
+
+class IntegersMod(Ring):
+    """
+    The ring of integers modulo n.  Use integers_mod(n) rather than this
+    constructor, so that there is one ring (and one element class) for each
+    modulus.
+
+    Attributes:
+        modulus (int): n
+        element_class (type): the subclass of IntegerMod for n
+    """
+
+    def __init__(self, modulus):
+        if modulus < 2:
+            raise ValueError("the modulus must be at least 2")
+        self.modulus = modulus
+        self.name = 'integers_mod({})'.format(modulus)
+        self.element_class = type('IntegerMod{}'.format(modulus),
+                                  (IntegerMod,),
+                                  {'__slots__': (), 'modulus': modulus})
+
+    def coerce(self, x):
+        """Return the residue class of x, an integer or rational number."""
+        value = self.element_class._value_of(x)
+        if value is None:
+            raise TypeError("cannot reduce {!r} modulo {}".format(
+                x, self.modulus))
+        return self.element_class._make(value)
+
+    def inverse(self, x):
+        """Return the inverse of x modulo n."""
+        return self.element_class._make(
+            _inverse_mod(self.coerce(x).value, self.modulus))
+
+    def lift(self, x):
+        """
+        Return the rational number a / b with |a|, |b| <= sqrt(n / 2) which
+        is congruent to x, by rational reconstruction.  Raise ValueError if
+        there is none.
+        """
+        n = self.modulus
+        r0, r1, s0, s1 = n, self.coerce(x).value, 0, 1
+        while 2 * r1 * r1 > n:
+            quotient = r0 // r1
+            r0, r1 = r1, r0 - quotient * r1
+            s0, s1 = s1, s0 - quotient * s1
+        if s1 == 0 or 2 * s1 * s1 > n or gcd(s1, n) not in (1, -1):
+            raise ValueError("{!r} has no small rational lift".format(x))
+        return _exact(Fraction(r1, s1))
+
+    def __contains__(self, x):
+        """Return True if x is an element of self."""
+        return isinstance(x, self.element_class)
+
+    def __reduce__(self):
+        """Pickle by modulus."""
+        return integers_mod, (self.modulus,)
+
+
+class LaurentPolynomial(Number):
+    """
+    A Laurent polynomial in one variable, such as a Hecke parameter q, used
+    as a coefficient so that the variable never appears in a VariableWord.
+    Every LaurentPolynomials ring has its own subclass, with the class
+    attribute variable; build elements from the ring, e.g. with ring.gen.
+
+    The polynomial is stored densely: low is the lowest exponent with a
+    nonzero coefficient and coeffs is the tuple of coefficients of
+    q^low, q^(low + 1), ..., up to the highest nonzero one.  Coefficients are
+    Python Numbers (or elements of another ring, such as IntegerMod), and
+    any Number is treated as a constant polynomial.
+    """
+
+    __slots__ = ('low', 'coeffs')
+
+    variable = None
+    """str: the name of the variable, set on subclasses"""
+
+    @classmethod
+    def _make(cls, low, coeffs):
+        """Return the polynomial with the given exponent and coefficients,
+        after removing zero coefficients at both ends."""
+        start, stop = 0, len(coeffs)
+        while start < stop and coeffs[start] == 0:
+            start += 1
+        while stop > start and coeffs[stop - 1] == 0:
+            stop -= 1
+        ret = object.__new__(cls)
+        ret.low = low + start if start < stop else 0
+        ret.coeffs = tuple(coeffs[start:stop])
+        return ret
+
+    @classmethod
+    def _of(cls, other):
+        """Return other as an element of cls, or None if unsupported."""
+        if type(other) is cls:
+            return other
+        if isinstance(other, Number) and \
+                not isinstance(other, LaurentPolynomial):
+            return cls._make(0, (other,))
+        return None
+
+    def __add__(self, other):
+        """Return self + other."""
+        other = self._of(other)
+        if other is None:
+            return NotImplemented
+        if not other.coeffs:
+            return self
+        if not self.coeffs:
+            return other
+        low = min(self.low, other.low)
+        high = max(self.low + len(self.coeffs), other.low + len(other.coeffs))
+        coeffs = [0] * (high - low)
+        for k, coeff in enumerate(self.coeffs, self.low - low):
+            coeffs[k] = coeffs[k] + coeff
+        for k, coeff in enumerate(other.coeffs, other.low - low):
+            coeffs[k] = coeffs[k] + coeff
+        return self._make(low, coeffs)
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        """Return -self."""
+        return self._make(self.low, [-coeff for coeff in self.coeffs])
+
+    def __pos__(self):
+        """Return self."""
+        return self
+
+    def __sub__(self, other):
+        """Return self - other."""
+        other = self._of(other)
+        if other is None:
+            return NotImplemented
+        return self + -other
+
+    def __rsub__(self, other):
+        """Return other - self."""
+        other = self._of(other)
+        if other is None:
+            return NotImplemented
+        return other + -self
+
+    def __mul__(self, other):
+        """Return self * other."""
+        other = self._of(other)
+        if other is None:
+            return NotImplemented
+        if not self.coeffs or not other.coeffs:
+            return self._make(0, ())
+        coeffs = [0] * (len(self.coeffs) + len(other.coeffs) - 1)
+        for i, a in enumerate(self.coeffs):
+            if a != 0:
+                for j, b in enumerate(other.coeffs):
+                    coeffs[i + j] = coeffs[i + j] + a * b
+        return self._make(self.low + other.low, coeffs)
+
+    __rmul__ = __mul__
+
+    def is_unit(self):
+        """Return True if self is a monomial c q^k with c invertible."""
+        return len(self.coeffs) == 1
+
+    def _inverse(self):
+        """Return the inverse of the monomial self, exactly."""
+        if not self.is_unit():
+            raise ZeroDivisionError("{} is not invertible".format(self))
+        coeff = self.coeffs[0]
+        if isinstance(coeff, Rational) and not isinstance(coeff, IntegerMod):
+            coeff = _exact(1 / Fraction(coeff))
+        else:
+            coeff = 1 / coeff
+        return self._make(-self.low, (coeff,))
+
+    def __div__(self, other):
+        """Return self / other, for other a monomial."""
+        other = self._of(other)
+        if other is None:
+            return NotImplemented
+        return self * other._inverse()
+
+    __truediv__ = __div__
+
+    def __rdiv__(self, other):
+        """Return other / self, for self a monomial."""
+        other = self._of(other)
+        if other is None:
+            return NotImplemented
+        return other * self._inverse()
+
+    __rtruediv__ = __rdiv__
+
+    def __pow__(self, exponent):
+        """Return self ** exponent for an integer exponent."""
+        if not isinstance(exponent, Integral):
+            return NotImplemented
+        base = self if exponent >= 0 else self._inverse()
+        ret = self._make(0, (1,))
+        for _ in xrange(abs(exponent)):
+            ret = ret * base
+        return ret
+
+    def __eq__(self, other):
+        """Return True if other is the same polynomial."""
+        other = self._of(other)
+        if other is None:
+            return NotImplemented
+        return self.low == other.low and self.coeffs == other.coeffs
+
+    def __ne__(self, other):
+        """Return the negation of self == other."""
+        ret = self.__eq__(other)
+        return ret if ret is NotImplemented else not ret
+
+    def __hash__(self):
+        """Return a hash equal to that of a constant, if self is one."""
+        if self.low == 0 and len(self.coeffs) <= 1:
+            return hash(self.coeffs[0] if self.coeffs else 0)
+        return hash((self.low, self.coeffs))
+
+    def __nonzero__(self):
+        """Return False if self is zero."""
+        return bool(self.coeffs)
+
+    def __call__(self, value):
+        """Evaluate self at value."""
+        return sum((coeff * value ** k
+                    for k, coeff in enumerate(self.coeffs, self.low)), 0)
+
+    def __reduce__(self):
+        """Pickle by variable name, exponent and coefficients."""
+        return _laurent_polynomial, (self.variable, self.low, self.coeffs)
+
+    def __str__(self):
+        """Stringify self, in parentheses if it has several terms."""
+        if not self.coeffs:
+            return '0'
+        terms = []
+        for k, coeff in enumerate(self.coeffs, self.low):
+            if coeff == 0:
+                continue
+            power = self.variable if k == 1 else \
+                '{}^{}'.format(self.variable, k)
+            if k == 0:
+                terms.append(str(coeff))
+            elif coeff == 1:
+                terms.append(power)
+            elif coeff == -1:
+                terms.append('-' + power)
+            else:
+                terms.append('{} {}'.format(coeff, power))
+        ret = ' + '.join(terms).replace('+ -', '- ')
+        return '(' + ret + ')' if len(terms) > 1 else ret
+
+    __repr__ = __str__
+
+
+def _laurent_polynomial(variable, low, coeffs):
+    """Return the element of laurent_polynomials(variable) given densely."""
+    return laurent_polynomials(variable).element_class._make(low, coeffs)
+
+
+class LaurentPolynomials(Ring):
+    """
+    The ring of Laurent polynomials in one variable.  Use
+    laurent_polynomials(name) rather than this constructor, so that there is
+    one ring (and one element class) for each variable name.
+
+    Attributes:
+        variable (str): the name of the variable
+        gen (LaurentPolynomial): the variable itself
+        element_class (type): the subclass of LaurentPolynomial for variable
+    """
+
+    def __init__(self, variable):
+        self.variable = variable
+        self.name = 'laurent_polynomials({!r})'.format(variable)
+        self.element_class = type('LaurentPolynomial_' + variable,
+                                  (LaurentPolynomial,),
+                                  {'__slots__': (), 'variable': variable})
+        self.gen = self.element_class._make(1, (1,))
+
+    def coerce(self, x):
+        """Return x, a Number, as a Laurent polynomial."""
+        ret = self.element_class._of(x)
+        if ret is None:
+            raise TypeError("{!r} is not in {}".format(x, self))
+        return ret
+
+    def inverse(self, x):
+        """Return the inverse of x, which must be a monomial."""
+        return self.coerce(x)._inverse()
+
+    def lift(self, x):
+        """Return x as a Number if it is a constant, else x."""
+        x = self.coerce(x)
+        if x.low == 0 and len(x.coeffs) <= 1:
+            return x.coeffs[0] if x.coeffs else 0
+        return x
+
+    def __contains__(self, x):
+        """Return True if x is a Number not in another variable."""
+        return self.element_class._of(x) is not None
+
+    def __reduce__(self):
+        """Pickle by variable name."""
+        return laurent_polynomials, (self.variable,)
+
+
+python_numbers = PythonNumbers()
+"""PythonNumbers: the default coefficient ring"""
+
+rationals = Rationals()
+"""Rationals: the field of rational numbers"""
+
+_modular_rings = {}
+"""dict: keys are moduli, values are the IntegersMod rings created so far"""
+
+
+def integers_mod(modulus):
+    """Return the ring of integers modulo modulus."""
+    try:
+        return _modular_rings[modulus]
+    except KeyError:
+        ring = _modular_rings[modulus] = IntegersMod(modulus)
+        return ring
+
+
+_laurent_rings = {}
+"""dict: keys are variable names, values are the LaurentPolynomials rings
+created so far"""
+
+
+def laurent_polynomials(variable='q'):
+    """Return the ring of Laurent polynomials in variable."""
+    try:
+        return _laurent_rings[variable]
+    except KeyError:
+        ring = _laurent_rings[variable] = LaurentPolynomials(variable)
+        return ring
+
+
+def current_ring():
+    """Return config.coefficient_ring, or python_numbers if it is None."""
+    ring = config.coefficient_ring
+    return python_numbers if ring is None else ring
@@ -0,0 +1,306 @@
+"""spdaot.series
+
+Overview:
+    Defines the PowerSeries class, for lazy graded power series whose
+    homogeneous components are Element objects.  A component is computed
+    only when it is asked for, and then kept, so asking for the first few
+    degrees of a series such as func1 / (1 - func2) costs only the work
+    those degrees need.
+
+    A PowerSeries knows its valuation (a lower bound on its degrees) and
+    its support: for any bound, the sorted list of degrees up to the bound
+    in which it may have nonzero components.  Components are computed in
+    increasing order of degree, so recurrences such as r = func1 + func2 * r
+    never recurse deeply.  Degrees come from a grading function (see the
+    module graded), and should be exact numbers (int or Fraction), since
+    components are looked up by degree.
+
+    A component of a product is computed from components of its factors,
+    which is only right if the relations are homogeneous for the grading
+    (see graded.homogeneous()); products of series and geometric_quotient()
+    raise ValueError otherwise.
+
+Classes:
+    PowerSeries: lazy graded power series with Element components
+
+Functions:
+    geometric_quotient(): the series func1 / (1 - func2), lazily
+"""
+
+from collections import defaultdict
+from numbers import Number
+from .element import Element, _in_own_algebra
+from .graded import GradedElement, homogeneous
+from .relation import normal_form
+
+
+def _reachable(starts, steps, max_degree):
+    """
+    Return the sorted list of the numbers up to max_degree which are an
+    element of starts plus a sum of elements of steps (which are positive).
+    """
+    ret = set(deg for deg in starts if deg <= max_degree)
+    frontier = list(ret)
+    while frontier:
+        deg = frontier.pop()
+        for step in steps:
+            new_deg = deg + step
+            if new_deg <= max_degree and new_deg not in ret:
+                ret.add(new_deg)
+                frontier.append(new_deg)
+    return sorted(ret)
+
+
+def _check_homogeneous(degree, algebra):
+    """
+    Raise ValueError unless the relations of algebra are homogeneous for the
+    grading degree.
+    """
+    with algebra:
+        if not homogeneous(degree):
+            raise ValueError("the relations are not homogeneous for the "
+                             "grading, so products cannot be computed "
+                             "degree by degree")
+
+
+def _add_product(terms, x, y):
+    """Add the terms of x * y, two Elements, to the defaultdict terms."""
+    for vw1, c1 in x.terms.iteritems():
+        if c1 == 0:
+            continue
+        for vw2, c2 in y.terms.iteritems():
+            for varword, nf_coeff in normal_form(vw1 * vw2):
+                terms[varword] += nf_coeff * c1 * c2
+
+
+def _element(terms, algebra):
+    """Return the Element of algebra with terms in normal form."""
+    ret = Element(algebra=algebra)
+    ret.terms = defaultdict(int, {vw: coeff for vw, coeff
+                                  in terms.iteritems() if coeff != 0})
+    return ret
+
+
+class PowerSeries(object):
+    """
+    A lazy graded power series.  Build PowerSeries objects with
+    from_element() and geometric_quotient(), and combine them with +, - and
+    *, by Numbers, Elements and other PowerSeries.
+
+    Attributes:
+        valuation: a lower bound on the degrees of the nonzero components
+        degree (callable): the grading, a function of a VariableWord
+        algebra (Algebra): the algebra of the components
+    """
+
+    def __init__(self, compute, support, valuation, degree, algebra):
+        """
+        Initialize a series whose component of degree deg is compute(deg).
+
+        Arguments:
+            compute (callable): compute(deg) returns the component of degree
+                deg, an Element; it is called at most once for each degree,
+                in increasing order of degree
+            support (callable): support(max_degree) returns the sorted list
+                of the degrees up to max_degree of the nonzero components (or
+                a larger list)
+            valuation: a lower bound on the degrees of nonzero components
+            degree (callable): the grading
+            algebra (Algebra): the algebra of the components
+        """
+        self._compute = compute
+        self._support = support
+        self.valuation = valuation
+        self.degree = degree
+        self.algebra = algebra
+        self._components = {}
+
+    @classmethod
+    def from_element(cls, x, degree=None):
+        """
+        Return the series whose components are the homogeneous components
+        of x, an Element or GradedElement, for the grading degree (default:
+        graded.variable_degree()).
+        """
+        graded = GradedElement(x, degree)
+        degrees = graded.degrees()
+        return cls(graded.component,
+                   lambda max_degree: [deg for deg in degrees
+                                       if deg <= max_degree],
+                   degrees[0] if degrees else 0, graded.degree,
+                   graded.algebra)
+
+    def _zero(self):
+        """Return the zero Element of the algebra of self."""
+        return Element(algebra=self.algebra)
+
+    def support(self, max_degree):
+        """
+        Return the sorted list of the degrees up to max_degree in which self
+        may have a nonzero component.
+        """
+        return self._support(max_degree)
+
+    @_in_own_algebra
+    def component(self, deg):
+        """Return the homogeneous component of self of degree deg."""
+        try:
+            return self._components[deg]
+        except KeyError:
+            pass
+        for lower in self._support(deg):
+            if lower not in self._components:
+                self._components[lower] = self._compute(lower)
+        if deg not in self._components:
+            self._components[deg] = self._zero()
+        return self._components[deg]
+
+    def truncation(self, max_degree):
+        """Return the sum of the components of degree at most max_degree."""
+        terms = defaultdict(int)
+        for deg in self._support(max_degree):
+            for vw, coeff in self.component(deg).terms.iteritems():
+                terms[vw] += coeff
+        return _element(terms, self.algebra)
+
+    def _coerce(self, other):
+        """Return other as a PowerSeries, or None if it is unsupported."""
+        if isinstance(other, PowerSeries):
+            return other
+        if isinstance(other, (Element, GradedElement)):
+            return PowerSeries.from_element(other, self.degree)
+        if isinstance(other, Number):
+            return PowerSeries.from_element(
+                Element(other, algebra=self.algebra), self.degree)
+        return None
+
+    def _combine(self, other, scalar):
+        """Return self + scalar * other, for a PowerSeries other."""
+        def compute(deg):
+            return self.component(deg) + scalar * other.component(deg)
+
+        def support(max_degree):
+            return sorted(set(self._support(max_degree)).union(
+                other._support(max_degree)))
+        return PowerSeries(compute, support,
+                           min(self.valuation, other.valuation),
+                           self.degree, self.algebra)
+
+    def __add__(self, other):
+        """Return the sum of self and other."""
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        return self._combine(other, 1)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        """Return self - other."""
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        return self._combine(other, -1)
+
+    def __rsub__(self, other):
+        """Return other - self."""
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        return other._combine(self, -1)
+
+    def __neg__(self):
+        """Return -1 * self."""
+        return self * -1
+
+    def _scale(self, scalar):
+        """Return scalar * self, for a Number scalar."""
+        return PowerSeries(lambda deg: scalar * self.component(deg),
+                           self._support, self.valuation, self.degree,
+                           self.algebra)
+
+    def _product(self, other):
+        """Return self * other, for a PowerSeries other."""
+        _check_homogeneous(self.degree, self.algebra)
+
+        def support(max_degree):
+            left = self._support(max_degree - other.valuation)
+            right = other._support(max_degree - self.valuation)
+            return sorted(set(deg1 + deg2 for deg1 in left for deg2 in right
+                              if deg1 + deg2 <= max_degree))
+
+        def compute(deg):
+            right = set(other._support(deg - self.valuation))
+            terms = defaultdict(int)
+            for deg1 in self._support(deg - other.valuation):
+                if deg - deg1 in right:
+                    _add_product(terms, self.component(deg1),
+                                 other.component(deg - deg1))
+            return _element(terms, self.algebra)
+        return PowerSeries(compute, support, self.valuation + other.valuation,
+                           self.degree, self.algebra)
+
+    def __mul__(self, other):
+        """Return self * other."""
+        if isinstance(other, Number):
+            return self._scale(other)
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        return self._product(other)
+
+    def __rmul__(self, other):
+        """Return other * self."""
+        if isinstance(other, Number):
+            return self._scale(other)
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        return other._product(self)
+
+    def __str__(self):
+        """Stringify the components computed so far."""
+        terms = [str(self._components[deg]) for deg in
+                 sorted(self._components) if self._components[deg].terms]
+        return ' + '.join(terms + ['...'])
+
+    __repr__ = __str__
+
+
+def geometric_quotient(func1, func2, degree=None):
+    """
+    Return the series r = func1 / (1 - func2), computed lazily degree by
+    degree through the recurrence r = func1 + func2 * r.
+
+    Arguments:
+        func1, func2: Element or GradedElement objects; func2 must be
+            central, with its terms of positive degree
+        degree (callable): the grading (see the module graded); default:
+            graded.variable_degree(); the relations must be homogeneous for
+            it
+
+    Return value:
+        a PowerSeries r such that func1 = (1 - func2) * r
+    """
+    func1 = GradedElement(func1, degree)
+    func2 = GradedElement(func2, func1.degree)
+    _check_homogeneous(func1.degree, func1.algebra)
+    starts = func1.degrees()
+    steps = func2.degrees()
+    if steps and steps[0] <= 0:
+        raise ValueError("func2 must have terms of positive degree only")
+    steps_components = [(step, func2.component(step)) for step in steps]
+    valuation = starts[0] if starts else 0
+
+    def compute(deg):
+        terms = defaultdict(int, func1.components.get(deg, ()))
+        for step, step_component in steps_components:
+            if deg - step >= valuation:
+                _add_product(terms, step_component,
+                             series.component(deg - step))
+        return _element(terms, func1.algebra)
+
+    series = PowerSeries(
+        compute, lambda max_degree: _reachable(starts, steps, max_degree),
+        valuation, func1.degree, func1.algebra)
+    return series
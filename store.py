@@ -0,0 +1,243 @@
+"""spdaot.store
+
+Overview:
+    A persistent on-disk cache for values which are expensive to recompute:
+    normal forms of monomials, images of monomials under memoized Op
+    objects, and bases of normal monomials.
+
+    Each value depends on the registered variables, the registered relations
+    and the coefficient ring, so entries are filed under a fingerprint of all
+    three: a Store directory holds one SQLite database per fingerprint.
+    Registering a relation changes the fingerprint, and the Store moves on
+    to the matching database, keeping the old one for the next session which
+    registers the same relations.
+
+    Entries are read lazily, one key at a time, through SQLite's
+    memory-mapped I/O, and writes are batched into transactions.  Values are
+    pickled; VariableWord objects pickle by variable names, so entries
+    survive changes in the order in which variables are registered.
+
+    A Store takes effect once attached (see Store.attach(), or use a Store as
+    a context manager).  normal_form() then consults it on every miss of the
+    in-memory cache, and so do memoized Op objects with a persistent name
+    (see Op.memoized()).
+
+Classes:
+    Store: a directory of persistent caches, one per fingerprint
+
+Functions:
+    fingerprint(): a hash of the registered variables and relations
+    active_store(): the attached Store, or None
+"""
+
+import os
+import sqlite3
+from cPickle import dumps, loads, HIGHEST_PROTOCOL
+from hashlib import sha1
+from .rings import current_ring
+from . import config
+
+_active = None
+"""Store: the attached Store, or None"""
+
+
+def active_store():
+    """Return the attached Store, or None."""
+    return _active
+
+
+def _word_key(vw):
+    """Return a string identifying a VariableWord by its variable names."""
+    return ' '.join(vw)
+
+
+def fingerprint():
+    """
+    Return a hex string identifying the registered variables (with their
+    degrees), the registered relations and the coefficient ring.
+    """
+    digest = sha1()
+    for name in sorted(config.variables):
+        digest.update('v {} {!r}\n'.format(name, config.variables[name].deg))
+    for lhs in sorted(config.relations, key=_word_key):
+        digest.update('r {}'.format(_word_key(lhs)))
+        for coeff, varword in config.relations[lhs].rhs:
+            digest.update(' ; {!r} {}'.format(coeff, _word_key(varword)))
+        digest.update('\n')
+    digest.update('c {}\n'.format(current_ring()))
+    return digest.hexdigest()[:20]
+
+
+class Store(object):
+    """
+    A directory of persistent caches, one SQLite database per fingerprint of
+    the registered variables and relations.  Values are filed by namespace
+    (such as 'normal_form') and key.
+    """
+
+    batch_size = 1024
+    """int: the number of writes collected before they are committed"""
+
+    mmap_size = 2 ** 30
+    """int: the number of bytes of each database to memory-map"""
+
+    def __init__(self, path):
+        """
+        Initialize a store in the directory path, creating it if needed.
+        Nothing is read until a value is requested.
+        """
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._connection = None
+        self._fingerprint = None
+        self._state = None
+        self._pid = None
+        self._pending = {}
+        self.hits = self.misses = self.writes = 0
+
+    def _db(self):
+        """
+        Return a connection to the database for the current fingerprint,
+        opening it if needed.  A forked process opens its own connection.
+        """
+        # registering a variable or entering another Algebra does not call
+        # invalidate(), so check cheaply whether the fingerprint may have
+        # changed
+        state = (id(config.relations), len(config.variables),
+                 len(config.relations), id(current_ring()))
+        if self._connection is not None and self._pid == os.getpid():
+            if state == self._state:
+                return self._connection
+            self.close()
+        if self._pid is not None and self._pid != os.getpid():
+            # never touch the parent's connection
+            self._connection = None
+            self._pending = {}
+        self._fingerprint = fingerprint()
+        self._state = state
+        self._pid = os.getpid()
+        self._connection = sqlite3.connect(
+            os.path.join(self.path, self._fingerprint + '.sqlite3'))
+        self._connection.text_factory = str
+        self._connection.execute(
+            'PRAGMA mmap_size = {:d}'.format(self.mmap_size))
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS entries (namespace TEXT, key TEXT, '
+            'value BLOB, PRIMARY KEY (namespace, key))')
+        return self._connection
+
+    def get(self, namespace, key, default=None):
+        """
+        Return the value stored under namespace and key (both strings), or
+        default.
+        """
+        try:
+            ret = self._pending[(namespace, key)]
+        except KeyError:
+            row = self._db().execute(
+                'SELECT value FROM entries WHERE namespace = ? AND key = ?',
+                (namespace, key)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            ret = loads(str(row[0]))
+        self.hits += 1
+        return ret
+
+    def put(self, namespace, key, value):
+        """Store value under namespace and key (both strings)."""
+        self._db()
+        self._pending[(namespace, key)] = value
+        self.writes += 1
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Commit all pending writes."""
+        if not self._pending or self._connection is None or \
+                self._pid != os.getpid():
+            return
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?)',
+                [(namespace, key,
+                  sqlite3.Binary(dumps(value, HIGHEST_PROTOCOL)))
+                 for (namespace, key), value in self._pending.iteritems()])
+        self._pending = {}
+
+    def invalidate(self):
+        """
+        Flush and close the current database, so that the next request
+        opens the database for the new fingerprint.  Called whenever a
+        relation is registered; stored entries are kept.
+        """
+        self.close()
+
+    def close(self):
+        """Flush pending writes and close the database."""
+        if self._connection is not None and self._pid == os.getpid():
+            self.flush()
+            self._connection.close()
+        self._connection = None
+        self._pending = {}
+
+    def clear(self):
+        """Delete every entry stored for the current fingerprint."""
+        self._pending = {}
+        with self._db() as connection:
+            connection.execute('DELETE FROM entries')
+
+    def stats(self):
+        """Return a dict of statistics about this store."""
+        return {'hits': self.hits, 'misses': self.misses,
+                'writes': self.writes, 'fingerprint': self._fingerprint}
+
+    def attach(self):
+        """Make self the store consulted by normal_form() and memoized Ops."""
+        global _active
+        if _active is not None and _active is not self:
+            _active.close()
+        _active = self
+
+    def detach(self):
+        """Stop consulting self, flushing pending writes."""
+        global _active
+        if _active is self:
+            _active = None
+        self.close()
+
+    def __enter__(self):
+        """Attach self."""
+        self.attach()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Detach self."""
+        self.detach()
+
+    def get_word(self, namespace, vw):
+        """Return the value stored for a VariableWord, or None."""
+        return self.get(namespace, _word_key(vw))
+
+    def put_word(self, namespace, vw, value):
+        """Store value for a VariableWord."""
+        self.put(namespace, _word_key(vw), value)
+
+    def normal_words(self, max_length, variables=None, min_length=0,
+                     deg=None):
+        """
+        Return the list of words basis.normal_words() yields for these
+        arguments, loading it from self if it was stored before.
+        """
+        from .basis import normal_words
+        key = repr((max_length,
+                    None if variables is None
+                    else tuple(str(var) for var in variables),
+                    min_length, deg))
+        ret = self.get('normal_words', key)
+        if ret is None:
+            ret = list(normal_words(max_length, variables=variables,
+                                    min_length=min_length, deg=deg))
+            self.put('normal_words', key, ret)
+        return ret
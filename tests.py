@@ -2,8 +2,647 @@
 spdaot.tests
 
 Overview:
-    This module contains a testing suite for the spdaot package.
+    This module contains a testing suite for the spdaot package.  Run it
+    from the directory containing the package with
+        python -m unittest spdaot.tests
 
-TODO:
-    At present, this is empty.
+    Every test runs in a fresh Algebra (see the module algebra), so the
+    variables and relations a test registers are not seen by other tests.
+
+Classes:
+    AlgebraTestCase: base class of tests running in a fresh Algebra
+    AlgebraTest: Elements of several Algebra objects
+    VariableWordTest: interned storage of VariableWord objects
+    NormalWordsTest: enumeration of normal monomials
+    MatcherTest: finding redexes, against the historical scan
+    GradedElementTest: storage of Elements bucketed by degree
+    SeriesTest: lazy graded power series
+    PackedElementTest: array-backed storage of Elements
+    RewritingTest: completion of relations to a confluent system
+    RingsTest: modular coefficients and exact linear algebra
+    RelationFinderTest: relation_finder() and its variants
+    OpTest: Op objects, memoized or not
+    StoreTest: the persistent on-disk cache
+    VerifyTest: checking identities between Op objects
 """
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from collections import defaultdict
+from fractions import Fraction
+from itertools import product
+from math import ceil
+from random import Random
+from .algebra import Algebra
+from .variable import Variable, VariableWord
+from .relation import Relation, find_redex
+from .element import Element, make_poly_family
+from .graded import GradedElement, variable_degree
+from .packed import PackedElement
+from .series import PowerSeries, geometric_quotient
+from .tools import relation_finder, iter_relations, div_geometric
+from .op import Op
+from .store import Store
+from .verify import Identity, verify
+from .basis import normal_words
+from .rewriting import compile_relations, misoriented, deglex
+from .exceptions import NonTerminatingRelations, CompletionFailure
+from .rings import integers_mod, IntegerMod, laurent_polynomials
+from . import odd
+from .linalg import nullspace
+from .tools import numpy
+from . import config
+
+
+class AlgebraTestCase(unittest.TestCase):
+    """Base class of tests which run in a fresh Algebra."""
+
+    def setUp(self):
+        """Enter a fresh Algebra."""
+        self.algebra = Algebra(self.id())
+        self.algebra.__enter__()
+
+    def tearDown(self):
+        """Leave the Algebra of the test."""
+        self.algebra.__exit__(None, None, None)
+
+
+def _scan_simplify(terms):
+    """
+    Apply config.relations to terms, a dict from VariableWord objects to
+    coefficients, the way Element._simplify() did before relations were
+    indexed: scan the terms and the relations for any occurrence of a
+    left-hand side, rewrite it, and start over.
+
+    Return value:
+        a dict from VariableWord objects to nonzero coefficients
+    """
+    terms = {vw: coeff for vw, coeff in terms.iteritems() if coeff != 0}
+    while True:
+        for term_vw, rel_vw in product(terms, config.relations):
+            before, during, after = term_vw.split_on_sub(*rel_vw)
+            if during:
+                break
+        else:
+            return terms
+        changes = defaultdict(int)
+        before_vw = VariableWord(*before)
+        after_vw = VariableWord(*after)
+        changes[term_vw] -= terms[term_vw]
+        for coeff, varword in config.relations[rel_vw].rhs:
+            changes[before_vw * varword * after_vw] += coeff * terms[term_vw]
+        for vw, coeff in changes.iteritems():
+            terms[vw] = terms.get(vw, 0) + coeff
+        terms = {vw: coeff for vw, coeff in terms.iteritems() if coeff != 0}
+
+
+def _random_terms(names, count, max_length, seed):
+    """Return a dict of count random words in names with random scalars."""
+    rand = Random(seed)
+    return {VariableWord(*[rand.choice(names)
+                           for _ in xrange(rand.randint(0, max_length))]):
+            rand.randint(-3, 3) for _ in xrange(count)}
+
+
+class AlgebraTest(AlgebraTestCase):
+    """Elements of several Algebra objects."""
+
+    def test_equality_across_algebras(self):
+        """Elements of different algebras compare unequal, without error."""
+        xa, = make_poly_family('x', inverses=False)
+        with Algebra('other'):
+            xb, = make_poly_family('x', inverses=False)
+        self.assertFalse(xa == xb)
+        self.assertNotIn(xa, [xb])
+        self.assertEqual([xb, xa].index(xa), 1)
+        self.assertFalse(GradedElement(xa) == GradedElement(xb))
+        self.assertFalse(GradedElement(xa) == xb)
+        self.assertTrue(xa == Element(VariableWord('x')))
+        self.assertRaises(ValueError, lambda: xa + xb)
+        self.assertRaises(ValueError, lambda: xa * xb)
+
+
+class VariableWordTest(AlgebraTestCase):
+    """Interned storage of VariableWord objects."""
+
+    def test_transform_to_new_name(self):
+        """transform() accepts names which were never interned."""
+        Variable('a')
+        Variable('b')
+        vw = VariableWord('a', 'b', 'a')
+        vw.transform('a', 'anewname')
+        self.assertEqual(vw._tuplify(), ('anewname', 'b', 'anewname'))
+        vw.transform('anothername', 'b')
+        self.assertEqual(vw._tuplify(), ('anewname', 'b', 'anewname'))
+        vw.transform('anewname', 'b', swap=True)
+        self.assertEqual(vw._tuplify(), ('b', 'anewname', 'b'))
+
+
+class NormalWordsTest(AlgebraTestCase):
+    """Enumeration of normal monomials."""
+
+    def test_inverse_variable_objects(self):
+        """Variables may be given as inverse Variable objects."""
+        make_poly_family('a', 'b', commute=-1, inverses=True)
+        variables = [config.variables[name] for name in ('a', 'a@', 'b@')]
+        words = list(normal_words(2, variables=variables))
+        self.assertEqual(words, list(normal_words(2, ['a', 'a@', 'b@'])))
+        self.assertEqual([vw._tuplify() for vw in words],
+                         [(), ('a',), ('a@',), ('b@',), ('a', 'a'),
+                          ('a', 'b@'), ('a@', 'a@'), ('a@', 'b@'),
+                          ('b@', 'b@')])
+
+
+class MatcherTest(AlgebraTestCase):
+    """Finding redexes with the automaton of relation.lhs_index."""
+
+    def setUp(self):
+        """Register the variables a, b, c and d."""
+        AlgebraTestCase.setUp(self)
+        for name in 'abcd':
+            Variable(name)
+
+    def test_earliest_ending_redex(self):
+        """The redex ending first wins, the longest at equal ends."""
+        Relation(VariableWord('c', 'd'), (1, VariableWord('d')))
+        Relation(VariableWord('b', 'c'), (1, VariableWord('c')))
+        abc = Relation(VariableWord('a', 'b', 'c'), (1, VariableWord('a')))
+        start, end, rel = find_redex(VariableWord('a', 'b', 'c', 'd')._w)
+        self.assertEqual((start, end, rel), (0, 3, abc))
+        start, end, rel = find_redex(VariableWord('d', 'b', 'c', 'd')._w)
+        self.assertEqual((start, end, str(rel.lhs)), (1, 3, 'b c'))
+        self.assertIsNone(find_redex(VariableWord('d', 'c', 'b', 'a')._w))
+
+    def test_relation_registered_after_search(self):
+        """A relation registered after a search is found by the next one."""
+        word = VariableWord('a', 'c', 'b', 'd')._w
+        Relation(VariableWord('a', 'b'), (1, VariableWord('b', 'a')))
+        self.assertIsNone(find_redex(word))
+        cb = Relation(VariableWord('c', 'b'), (2, VariableWord('b', 'c')))
+        self.assertEqual(find_redex(word), (1, 3, cb))
+        self.assertEqual(Element(VariableWord(*'acbd')),
+                         2 * Element(VariableWord(*'abcd')))
+
+    def test_overlapping_lhs_agree_with_scan(self):
+        """Overlapping left-hand sides reduce as in the historical scan."""
+        Relation(VariableWord('b', 'a'), (1, VariableWord('a', 'b')))
+        Relation(VariableWord('c', 'b'), (1, VariableWord('b', 'c')))
+        Relation(VariableWord('c', 'a'), (1, VariableWord('a', 'c')))
+        Relation(VariableWord('a', 'a', 'a'), (1, VariableWord('a')))
+        Relation(VariableWord('c', 'c'), (2, VariableWord()))
+        for seed in xrange(5):
+            terms = _random_terms('abcd', 6, 6, seed)
+            self.assertEqual(dict(Element(terms).terms),
+                             _scan_simplify(terms))
+
+    def test_q_commuting_families_agree_with_scan(self):
+        """Families with inverses reduce as in the historical scan."""
+        q = {('x', 'y'): Fraction(2), ('x', 'z'): -1,
+             ('y', 'z'): Fraction(1, 3)}
+        make_poly_family('x', 'y', 'z', inverses=True,
+                         commute=lambda v1, v2: q[v1.name, v2.name])
+        names = ['x', 'y', 'z', 'x@', 'y@', 'z@']
+        for seed in xrange(5):
+            terms = _random_terms(names, 8, 5, seed)
+            self.assertEqual(dict(Element(terms).terms),
+                             _scan_simplify(terms))
+        # a variable registered later, with relations added to the index
+        # after it was built
+        make_poly_family('w', inverses=True)
+        for name in names:
+            for wname in ['w', 'w@']:
+                Relation(VariableWord(name, wname),
+                         (1, VariableWord(wname, name)))
+        names += ['w', 'w@']
+        for seed in xrange(5, 10):
+            terms = _random_terms(names, 8, 5, seed)
+            self.assertEqual(dict(Element(terms).terms),
+                             _scan_simplify(terms))
+
+
+def _unreduced(terms):
+    """Return an Element with the given terms, without applying relations."""
+    ret = Element()
+    ret.terms = defaultdict(int, terms)
+    return ret
+
+
+def _truncate(x, max_degree, degree):
+    """Return the sum of the terms of x of degree at most max_degree."""
+    return _unreduced({vw: coeff for vw, coeff in x.terms.iteritems()
+                       if coeff != 0 and degree(vw) <= max_degree})
+
+
+class GradedElementTest(AlgebraTestCase):
+    """Storage of Elements bucketed by degree."""
+
+    def test_truncated_products(self):
+        """Truncated products keep the terms of the product by degree."""
+        x, y = make_poly_family('x', 'y', commute=-1, inverses=False)
+        config.variables['x'].deg = 1
+        config.variables['y'].deg = 2
+        a = 1 + x + x * y - 3 * y ** 2
+        b = 2 - y + x ** 3
+        ga, gb = GradedElement(a), GradedElement(b)
+        for max_degree in xrange(8):
+            self.assertEqual(ga.mul(gb, max_degree).unpack(),
+                             _truncate(a * b, max_degree, variable_degree))
+        self.assertEqual(ga.power(3, 5).unpack(),
+                         _truncate(a ** 3, 5, variable_degree))
+
+    def test_inhomogeneous_relations(self):
+        """Terms are graded by their own degree, not by their factors'."""
+        x, y, xi, yi = make_poly_family('x', 'y', inverses=True)
+        a = xi * y ** 3 + y
+        b = x + yi
+        ga, gb = GradedElement(a, len), GradedElement(b, len)
+        self.assertEqual((ga * gb).components,
+                         GradedElement(a * b, len).components)
+        for max_degree in xrange(6):
+            self.assertEqual(ga.mul(gb, max_degree).unpack(),
+                             _truncate(a * b, max_degree, len))
+            self.assertEqual(ga.power(3, max_degree).unpack(),
+                             _truncate(a ** 3, max_degree, len))
+
+
+def _powers_div_geometric(func1, func2, degree):
+    """
+    Return func1 / (1 - func2) the way tools.div_geometric() computed it
+    before power series: sum func1 * func2 ** e for e up to the exponent
+    the degrees of func1 and func2 allow, then drop the terms of degree
+    above the largest in func1.
+    """
+    func1_degrees = [degree(vw) for vw in func1]
+    min_deg, max_deg = min(func1_degrees), max(func1_degrees)
+    max_exponent = int(ceil(float(max_deg - min_deg) /
+                            min(degree(vw) for vw in func2)))
+    ret = Element(0)
+    running_power = Element(1)
+    for _ in xrange(max_exponent + 1):
+        ret += func1 * running_power
+        running_power *= func2
+    return _truncate(ret, max_deg, degree)
+
+
+class SeriesTest(AlgebraTestCase):
+    """Lazy graded power series."""
+
+    def test_div_geometric_matches_powers(self):
+        """div_geometric() agrees with the sum of powers it replaced."""
+        x, y, z = make_poly_family('x', 'y', 'z', inverses=False)
+        func1 = x * y ** 3 + 2 * z - y * z ** 2
+        func2 = x - z ** 2 + y * z
+        self.assertEqual(div_geometric(func1, func2, len),
+                         _powers_div_geometric(func1, func2, len))
+        quotient = geometric_quotient(func1, func2, len)
+        self.assertEqual((quotient - quotient * func2).truncation(6),
+                         func1)
+
+    def test_inhomogeneous_relations(self):
+        """Relations which change degrees are not truncated by a guess."""
+        x, y, xi, yi = make_poly_family('x', 'y', inverses=True)
+        func1 = xi * y ** 3 + y
+        func2 = x
+        quotient = div_geometric(func1, func2, len)
+        self.assertEqual(quotient, _powers_div_geometric(func1, func2, len))
+        self.assertEqual(quotient[VariableWord('y', 'y', 'y')], 1)
+        self.assertRaises(ValueError, geometric_quotient, func1, func2, len)
+        series = PowerSeries.from_element(func1, len)
+        self.assertRaises(ValueError, lambda: series * func2)
+
+
+class PackedElementTest(AlgebraTestCase):
+    """Array-backed storage of Elements."""
+
+    def test_arithmetic_matches_element(self):
+        """Sums and products agree with those of Element objects."""
+        x, y = make_poly_family('x', 'y', commute=-1, inverses=False)
+        a = 3 * x * y - y ** 2 + 2
+        b = x - 5 * y * x + Fraction(1, 2)
+        pa, pb = PackedElement(a), PackedElement(b)
+        self.assertEqual((pa + pb).unpack(), a + b)
+        self.assertEqual((pa - pb).unpack(), a - b)
+        self.assertEqual((pa * pb).unpack(), a * b)
+        self.assertEqual((pb * a).unpack(), b * a)
+        self.assertEqual((pa * 0).unpack(), Element())
+        self.assertEqual(pa * pb, a * b)
+
+    def test_multiplies_in_own_algebra(self):
+        """A PackedElement multiplies in the Algebra it was packed from."""
+        other = Algebra('other')
+        with other:
+            x, y = make_poly_family('x', 'y', commute=-1, inverses=False)
+        product = PackedElement(y) * PackedElement(x)
+        self.assertIs(product.algebra, other)
+        self.assertEqual(product.unpack(), -x * y)
+        self.assertEqual((PackedElement(x) * 0).algebra, other)
+        self.assertFalse(PackedElement(x) == PackedElement(
+            make_poly_family('x', inverses=False)[0]))
+        self.assertRaises(ValueError, lambda: PackedElement(x) + Element())
+
+
+class RewritingTest(AlgebraTestCase):
+    """Completion of relations to a confluent rewriting system."""
+
+    def test_poly_family_is_confluent(self):
+        """The relations of a family with inverses are already complete."""
+        make_poly_family('x', 'y', 'z', inverses=True,
+                         commute=lambda v1, v2: Fraction(len(v1.name) + 1))
+        system = compile_relations()
+        self.assertTrue(system.confluent)
+        self.assertEqual(len(system), 6 + 3 * 4)
+        self.assertEqual(sorted(rule.lhs for rule in system),
+                         sorted(config.relations))
+        self.assertGreater(system.pairs, 0)
+        self.assertEqual(misoriented(), [])
+
+    def test_deglex_inverse_variable_objects(self):
+        """deglex() accepts inverse Variable objects."""
+        make_poly_family('x', 'y', inverses=True)
+        key = deglex([config.variables[name] for name in ('y@', 'x', 'y')])
+        words = [VariableWord('x', 'y'), VariableWord('y@'),
+                 VariableWord('y', 'y@'), VariableWord('x')]
+        self.assertEqual(sorted(words, key=key),
+                         [words[1], words[3], words[0], words[2]])
+
+    def test_reduce_matches_simplify(self):
+        """RewritingSystem.reduce() agrees with Element._simplify()."""
+        make_poly_family('x', 'y', 'z', inverses=True, commute=-1)
+        system = compile_relations()
+        names = ['x', 'y', 'z', 'x@', 'y@', 'z@']
+        for seed in xrange(5):
+            terms = _random_terms(names, 8, 5, seed)
+            self.assertEqual(system.reduce(_unreduced(terms)),
+                             Element(terms))
+
+    def test_completion_reorients(self):
+        """Relations looping as registered are oriented and completed."""
+        for name in 'ab':
+            Variable(name)
+        Relation(VariableWord('a', 'b'), (1, VariableWord('b', 'a')))
+        Relation(VariableWord('b', 'a'), (1, VariableWord('a', 'b')))
+        self.assertEqual(len(misoriented()), 1)
+        self.assertRaises(NonTerminatingRelations, compile_relations,
+                          strict=True)
+        system = compile_relations()
+        self.assertTrue(system.confluent)
+        self.assertEqual(len(system), 1)
+        # Element(VariableWord('b', 'a')) would loop forever
+        self.assertEqual(
+            system.reduce(_unreduced({VariableWord('b', 'a', 'b'): 1})),
+            system.reduce(_unreduced({VariableWord('b', 'b', 'a'): 1})))
+
+    def test_completion_failure(self):
+        """Completion stops at its bounds, or when 1 = 0 follows."""
+        for name in 'ab':
+            Variable(name)
+        # the braid relation has no finite completion under deglex
+        Relation(VariableWord('b', 'a', 'b'),
+                 (1, VariableWord('a', 'b', 'a')))
+        self.assertRaises(CompletionFailure, compile_relations, max_rules=30)
+        system = compile_relations(max_rules=30, partial=True)
+        self.assertFalse(system.confluent)
+        Relation(VariableWord('a'), (1, VariableWord()))
+        Relation(VariableWord('a', 'a'), (2, VariableWord()))
+        self.assertRaises(CompletionFailure, compile_relations)
+
+    def test_partial_system_implies_relations(self):
+        """A system stopped at its bounds still implies every relation."""
+        make_poly_family('a', 'b', 'c', inverses=False)
+        relations = config.relations.values()
+        system = compile_relations(max_rules=1, partial=True)
+        self.assertFalse(system.confluent)
+        self.assertEqual(len(system), 3)
+        for relation in relations:
+            terms = {relation.lhs: 1}
+            for coeff, varword in relation.rhs:
+                terms[varword] = -coeff
+            self.assertEqual(dict(system.reduce(_unreduced(terms)).terms),
+                             {})
+        system.install()
+        self.assertEqual(sorted(config.relations),
+                         sorted(relation.lhs for relation in relations))
+
+
+class RingsTest(AlgebraTestCase):
+    """Modular coefficients and exact linear algebra."""
+
+    def test_integer_mod_arithmetic(self):
+        """Elements of integers_mod(7) reduce every result modulo 7."""
+        ring = integers_mod(7)
+        a = ring(3)
+        self.assertIs(integers_mod(7), ring)
+        self.assertIsInstance(a, IntegerMod)
+        self.assertEqual((a + 5, 5 + a, a - 4, 4 - a, -a), (1, 1, 6, 1, 4))
+        self.assertEqual((a * 5, a / 2, 2 / a, a ** 3, a ** -1),
+                         (1, 5, 3, 6, 5))
+        self.assertEqual(ring(Fraction(1, 2)), 4)
+        self.assertEqual(ring(-1), ring(13))
+        self.assertEqual(hash(ring(10)), hash(3))
+        # only the int in range(7) equals a residue, so hashes agree
+        self.assertNotEqual(ring(5), 12)
+        self.assertNotEqual(ring(6), -1)
+        self.assertNotEqual(ring(4), Fraction(1, 2))
+        self.assertEqual(len(set([ring(5), 5, 12, ring(12)])), 2)
+        self.assertFalse(ring(14))
+        self.assertRaises(TypeError, lambda: a + integers_mod(5)(1))
+
+    def test_inverse(self):
+        """inverse() is exact, and refuses non-units."""
+        ring = integers_mod(12)
+        for x in (1, 5, 7, 11, -1, Fraction(1, 5)):
+            self.assertEqual(ring.inverse(x) * x, 1)
+        for x in (0, 2, 3, 8, 24):
+            self.assertRaises(ZeroDivisionError, ring.inverse, x)
+
+    def test_lift(self):
+        """lift() reconstructs small rationals from their residues."""
+        ring = integers_mod(10007)
+        for x in (0, 1, -5, Fraction(3, 7), Fraction(-22, 45),
+                  Fraction(1, 70)):
+            self.assertEqual(ring.lift(ring(x)), x)
+
+    def test_element_coefficients(self):
+        """Coefficients of Elements and relations are reduced modulo p."""
+        ring = integers_mod(7)
+        config.coefficient_ring = ring
+        x, y = make_poly_family('x', 'y', commute=3, inverses=False)
+        yx = Element({VariableWord('y', 'x'): 10})
+        coeff = yx[VariableWord('x', 'y')]
+        self.assertIn(coeff, ring)
+        self.assertEqual(coeff, 2)
+        self.assertEqual(y * x, 3 * x * y)
+        self.assertEqual(dict((x * 7).terms), {})
+        self.assertEqual((x + y) * Fraction(1, 2), 4 * x + 4 * y)
+
+    def test_nullspace_mod_agrees(self):
+        """Relations found modulo a prime are those found exactly."""
+        p = 10007
+        rand = Random(0)
+        for _ in xrange(5):
+            generators = [{k: rand.randint(-5, 5) for k in xrange(6)}
+                          for _ in xrange(3)]
+            vectors = []
+            for _ in xrange(8):
+                vector = defaultdict(int)
+                for generator in generators:
+                    scalar = rand.randint(-2, 2)
+                    for k, val in generator.iteritems():
+                        vector[k] += scalar * val
+                vectors.append(dict(vector))
+            exact = nullspace(vectors)
+            modular = nullspace(vectors, modulus=p)
+            self.assertEqual(len(exact), len(modular))
+            self.assertGreaterEqual(len(exact), 5)
+            for relation, relation_mod in zip(exact, modular):
+                last = relation[max(relation)]
+                self.assertEqual(
+                    {i: c * integers_mod(p).inverse(last)
+                     for i, c in relation.iteritems()},
+                    relation_mod)
+
+
+class RelationFinderTest(AlgebraTestCase):
+    """relation_finder() and its variants."""
+
+    def test_rank_float_coefficients(self):
+        """Floats are read as the short fractions they stand for."""
+        a, = make_poly_family('a', inverses=False)
+        terms = [a * 0.1, a * 0.2, a * 0.3]
+        self.assertEqual(relation_finder(terms, method='rank'),
+                         [[(terms[0], -2), (terms[1], 1)],
+                          [(terms[0], -3), (terms[2], 1)]])
+
+    def test_laurent_coefficients(self):
+        """Every method handles Laurent polynomial coefficients in q."""
+        make_poly_family('x1', 'x2', 'x3', commute=-1, inverses=False)
+        q = laurent_polynomials('q').gen
+        h = odd.minus_Dn_hecke_generators(3)
+        terms = [h[0], h[1], q * h[0], h[0] + h[1], h[0] * h[1]]
+        eltlist = [Element(vw) for vw in normal_words(2, min_length=1)]
+        relation = [(terms[0], -1), (terms[1], -1), (terms[3], 1)]
+        self.assertEqual(relation_finder(terms, eltlist=eltlist,
+                                         method='rank'), [relation])
+        for vectorize in (False, True) if numpy is not None else (False,):
+            self.assertEqual(
+                relation_finder(terms, eltlist=eltlist, scalarset=[-1, 0, 1],
+                                vectorize=vectorize),
+                [relation, [(term, -c) for term, c in relation]])
+
+    def test_checkpoint_resume(self):
+        """A search stopped early resumes from its checkpoint."""
+        a, b = make_poly_family('a', 'b', inverses=False)
+        terms = [a, b, a + b, a - b, 2 * a, b * 3]
+        scalarset = [-1, 0, 1, 2]
+        expected = relation_finder(terms, scalarset=scalarset)
+        directory = tempfile.mkdtemp()
+        try:
+            checkpoint = os.path.join(directory, 'search.json')
+            relations = iter_relations(terms, scalarset=scalarset,
+                                       checkpoint=checkpoint, chunk_size=7)
+            first = next(relations)
+            relations.close()
+            rest = list(iter_relations(terms, scalarset=scalarset,
+                                       checkpoint=checkpoint, chunk_size=5,
+                                       workers=2))
+            self.assertEqual([first] + rest, expected)
+            self.assertGreater(len(rest), 1)
+
+            # a checkpoint is refused by another search, before iterating
+            self.assertRaises(ValueError, iter_relations, terms,
+                              scalarset=[0, 1], checkpoint=checkpoint)
+            self.assertRaises(ValueError, iter_relations, terms[1:],
+                              scalarset=scalarset, checkpoint=checkpoint)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_huge_search_starts_at_once(self):
+        """Searches with more candidates than a C long yield lazily."""
+        a, = make_poly_family('a', inverses=False)
+        terms = [a * (k + 1) for k in xrange(28)]
+        scalarset = [0, 1, -1, 2, -2]
+        self.assertGreater(len(scalarset) ** len(terms), sys.maxint)
+        relation = [(terms[25], 1), (terms[26], -2), (terms[27], 1)]
+        for vectorize in (False, True) if numpy is not None else (False,):
+            relations = iter_relations(terms, scalarset=scalarset,
+                                       vectorize=vectorize, chunk_size=128)
+            self.assertEqual(next(relations), relation)
+            relations.close()
+
+
+class OpTest(AlgebraTestCase):
+    """Op objects, memoized or not."""
+
+    def test_memoized_in_argument_algebra(self):
+        """A memoized Op applies in the Algebra of its argument."""
+        other = Algebra('other')
+        with other:
+            x1, x2 = make_poly_family('x1', 'x2', commute=-1,
+                                      inverses=False)
+        generator = odd.minus_Dn_generators(2)[0]
+        with other:
+            expected = generator(x2 * x1)
+        self.assertEqual(expected, x1 * x2)
+        result = generator(x2 * x1)
+        self.assertIs(result.algebra, other)
+        self.assertEqual(result, expected)
+        # images cached in the other Algebra are not used here
+        y1, y2 = make_poly_family('x1', 'x2', inverses=False)
+        self.assertEqual(generator(y2 * y1), odd.minus_s(y2 * y1, 1, sign=1))
+
+
+class StoreTest(AlgebraTestCase):
+    """The persistent on-disk cache."""
+
+    def test_persistent_images(self):
+        """Images stored under a persistent name are read back later."""
+        x, y = make_poly_family('x', 'y', commute=-1, inverses=False)
+        directory = tempfile.mkdtemp()
+        try:
+            with Store(directory):
+                double = Op(lambda elt: 2 * elt, linear=True, memo_size=10,
+                            persistent='scale')
+                self.assertEqual(double(y * x), -2 * x * y)
+            with Store(directory):
+                # the images of another Op under the same name are used
+                triple = Op(lambda elt: 3 * elt, linear=True, memo_size=10,
+                            persistent='scale')
+                self.assertEqual(triple(x * y + y), 2 * x * y + 3 * y)
+                # but not once the relations change
+                make_poly_family('z', 'w', inverses=False)
+                self.assertEqual(triple(x * y), 3 * x * y)
+        finally:
+            shutil.rmtree(directory)
+
+
+class VerifyTest(AlgebraTestCase):
+    """Checking identities between Op objects."""
+
+    def setUp(self):
+        """Register two anticommuting variables with inverses."""
+        AlgebraTestCase.setUp(self)
+        make_poly_family('x', 'y', commute=-1, inverses=True)
+        self.identity_op = Op(lambda elt: elt, name='id', linear=True)
+
+    def test_empty_word_is_identity(self):
+        """An empty word stands for the identity operator."""
+        ident = self.identity_op
+        self.assertTrue(verify([Identity([ident, ident], [])]))
+        self.assertTrue(verify([([], ident)], max_degree=2))
+        self.assertFalse(verify([Identity([ident], [ident, ident, 2])]))
+
+    def test_inverse_variable_objects(self):
+        """Test monomials may be built from inverse Variable objects."""
+        variables = [config.variables[name] for name in ('x', 'x@', 'y@')]
+        report = verify([Identity([self.identity_op], 1)],
+                        variables=variables, max_degree=2)
+        self.assertTrue(report)
+        # 1, x, x@, y@, x^2, x@^2, y@^2, x y@ and x@ y@ are normal
+        self.assertEqual(report.checked, 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
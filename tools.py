@@ -7,10 +7,33 @@ Overview:
 Functions:
     div_geometric(): TODO
     relation_finder(): TODO
+    iter_relations(): yield the relations relation_finder() finds as they
+        are found, with progress reports and checkpoints
+    rank_relation_finder(): find a basis of all linear relations among
+        Element or Op objects by exact linear algebra
 """
 
+import json
+import os
+import sys
 from math import ceil
+from fractions import Fraction
+from hashlib import sha1
+from itertools import izip
+from multiprocessing import Pool
+from random import Random
 from . import Element, Op
+from .linalg import nullspace, _rational
+from .graded import GradedElement, homogeneous
+from .series import geometric_quotient
+from .rings import current_ring, python_numbers, residue, IntegerMod, \
+    LaurentPolynomial, _inverse_mod
+from .frosting import memo
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 def finite_set_exponential(base, exponent):
@@ -66,39 +89,40 @@ def div_geometric(func1, func2, degree):
 
     Return value:
         an object ret of class Element such that func1 = (1 - func2) * ret
+
+    See series.geometric_quotient() for the whole series func1 / (1 - func2),
+    computed lazily.
     """
-    # find min_deg and max_deg, the min/max term degrees in func1
-    #   hence the highest degree term in ret will have degree max_deg, the
-    #   lowest
-    func1_degrees = [degree(vw) for vw in func1]
-    min_deg = min(func1_degrees)
-    max_deg = max(func1_degrees)
-
-    # find the smallest positive integer max_exponent such that
-    #   max_deg <= min_deg + degree(func2) * max_exponent .
-    #   no term func1 * func2 ** e contributes with e > max_exponent
-    max_exponent = int(ceil((max_deg - min_deg) /
-                            min(degree(vw) for vw in func2)))
-
-    # compute func1 * (1 + func2 + func2**2 + ... + func2**max_exponent)
-    ret = Element(0)
-    running_power = Element(1)
-    for exponent in xrange(max_exponent + 1):
-        ret += func1 * running_power
-        running_power *= func2
-
-    # truncate: kill off any terms vw with degree(vw) > max_deg
-    adjustment = Element(0)
-    for vw in ret:
-        if degree(vw) > max_deg:
-            adjustment -= ret[vw] * Element(vw)
-    ret += adjustment
+    # the highest degree term in ret will have degree max_deg, the highest
+    #   term degree in func1; ret is the truncation of the series
+    #   r = func1 + func2 * r, computed degree by degree up to max_deg
+    func1 = GradedElement(func1, degree)
+    max_deg = max(func1.degrees())
+    with func1.algebra:
+        if homogeneous(func1.degree):
+            return geometric_quotient(func1, func2,
+                                      degree).truncation(max_deg)
 
-    return ret
+        # otherwise products may have terms of lower degree than their
+        #   factors, so compute func1 * (1 + func2 + ... + func2**max_exponent)
+        #   in full, where no term func1 * func2 ** e contributes with
+        #   e > max_exponent by degree alone, and truncate
+        min_deg = min(func1.degrees())
+        func2 = GradedElement(func2, func1.degree)
+        max_exponent = int(ceil(Fraction(max_deg - min_deg) /
+                                Fraction(min(func2.degrees()))))
+        func1, func2 = func1.unpack(), func2.unpack()
+        ret = Element(0)
+        running_power = Element(1)
+        for exponent in xrange(max_exponent + 1):
+            ret += func1 * running_power
+            running_power *= func2
+        return GradedElement(ret, degree).truncate(max_deg).unpack()
 
 
 def relation_finder(terms, eltlist=None, scalarset=[0, 1], normalize=False,
-                    verbose=False):
+                    verbose=False, method='search', workers=None,
+                    vectorize=False, ring=None):
     """
     Look for a relation among terms and report all found.  This function
     can be called on an iterable whose entries are either all of class
@@ -124,65 +148,537 @@ def relation_finder(terms, eltlist=None, scalarset=[0, 1], normalize=False,
             relation.
         normalize (bool): If True, only consider relations in which the
             first coefficient equals 1.
+        method (str): 'search' tries every assignment of scalars from
+            scalarset.  'rank' instead expands every term into a coefficient
+            vector and computes an exact basis of all linear relations, with
+            arbitrary rational coefficients; see rank_relation_finder().
+            Float coefficients are read as the nearest fractions with
+            denominators at most 10**9, so 0.1 stands for 1/10.
+        workers (int): If greater than 1, the search is split into chunks
+            of consecutive candidates (see iter_relations()), and the chunks
+            are run on a pool of this many processes.  Each process
+            receives the cached values once.  Relations are reported in the
+            same order as without workers.
+        vectorize (bool): If True (requires NumPy), candidates are screened
+            in large batches using integer matrix arithmetic on random
+            fingerprints of the cached values modulo a large prime, and only
+            the candidates passing the screen are checked exactly.  Float
+            coefficients are fingerprinted by the fractions they round to,
+            as in method 'rank'.
+            Over integers modulo a prime below 2**31, fingerprints are taken
+            modulo that prime instead.
+        ring (Ring): the coefficient ring in which relations are sought (see
+            the module rings); scalars and cached values are converted to
+            it.  Default: config.coefficient_ring.  Over integers_mod(p),
+            coefficients stay bounded, and relations can be lifted back to
+            rational ones with ring.lift().
 
     Return value:
         list of all relations found, where a relation is encoded as a list
         of pairs (term, coeff), with term of the same type as entries in terms,
-        and coeff from scalarset.
+        and coeff from scalarset (converted to ring).
     """
-    ret = []
-    zero = Element(0)
-    num_funcs = len(scalarset) ** len(terms)
+    if method == 'rank':
+        return rank_relation_finder(terms, eltlist=eltlist,
+                                    normalize=normalize, verbose=verbose,
+                                    ring=ring)
+    elif method != 'search':
+        raise ValueError("method must be 'search' or 'rank'")
+
+    return list(iter_relations(terms, eltlist=eltlist, scalarset=scalarset,
+                               workers=workers, vectorize=vectorize,
+                               ring=ring, verbose=verbose,
+                               progress=_print_progress if verbose else None))
+
+
+def _print_progress(position, total, found):
+    """Report the progress of relation_finder(verbose=True)."""
+    print "tried potential relations 1 to {} of {}, found {} so \
+           far...".format(position, total, found)
+
 
+def iter_relations(terms, eltlist=None, scalarset=[0, 1], workers=None,
+                   vectorize=False, ring=None, verbose=False, progress=None,
+                   checkpoint=None, chunk_size=None):
+    """
+    Yield the relations relation_finder(method='search') finds, one at a
+    time, as soon as they are found.  Stop iterating at any time to end the
+    search.
+
+    Candidates are numbered from 0 in the order in which they are tried: in
+    candidate number t, term i gets scalarset[d_i], where d_0, d_1, ... are
+    the base len(scalarset) digits of t, most significant first.  They are
+    tried in chunks of consecutive numbers, in order, even with workers.
+
+    Arguments:
+        terms, eltlist, scalarset, workers, vectorize, ring, verbose: as in
+            relation_finder()
+        progress (callable): called as progress(position, total, found)
+            after each chunk, where position is the number of candidates
+            tried, total the number of candidates and found the number of
+            relations found
+        checkpoint (str): the path of a JSON file recording the position of
+            the search.  If it exists, the search resumes from there; it is
+            rewritten after each chunk and after each relation is consumed.
+            A search killed abruptly may report again the relations found
+            since the file was last written.
+        chunk_size (int): the number of candidates in a chunk; default: 4096
+            (or 16384 with vectorize), reduced with workers so that every
+            worker gets several chunks
+
+    The arguments, and the checkpoint if there is one, are checked at once,
+    before the first relation is asked for.
+
+    Return value:
+        a generator of relations, each encoded as in relation_finder()
+    """
+    if vectorize and numpy is None:
+        raise ImportError("relation_finder(vectorize=True) requires NumPy")
+
+    value_cache = _value_cache(terms, eltlist=eltlist, verbose=verbose,
+                               ring=ring)
+    if ring is None:
+        ring = current_ring()
+    scalarset = list(scalarset)
+    if ring is not python_numbers:
+        scalarset = [ring.coerce(scalar) for scalar in scalarset]
+    total = len(scalarset) ** len(value_cache)
+
+    key = _search_key(value_cache, scalarset)
+    position, found = 0, 0
+    if checkpoint is not None and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            state = json.load(f)
+        if state['key'] != key:
+            raise ValueError("the checkpoint {} belongs to another "
+                             "search".format(checkpoint))
+        position, found = state['position'], state['found']
+
+    if chunk_size is None:
+        chunk_size = _BATCH_SIZE if vectorize else _CHUNK_SIZE
+        if workers is not None and workers > 1:
+            chunk_size = max(1, min(chunk_size,
+                                    (total - position) // (8 * workers)))
+    screen = _screen(value_cache, scalarset) if vectorize else None
+    return _iter_relations(terms, value_cache, scalarset, screen, chunk_size,
+                           workers, progress, checkpoint,
+                           {'key': key, 'position': position, 'total': total,
+                            'found': found})
+
+
+def _range(start, stop, step=1):
+    """
+    Return an iterator over start, start + step, ... below stop, like
+    xrange(), but also for numbers too large for a C long.
+    """
+    if stop <= sys.maxint:
+        return iter(xrange(start, stop, step))
+    return _long_range(start, stop, step)
+
+
+def _long_range(start, stop, step):
+    """Do the work of _range() for large numbers."""
+    while start < stop:
+        yield start
+        start += step
+
+
+def _chunks(position, total, chunk_size):
+    """
+    Lazily yield the pairs (start, stop) of the chunks of chunk_size
+    consecutive candidates from position to total.
+    """
+    for start in _range(position, total, chunk_size):
+        yield start, min(start + chunk_size, total)
+
+
+def _iter_relations(terms, value_cache, scalarset, screen, chunk_size,
+                    workers, progress, checkpoint, state):
+    """
+    Do the work of iter_relations(), once its arguments are checked: search
+    the chunks of chunk_size candidates, in order.  state is the dict saved
+    to checkpoint, with keys 'key', 'position', 'total' and 'found'.
+    """
+    position, total, found = \
+        state['position'], state['total'], state['found']
+
+    def save():
+        if checkpoint is not None:
+            state.update(position=position, found=found)
+            _write_checkpoint(checkpoint, state)
+
+    pool = None
+    if workers is not None and workers > 1 and \
+            total - position > chunk_size:
+        pool = Pool(workers, initializer=_init_search_worker,
+                    initargs=(value_cache, screen))
+        results = pool.imap(_search_chunk,
+                            ((scalarset, start, stop) for start, stop
+                             in _chunks(position, total, chunk_size)))
+    else:
+        results = (_search(value_cache, scalarset, start, stop, screen)
+                   for start, stop in _chunks(position, total, chunk_size))
+    try:
+        for (start, stop), chunk_found in izip(
+                _chunks(position, total, chunk_size), results):
+            for index, scalars in chunk_found:
+                found += 1
+                try:
+                    yield [(terms[i], scalar)
+                           for i, scalar in enumerate(scalars) if scalar != 0]
+                finally:
+                    # the relation was delivered, even if the consumer stops
+                    position = index + 1
+                    save()
+            position = stop
+            save()
+            if progress is not None:
+                progress(position, total, found)
+        if pool is not None:
+            pool.close()
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+def _search_key(value_cache, scalarset):
+    """
+    Return a string identifying a search by its cached values and scalars,
+    to check that a checkpoint belongs to it.
+    """
+    digest = sha1(repr(scalarset))
+    for values in value_cache:
+        for value in values:
+            digest.update(repr(sorted((str(vw), repr(coeff))
+                                      for vw, coeff in value.terms.iteritems()
+                                      if coeff != 0)))
+        digest.update('\n')
+    return digest.hexdigest()
+
+
+def _write_checkpoint(path, state):
+    """Write the JSON dict state to path, atomically."""
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(state, f)
+    os.rename(temporary, path)
+
+
+def _value_cache(terms, eltlist=None, verbose=False, ring=None):
+    """
+    Check the arguments of relation_finder() and cache the values to be
+    tested for relations, with coefficients converted to ring if it is set.
+
+    Return value:
+        a list value_cache with value_cache[i][j] equal to terms[i] applied
+        to eltlist[j] for Op terms, and value_cache[i] == [terms[i]] for
+        Element terms
+    """
     if all(isinstance(term, Op) for term in terms):
         if eltlist is not None and all(isinstance(elt, Element)
                                        for elt in eltlist):
-            # input is OK.  do a relation search using class Element
-            found_count, total_count = 0, 1
-            # cache values
             if verbose:
                 print "caching operator values on test elements ({} total \
                        computations)...".format(len(terms) * len(eltlist))
-            value_cache = [[term(elt) for elt in eltlist] for term in terms]
-            for scalardict in finite_set_exponential(scalarset,
-                                                     range(len(terms))):
-                if verbose:
-                    print "trying potential relation {} of {}, found {} so \
-                           far...".format(total_count, num_funcs, found_count)
-                    total_count += 1
-                if not all(scalardict[key] == 0 for key in scalardict):
-                    if all(sum(scalardict[i] * value_cache[i][j]
-                               for i in xrange(len(terms))) == zero
-                            for j in xrange(len(eltlist))):
-                        ret.append([(terms[key], scalardict[key])
-                                    for key in scalardict
-                                    if scalardict[key] != 0])
-                        found_count += 1
-            return ret
+            ret = [[term(elt) for elt in eltlist] for term in terms]
         else:
             raise Exception("To call relation_finder() with Op terms, you \
                              must specify an eltlist.")
 
     elif all(isinstance(term, Element) for term in terms):
         if eltlist is None:
-            # input is OK.  do a relation search using class Op
-            found_count, total_count = 0, 1
-            for scalardict in finite_set_exponential(scalarset,
-                                                     range(len(terms))):
-                if verbose:
-                    print "trying potential relation {} of {}, found {} so \
-                           far...".format(total_count, num_funcs, found_count)
-                    total_count += 1
-                if sum(scalardict[key] * terms[key] for key in scalardict) == \
-                        zero and not all(scalardict[key] == 0
-                                         for key in scalardict):
-                    ret.append([(terms[key], scalardict[key])
-                               for key in scalardict if scalardict[key] != 0])
-                    found_count += 1
-            return ret
+            ret = [[term] for term in terms]
         else:
             raise Exception("When calling relation_finder() with Element \
                              terms, eltlist should not be set.")
 
     else:
         raise TypeError
+
+    if ring is not None and ring is not python_numbers:
+        ret = [[Element(dict(value.terms), ring=ring) for value in values]
+               for values in ret]
+    return ret
+
+
+def _is_relation(scalars, value_cache, zero):
+    """
+    Return True if scalars are not all zero and the sum of
+    scalars[i] * value_cache[i][j] over i is zero for every j.
+    """
+    if all(scalar == 0 for scalar in scalars):
+        return False
+    num_values = len(value_cache[0]) if value_cache else 0
+    return all(sum(scalars[i] * value_cache[i][j]
+                   for i in xrange(len(scalars))) == zero
+               for j in xrange(num_values))
+
+
+def _search(value_cache, scalarset, start, stop, screen=None):
+    """
+    Try the candidates numbered start to stop - 1 (see iter_relations()).
+    If screen (see _screen()) is set, hand the work to _vectorized_search().
+
+    Return value:
+        list of pairs (index, scalars) for the candidates giving relations,
+        with scalars the list of coefficients
+    """
+    if screen is not None:
+        return _vectorized_search(value_cache, scalarset, start, stop,
+                                  screen)
+    ret = []
+    zero = Element(0)
+    base, num_terms = len(scalarset), len(value_cache)
+    powers = [base ** (num_terms - 1 - i) for i in xrange(num_terms)]
+    for t in _range(start, stop):
+        scalars = [scalarset[t // powers[i] % base]
+                   for i in xrange(num_terms)]
+        if _is_relation(scalars, value_cache, zero):
+            ret.append((t, scalars))
+    return ret
+
+
+_CHUNK_SIZE = 2 ** 12
+"""int: default number of candidates in a chunk of iter_relations()"""
+
+_FINGERPRINT_PRIME = 2 ** 31 - 1
+"""int: modulus for fingerprints; products of two residues fit in int64, as
+long as the modulus is at most this large"""
+
+_FINGERPRINT_WIDTH = 2
+"""int: number of independent fingerprints of each cached value"""
+
+_BATCH_SIZE = 2 ** 14
+"""int: number of candidates screened at once by _vectorized_search()"""
+
+_INT64_MAX = 2 ** 63 - 1
+"""int: the largest candidate number _vectorized_search() stores as int64"""
+
+
+def _fingerprint_modulus(scalarset):
+    """
+    Return the modulus of the integers modulo p in scalarset, or
+    _FINGERPRINT_PRIME if scalarset holds rational numbers.
+    """
+    moduli = set(scalar.modulus for scalar in scalarset
+                 if isinstance(scalar, IntegerMod))
+    if not moduli:
+        return _FINGERPRINT_PRIME
+    p = moduli.pop()
+    if moduli or p > _FINGERPRINT_PRIME:
+        raise ValueError("vectorized search needs one modulus below 2**31")
+    return p
+
+
+@memo
+def _evaluation_point(p):
+    """
+    Return the residue modulo p at which central parameters such as q are
+    evaluated in fingerprints: a fixed random unit.
+    """
+    return Random(p).randrange(1, p)
+
+
+def _residue(scalar, p=_FINGERPRINT_PRIME):
+    """
+    Return the residue modulo p of a rational number or IntegerMod; floats
+    are rounded to fractions as by the rank method (see linalg._rational()),
+    and a LaurentPolynomial is evaluated at _evaluation_point(p).
+    """
+    if isinstance(scalar, LaurentPolynomial):
+        point = _evaluation_point(p)
+        ret = 0
+        for k, coeff in enumerate(scalar.coeffs, scalar.low):
+            power = pow(point, k, p) if k >= 0 \
+                else pow(_inverse_mod(point, p), -k, p)
+            ret += _residue(coeff, p) * power
+        return ret % p
+    if isinstance(scalar, float):
+        scalar = _rational(scalar)
+    return residue(scalar, p)
+
+
+def _fingerprints(value_cache, seed=0, p=_FINGERPRINT_PRIME):
+    """
+    Project the cached values of each term to a few residues.
+
+    Each pair (j, vw), for vw a VariableWord in some value_cache[i][j], gets
+    a random vector of _FINGERPRINT_WIDTH residues, and the fingerprint of
+    term i is the sum of coeff times the vector of (j, vw) over all of its
+    cached values.  If scalars give a relation, the same combination of the
+    fingerprints vanishes; the converse holds with high probability.
+
+    Return value:
+        a NumPy array of shape (len(value_cache), _FINGERPRINT_WIDTH)
+    """
+    rng = Random(seed)
+    projection = {}
+    ret = numpy.zeros((len(value_cache), _FINGERPRINT_WIDTH),
+                      dtype=numpy.int64)
+    for i, values in enumerate(value_cache):
+        for j, value in enumerate(values):
+            for vw, coeff in value.terms.iteritems():
+                if coeff == 0:
+                    continue
+                try:
+                    vector = projection[(j, vw)]
+                except KeyError:
+                    vector = projection[(j, vw)] = numpy.array(
+                        [rng.randrange(p) for _ in xrange(_FINGERPRINT_WIDTH)],
+                        dtype=numpy.int64)
+                ret[i] = (ret[i] + _residue(coeff, p) * vector) % p
+    return ret
+
+
+def _screen(value_cache, scalarset):
+    """
+    Return what _vectorized_search() needs to screen candidates: a tuple
+    (p, fingerprints, residues) with p the fingerprint modulus, fingerprints
+    those of the cached values (see _fingerprints()) and residues a NumPy
+    array of the residues of scalarset.
+    """
+    p = _fingerprint_modulus(scalarset)
+    residues = numpy.array([_residue(s, p) for s in scalarset],
+                           dtype=numpy.int64)
+    return p, _fingerprints(value_cache, p=p), residues
+
+
+def _vectorized_search(value_cache, scalarset, start, stop, screen):
+    """
+    Do the work of _search() by screening candidates in batches.
+
+    A batch of candidates is screened by accumulating scalar residues times
+    fingerprints term by term, and candidates with vanishing fingerprints
+    are confirmed exactly by _is_relation().
+    """
+    ret = []
+    zero = Element(0)
+    p, fingerprints, residues = screen
+    base, num_terms = len(scalarset), len(value_cache)
+    powers = [base ** (num_terms - 1 - i) for i in xrange(num_terms)]
+    # candidate numbers beyond int64 are kept as Python longs
+    dtype = numpy.int64 if stop <= _INT64_MAX else object
+    for batch_start in _range(start, stop, _BATCH_SIZE):
+        indices = numpy.arange(batch_start, min(batch_start + _BATCH_SIZE,
+                                                stop), dtype=dtype)
+        screen = numpy.zeros((len(indices), _FINGERPRINT_WIDTH),
+                             dtype=numpy.int64)
+        for i in xrange(num_terms):
+            digits = (indices // powers[i] % base).astype(numpy.int64)
+            screen = (screen + residues[digits][:, None] * fingerprints[i]) \
+                % p
+        for t in indices[~screen.any(axis=1)]:
+            scalars = [scalarset[int(t) // powers[i] % base]
+                       for i in xrange(num_terms)]
+            if _is_relation(scalars, value_cache, zero):
+                ret.append((int(t), scalars))
+    return ret
+
+
+_worker_value_cache = None
+"""list: value cache of relation_finder(), set once in each worker process"""
+
+_worker_screen = None
+"""tuple: the screen (see _screen()) of a vectorized search, or None, set
+once in each worker process"""
+
+
+def _init_search_worker(value_cache, screen):
+    """Store the value cache and screen in a relation_finder() worker."""
+    global _worker_value_cache, _worker_screen
+    _worker_value_cache = value_cache
+    _worker_screen = screen
+
+
+def _search_chunk(args):
+    """Run _search() on a chunk of the candidates in a worker process."""
+    scalarset, start, stop = args
+    return _search(_worker_value_cache, scalarset, start, stop,
+                   _worker_screen)
+
+
+def _coefficient_entries(coeff):
+    """
+    Return the pairs (k, c) such that coeff is the sum of c * q^k, for coeff
+    a LaurentPolynomial in a central parameter q; any other coefficient is
+    its own constant term.
+    """
+    if isinstance(coeff, LaurentPolynomial):
+        return enumerate(coeff.coeffs, coeff.low)
+    return ((0, coeff),)
+
+
+def _term_vectors(terms, eltlist=None, verbose=False, ring=None):
+    """
+    Expand each of terms into a sparse coefficient vector.
+
+    For Element terms, the vector of term has an entry for each triple
+    (0, vw, k) with vw a VariableWord in term.  For Op terms, the vector of
+    term has an entry for each triple (j, vw, k) with vw a VariableWord in
+    term(eltlist[j]).  In both cases, k is an exponent of the central
+    parameter in a LaurentPolynomial coefficient (see the module rings), and
+    0 for any other coefficient, so that relations have scalar coefficients.
+    The arguments are checked as in relation_finder().
+
+    Return value:
+        a list of dicts, one for each term
+    """
+    return [{(j, vw, k): c
+             for j, value in enumerate(values)
+             for vw, coeff in value.terms.iteritems()
+             for k, c in _coefficient_entries(coeff)}
+            for values in _value_cache(terms, eltlist=eltlist,
+                                       verbose=verbose, ring=ring)]
+
+
+def rank_relation_finder(terms, eltlist=None, normalize=False,
+                         verbose=False, ring=None):
+    """
+    Find a basis of all linear relations among terms.  Arguments are as in
+    relation_finder(), except that coefficients are not restricted to a
+    scalarset.
+
+    Each term (or, for Op terms, each value on an entry of eltlist) is
+    expanded over the monomials it involves, and an exact nullspace is
+    computed by fraction-free Gaussian elimination, in time polynomial in
+    the number of terms.  Over integers_mod(p) for a prime p (see the
+    argument ring of relation_finder()), elimination is done modulo p.
+    LaurentPolynomial coefficients, such as those of the Hecke generators
+    of the module odd, are expanded in powers of their variable, so that
+    relations still have scalar coefficients.
+
+    Return value:
+        list of relations forming a basis of all relations, each encoded as
+        in relation_finder().  Relation number k expresses one term in terms
+        of earlier ones.  Coefficients are integers without common factor,
+        unless normalize is True, in which case each relation is scaled so
+        that its first coefficient is 1 (giving Fraction coefficients).
+        Modulo p, coefficients are elements of the ring, and the last one
+        is 1 unless normalize is True.
+    """
+    if ring is None:
+        ring = current_ring()
+    modulus = getattr(ring, 'modulus', None)
+    vectors = _term_vectors(terms, eltlist=eltlist, verbose=verbose,
+                            ring=ring)
+    if verbose:
+        print "computing relations among {} terms...".format(len(terms))
+    ret = []
+    for relation in nullspace(vectors, modulus=modulus):
+        indices = sorted(relation)
+        if modulus is not None:
+            relation = {i: ring.coerce(val) for i, val in relation.iteritems()}
+            if normalize:
+                first = ring.inverse(relation[indices[0]])
+                relation = {i: val * first for i, val in relation.iteritems()}
+            ret.append([(terms[i], relation[i]) for i in indices])
+        elif normalize:
+            first = relation[indices[0]]
+            ret.append([(terms[i], Fraction(relation[i], first))
+                        for i in indices])
+        else:
+            ret.append([(terms[i], relation[i]) for i in indices])
+    if verbose:
+        print "found {} independent relations.".format(len(ret))
+    return ret
@@ -5,12 +5,14 @@ Overview:
     a variable called 'x' with degree d (d may be of any type), call the
     constructor Variable('x', d).
 
+    Each variable name is interned to a small integer id when it is first
+    registered, and a VariableWord stores the ids of its factors.
+
 Classes:
     Variable: stands for a known variable
     VariableWord: stands for a word in known variables
 """
 
-from copy import deepcopy
 from itertools import groupby
 from . import config
 from .exceptions import VariableNameCollision, UnknownVariableName, \
@@ -18,6 +20,23 @@ from .exceptions import VariableNameCollision, UnknownVariableName, \
 from .frosting import prod
 
 
+_ids = {}
+"""dict: keys are variable names, values are their interned integer ids"""
+
+_names = []
+"""list: _names[i] is the variable name with interned id i"""
+
+
+def _intern(name):
+    """Return the integer id of the variable name, assigning one if needed."""
+    try:
+        return _ids[name]
+    except KeyError:
+        _ids[name] = len(_names)
+        _names.append(name)
+        return _ids[name]
+
+
 def _exp_str(string, exponent):
     """
     Return a string representing string rasied to the power exponent.
@@ -94,7 +113,7 @@ class Variable:
         if isinstance(other, Variable):
             return VariableWord(self, other)
         elif isinstance(other, VariableWord):
-            return VariableWord(self, *(other._w))
+            return VariableWord(self, other)
         else:
             return NotImplemented
 
@@ -111,6 +130,7 @@ class Variable:
         """
         if self.name not in config.variables:
             config.variables[self.name] = self
+            _intern(self.name)
             return True
         else:
             raise VariableNameCollision()
@@ -175,55 +195,84 @@ class Variable:
         return self.name[-1] == '@'
 
 
-class VariableWord:
-    """Class for a word in known variables.  TODO: expand"""
+class VariableWord(object):
+    """
+    Class for a word in known variables.
+
+    A VariableWord is stored as a tuple of interned variable ids, and its hash
+    is computed at most once.  Indexing and iteration give variable names.
+    """
+
+    __slots__ = ('_w', '_hash')
 
     def __init__(self, *word):
         """
         Initialize variable word.
 
         Arguments:
-            vars (list): each element of type Variable or string
+            vars (list): each element of type Variable, string, or
+                VariableWord (whose factors are then spliced in)
         """
-        self._w = []
+        ids = []
         for var in word:
             if isinstance(var, str):
                 varname = var
             elif isinstance(var, Variable):
                 varname = var.name
             elif isinstance(var, VariableWord):
-                # be generous: it it's a single variable, then cast
-                if len(var) == 1:
-                    return var[0]
-                else:
-                    raise TypeError
+                # be generous: splice in the factors of var
+                ids.extend(var._w)
+                continue
             else:
                 raise TypeError
 
             if varname in config.variables:
-                self._w.append(varname)
+                ids.append(_ids[varname])
             else:
                 raise UnknownVariableName
+        self._w = tuple(ids)
+        self._hash = None
+
+    @classmethod
+    def _from_ids(cls, ids):
+        """
+        Return the VariableWord with factors given by a tuple of interned
+        variable ids.  No validation is done: this is for internal use.
+        """
+        vw = object.__new__(cls)
+        vw._w = ids
+        vw._hash = None
+        return vw
 
     def __getitem__(self, index):
-        """Returns index-th variable name in the word."""
-        return self._w[index]
+        """
+        Returns index-th variable name in the word, or a list of names if
+        index is a slice.
+        """
+        if isinstance(index, slice):
+            return [_names[i] for i in self._w[index]]
+        return _names[self._w[index]]
+
+    def __iter__(self):
+        """Iterate over the variable names in the word."""
+        for i in self._w:
+            yield _names[i]
 
     def __mul__(self, other):
         """Concatenate self and other."""
         if isinstance(other, VariableWord):
-            return VariableWord(*(self._w + other._w))
+            return VariableWord._from_ids(self._w + other._w)
         elif isinstance(other, Variable):
-            return VariableWord(*(self._w + [other.name]))
+            return self * VariableWord(other)
         else:
             return NotImplemented
 
     def __rmul__(self, other):
         """Concatenate other and self."""
         if isinstance(other, VariableWord):
-            return VariableWord(*(other._w + self._w))
+            return VariableWord._from_ids(other._w + self._w)
         elif isinstance(other, Variable):
-            return VariableWord(*([other.name] + self._w))
+            return VariableWord(other) * self
         else:
             return NotImplemented
 
@@ -239,13 +288,13 @@ class VariableWord:
         """Stringify self in monomial style."""
         if config.print_options['use_exponents']:
             exp_form = (_exp_str(x, len(list(y)))
-                        for (x, y) in groupby(self._w))
+                        for (x, y) in groupby(self))
             return config.print_options['mulsep']\
                 .join(exp_form).replace('@', 'i')
         else:
             if len(self._w) > 0:
                 return config.print_options['mulsep']\
-                    .join(self._w).replace('@', 'i')
+                    .join(self).replace('@', 'i')
             else:
                 return "1"
 
@@ -254,16 +303,30 @@ class VariableWord:
         return str(self)
 
     def __hash__(self):
-        """Return hash of self._tuplify()."""
-        return hash(self._tuplify())
+        """Return hash of the tuple of ids, computed once."""
+        if self._hash is None:
+            self._hash = hash(self._w)
+        return self._hash
 
     def __len__(self):
         """Return the number of factors."""
         return len(self._w)
 
+    def __reduce__(self):
+        """Pickle by variable names, since ids are local to a process."""
+        return (VariableWord, self._tuplify())
+
+    def __copy__(self):
+        """Return a copy of self."""
+        return VariableWord._from_ids(self._w)
+
+    def __deepcopy__(self, memo):
+        """Return a copy of self."""
+        return VariableWord._from_ids(self._w)
+
     def _tuplify(self):
         """Return a tuple of strings representing the word."""
-        return tuple(v for v in self._w)
+        return tuple(_names[i] for i in self._w)
 
     def transform(self, old, new, swap=False):
         """
@@ -277,17 +340,18 @@ class VariableWord:
             old = old.name
         if isinstance(new, Variable):
             new = new.name
-        for i in xrange(len(self._w)):
-            if self._w[i] == old:
-                self._w[i] = new
-            elif self._w[i] == new and swap:
-                self._w[i] = old
-            else:
-                continue
+        # like the historical list of names, accept names not interned yet
+        old, new = _intern(old), _intern(new)
+        if swap:
+            self._w = tuple(new if i == old else old if i == new else i
+                            for i in self._w)
+        else:
+            self._w = tuple(new if i == old else i for i in self._w)
+        self._hash = None
 
     def copy(self):
         """Return a copy of self."""
-        return VariableWord(*deepcopy(self._w))
+        return VariableWord._from_ids(self._w)
 
     def split_on_sub(self, *subword):
         """
@@ -300,13 +364,14 @@ class VariableWord:
             subword is an iterable of Variable objects
         """
         if len(subword) == 0:
-            return [], [], self._w
+            return [], [], self[:]
         else:
-            for i in xrange(len(self._w) - len(subword) + 1):
-                if subword[0] == self._w[i] and \
-                                    list(subword) == self._w[i:i+len(subword)]:
-                    return self._w[:i], self._w[i:i+len(subword)], \
-                        self._w[i+len(subword):]
+            sub = tuple(_ids.get(v.name, -1) if isinstance(v, Variable)
+                        else _ids.get(v, -1) for v in subword)
+            for i in xrange(len(self._w) - len(sub) + 1):
+                if self._w[i:i+len(sub)] == sub:
+                    return self[:i], self[i:i+len(sub)], \
+                        self[i+len(sub):]
         return None, None, None
 
     def scale_by_factors(self, scalar_func):
@@ -317,4 +382,4 @@ class VariableWord:
             scalar_func (callable): takes an argument of a str, returns
                 a Number
         """
-        return prod(*[scalar_func(v) for v in self])
+        return prod(1, *[scalar_func(v) for v in self])
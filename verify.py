@@ -0,0 +1,273 @@
+"""spdaot.verify
+
+Overview:
+    Tools for checking identities between operators, such as the braid,
+    quadratic and nil relations satisfied by the Op objects in the module
+    odd.  An identity is checked either exhaustively, on every normal
+    monomial up to a degree bound (see the module basis), or on randomly
+    sampled Elements.  Test elements are
+    generated lazily, so the basis is never held in memory, and checking
+    stops at the first counterexample.
+
+    With workers > 1, test elements are checked on a pool of processes.  The
+    identities are inherited by the workers when the pool forks, so Op
+    objects never need to be pickled; only monomials travel between
+    processes.
+
+Classes:
+    Identity: an identity lhs = rhs between operators
+    VerificationReport: the outcome of verify()
+
+Functions:
+    verify(): check a list of identities
+"""
+
+from multiprocessing import Pool
+from random import Random
+from time import time
+from .variable import Variable, VariableWord
+from .element import Element
+from .op import Op
+from .basis import normal_words
+from .frosting import prod
+from . import config
+
+
+class Identity:
+    """An identity lhs = rhs between operators."""
+
+    def __init__(self, lhs, rhs=0, name=None):
+        """
+        Initialize the identity lhs = rhs.
+
+        Arguments:
+            lhs, rhs: each an Op, a word given as a list or tuple of Op
+                objects (the word [a, b, c] stands for a * b * c, so c acts
+                first), or a Number standing for a constant operator; rhs
+                defaults to 0
+            name (str): used when reporting a counterexample; by default,
+                built from the names of the Op objects involved
+        """
+        self.lhs = self._as_op(lhs)
+        self.rhs = self._as_op(rhs)
+        self.name = name if name is not None else \
+            self._word_name(lhs) + ' = ' + self._word_name(rhs)
+
+    @staticmethod
+    def _as_op(side):
+        """Return an Op or Number for one side of an identity."""
+        if isinstance(side, (list, tuple)):
+            # the empty word is the identity operator
+            return prod(*side) if side else 1
+        return side
+
+    @staticmethod
+    def _word_name(side):
+        """Return a printable name for one side of an identity."""
+        if isinstance(side, (list, tuple)):
+            return ' '.join(str(op) for op in side) if side else '1'
+        return str(side)
+
+    def holds_on(self, elt):
+        """Return True if lhs(elt) == rhs(elt)."""
+        return _value(self.lhs, elt) == _value(self.rhs, elt)
+
+    def __str__(self):
+        """Stringify self."""
+        return self.name
+
+    def __repr__(self):
+        """Stringify self."""
+        return self.name
+
+
+def _value(side, elt):
+    """Apply one side of an identity to elt."""
+    value = side(elt) if isinstance(side, Op) else side * elt
+    return value if isinstance(value, Element) else Element(value)
+
+
+class VerificationReport:
+    """
+    The outcome of verify().
+
+    Attributes:
+        passed (bool): True if no counterexample was found
+        checked (int): the number of test elements checked
+        elapsed (float): wall-clock seconds spent checking
+        throughput (float): identity checks per second
+        identity (Identity): the identity which failed, or None
+        counterexample (Element): the test element on which it failed, or
+            None
+    """
+
+    def __init__(self, passed, checked, elapsed, num_identities,
+                 identity=None, counterexample=None):
+        self.passed = passed
+        self.checked = checked
+        self.elapsed = elapsed
+        self.throughput = checked * num_identities / elapsed \
+            if elapsed > 0 else float('inf')
+        self.identity = identity
+        self.counterexample = counterexample
+
+    def __nonzero__(self):
+        """Return True if no counterexample was found."""
+        return self.passed
+
+    def __str__(self):
+        """Stringify self."""
+        ret = '{} after {} test elements in {:.3f}s ({:.1f} checks/s)'.format(
+            'passed' if self.passed else 'FAILED', self.checked,
+            self.elapsed, self.throughput)
+        if not self.passed:
+            ret += ': {} fails on {}'.format(self.identity,
+                                             self.counterexample)
+        return ret
+
+    def __repr__(self):
+        """Stringify self."""
+        return str(self)
+
+
+def _monomials(variables, min_degree, max_degree):
+    """
+    Yield every normal word in variables of length min_degree to max_degree,
+    as a tuple of variable names.
+    """
+    for vw in normal_words(max_degree, variables, min_degree):
+        yield tuple(vw)
+
+
+def _random_samples(variables, max_degree, samples, max_terms, seed):
+    """
+    Yield samples random test elements, each encoded as a list of pairs
+    (word, coeff) with word a tuple of variable names.
+    """
+    rng = Random(seed)
+    for _ in xrange(samples):
+        yield [(tuple(rng.choice(variables)
+                      for _ in xrange(rng.randint(0, max_degree))),
+                rng.choice([-3, -2, -1, 1, 2, 3]))
+               for _ in xrange(rng.randint(1, max_terms))]
+
+
+def _test_element(encoded):
+    """Return the Element for an encoded monomial or random sample."""
+    if isinstance(encoded, tuple):
+        return Element(VariableWord(*encoded))
+    return sum((coeff * Element(VariableWord(*word))
+                for word, coeff in encoded), Element(0))
+
+
+def _first_failure(identities, chunk):
+    """
+    Check every identity on every encoded test element in chunk.
+
+    Return value:
+        a tuple (checked, failure), where checked is the number of test
+        elements checked and failure is None or a pair (k, encoded) such that
+        identities[k] fails on the test element encoded
+    """
+    for count, encoded in enumerate(chunk, 1):
+        elt = _test_element(encoded)
+        for k, identity in enumerate(identities):
+            if not identity.holds_on(elt):
+                return count, (k, encoded)
+    return len(chunk), None
+
+
+_worker_identities = None
+"""list: identities checked by verify() worker processes, inherited by fork"""
+
+
+def _check_chunk(chunk):
+    """Run _first_failure() on a chunk in a worker process."""
+    return _first_failure(_worker_identities, chunk)
+
+
+def _chunks(iterable, size):
+    """Yield lists of up to size consecutive items of iterable."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def verify(identities, variables=None, max_degree=3, min_degree=0,
+           mode='exhaustive', samples=1000, max_terms=4, seed=0,
+           workers=None, chunk_size=64, verbose=False):
+    """
+    Check identities between operators on many test elements.
+
+    Arguments:
+        identities (iterable): entries are Identity objects or pairs
+            (lhs, rhs) as in Identity()
+        variables (iterable): names of the variables from which test
+            elements are built; default: all registered variables
+        max_degree, min_degree (int): bounds on the length of monomials
+        mode (str): 'exhaustive' checks every normal monomial in variables
+            of length min_degree to max_degree, which suffices for
+            identities between linear Ops; 'random' checks samples random
+            Elements with up to max_terms terms of length up to max_degree
+            and small integer coefficients, drawn using seed
+        workers (int): if greater than 1, check chunks of chunk_size test
+            elements on a pool of this many processes
+        verbose (bool): if True, print progress after every chunk
+
+    Return value:
+        a VerificationReport, which is true if and only if no
+        counterexample was found
+    """
+    global _worker_identities
+    identities = [identity if isinstance(identity, Identity)
+                  else Identity(*identity) for identity in identities]
+    if variables is None:
+        variables = sorted(config.variables)
+    variables = [var.name if isinstance(var, Variable) else var
+                 for var in variables]
+    if mode == 'exhaustive':
+        tests = _monomials(variables, min_degree, max_degree)
+    elif mode == 'random':
+        tests = _random_samples(variables, max_degree, samples, max_terms,
+                                seed)
+    else:
+        raise ValueError("mode must be 'exhaustive' or 'random'")
+
+    start = time()
+    checked, failure = 0, None
+    if workers is not None and workers > 1:
+        _worker_identities = identities
+        pool = Pool(workers)
+        try:
+            results = pool.imap(_check_chunk, _chunks(tests, chunk_size))
+            for count, failure in results:
+                checked += count
+                if verbose:
+                    print "checked {} test elements...".format(checked)
+                if failure is not None:
+                    break
+        finally:
+            pool.terminate()
+            pool.join()
+            _worker_identities = None
+    else:
+        for chunk in _chunks(tests, chunk_size):
+            count, failure = _first_failure(identities, chunk)
+            checked += count
+            if verbose:
+                print "checked {} test elements...".format(checked)
+            if failure is not None:
+                break
+
+    elapsed = time() - start
+    if failure is None:
+        return VerificationReport(True, checked, elapsed, len(identities))
+    k, encoded = failure
+    return VerificationReport(False, checked, elapsed, len(identities),
+                              identity=identities[k],
+                              counterexample=_test_element(encoded))